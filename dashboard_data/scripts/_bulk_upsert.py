@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+import pyodbc
+
+
+@dataclass
+class UpsertResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    @property
+    def affected(self) -> int:
+        return self.inserted + self.updated
+
+    def __iadd__(self, other: "UpsertResult") -> "UpsertResult":
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.unchanged += other.unchanged
+        return self
+
+    def __str__(self) -> str:
+        return f"inserted={self.inserted} updated={self.updated} unchanged={self.unchanged}"
+
+
+def _quote(name: str) -> str:
+    return f"[{name.strip('[]')}]"
+
+
+def _stage_table_name(table: str) -> str:
+    return "#stage_" + table.split(".")[-1].strip("[]")
+
+
+def bulk_upsert(
+    cursor: pyodbc.Cursor,
+    table: str,
+    columns: Sequence[str],
+    key_columns: Sequence[str],
+    rows: List[Tuple],
+) -> UpsertResult:
+    """Upsert een batch via een sessie temp-tabel en één MERGE.
+
+    De rijen worden met ``fast_executemany`` in ``#stage_<tabel>`` gezet (zelfde
+    kolomtypes als de doeltabel via ``SELECT TOP 0 ... INTO``), waarna één MERGE
+    alleen echt gewijzigde rijen bijwerkt. Per batch kost dit een handvol
+    statements in plaats van één of twee round trips per rij.
+
+    Args:
+        cursor: Cursor op een verbinding zonder autocommit (caller commit)
+        table: Doeltabel, bijv. ``[dbo].[Orders]``
+        columns: Kolomnamen in de volgorde van de tuples in ``rows``
+        key_columns: Kolommen die samen een rij identificeren
+        rows: Te upserten rijen
+    """
+    if not rows:
+        return UpsertResult()
+
+    # MERGE faalt als dezelfde sleutel twee keer in de bron staat; laatste rij wint
+    key_indexes = [list(columns).index(k) for k in key_columns]
+    deduped: Dict[Tuple, Tuple] = {}
+    for row in rows:
+        deduped[tuple(row[i] for i in key_indexes)] = row
+    if len(deduped) < len(rows):
+        logging.info(f"Bulk upsert {table}: {len(rows) - len(deduped)} dubbele sleutels in batch samengevoegd")
+
+    stage = _stage_table_name(table)
+    cols = [_quote(c) for c in columns]
+    keys = [_quote(k) for k in key_columns]
+    non_keys = [c for c in cols if c not in keys]
+    col_list = ",".join(cols)
+
+    cursor.execute(
+        f"""
+        IF OBJECT_ID('tempdb..{stage}') IS NULL
+            SELECT TOP 0 {col_list} INTO {stage} FROM {table};
+        ELSE
+            TRUNCATE TABLE {stage};
+        """
+    )
+    cursor.fast_executemany = True
+    cursor.executemany(
+        f"INSERT INTO {stage} ({col_list}) VALUES ({','.join('?' for _ in cols)})",
+        list(deduped.values()),
+    )
+
+    on_clause = " AND ".join(f"t.{k} = s.{k}" for k in keys)
+    if non_keys:
+        # EXCEPT vergelijkt NULL-veilig, zodat ongewijzigde rijen niet herschreven worden
+        changed = f"EXISTS (SELECT {','.join('s.' + c for c in non_keys)} EXCEPT SELECT {','.join('t.' + c for c in non_keys)})"
+        update_clause = (
+            f"WHEN MATCHED AND {changed} THEN UPDATE SET "
+            + ",".join(f"t.{c} = s.{c}" for c in non_keys)
+        )
+    else:
+        update_clause = ""
+    cursor.execute(
+        f"""
+        SET NOCOUNT ON;
+        DECLARE @actions TABLE ([Action] NVARCHAR(10));
+        MERGE {table} WITH (HOLDLOCK) AS t
+        USING {stage} AS s
+           ON {on_clause}
+        {update_clause}
+        WHEN NOT MATCHED BY TARGET THEN
+            INSERT ({col_list}) VALUES ({','.join('s.' + c for c in cols)})
+        OUTPUT $action INTO @actions;
+        SELECT
+            SUM(CASE WHEN [Action] = 'INSERT' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN [Action] = 'UPDATE' THEN 1 ELSE 0 END)
+        FROM @actions;
+        SET NOCOUNT OFF;
+        """
+    )
+    row = cursor.fetchone()
+    inserted = int(row[0] or 0) if row else 0
+    updated = int(row[1] or 0) if row else 0
+    return UpsertResult(inserted=inserted, updated=updated, unchanged=len(deduped) - inserted - updated)
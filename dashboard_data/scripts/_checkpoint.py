@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import os
+import json
+import logging
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+
+DEFAULT_CHECKPOINT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sync_checkpoints.json")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class CheckpointStore:
+    """Checkpoints per tabel voor een sync run, bewaard in een lokaal JSON bestand.
+
+    Elke run (bijv. ``update_all``) heeft een eigen sectie in het bestand. Een
+    tabel is ``completed`` of ``in_progress`` met vrije velden zoals de laatst
+    gecommitte pagina. Met ``resume`` gaat een nieuwe run verder waar de vorige,
+    niet afgeronde run stopte; zonder ``resume`` begint de run opnieuw.
+    Het bestand wordt via een tijdelijk bestand en rename geschreven, zodat een
+    crash tijdens het schrijven nooit een half checkpoint achterlaat.
+    """
+
+    def __init__(self, run_name: str, path: Optional[str] = None) -> None:
+        self.run_name = run_name
+        self.path = path or os.environ.get("SYNC_CHECKPOINT_FILE", DEFAULT_CHECKPOINT_FILE)
+        self.resumed = False
+        self._state: Dict[str, Any] = {}
+
+    def _load_all(self) -> Dict[str, Any]:
+        if not os.path.isfile(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Checkpoint bestand {self.path} onleesbaar, opnieuw beginnen: {e}")
+            return {}
+
+    def _save(self) -> None:
+        all_state = self._load_all()
+        all_state[self.run_name] = self._state
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(prefix=".checkpoint-", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(all_state, f, indent=2, default=str)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def start_run(self, resume: bool = False) -> None:
+        previous = self._load_all().get(self.run_name)
+        if resume and previous and previous.get("status") == "running":
+            self._state = previous
+            self.resumed = True
+            done = [t for t, s in previous.get("tables", {}).items() if s.get("status") == "completed"]
+            logging.info(f"Hervatten van run {self.run_name} gestart op {previous.get('started_at')}; al voltooid: {', '.join(done) or 'geen'}")
+        else:
+            if resume:
+                logging.info(f"Geen onderbroken run {self.run_name} gevonden, volledige run starten")
+            self._state = {"status": "running", "started_at": _now(), "tables": {}}
+            self.resumed = False
+        self._save()
+
+    def get(self, table: str) -> Dict[str, Any]:
+        return dict(self._state.get("tables", {}).get(table, {}))
+
+    def is_completed(self, table: str) -> bool:
+        return self.get(table).get("status") == "completed"
+
+    def update(self, table: str, **fields: Any) -> None:
+        entry = self._state.setdefault("tables", {}).setdefault(table, {})
+        entry.update(fields)
+        entry.setdefault("status", "in_progress")
+        entry["updated_at"] = _now()
+        self._save()
+
+    def mark_completed(self, table: str) -> None:
+        self._state.setdefault("tables", {})[table] = {"status": "completed", "updated_at": _now()}
+        self._save()
+
+    def finish_run(self) -> None:
+        self._state["status"] = "completed"
+        self._state["finished_at"] = _now()
+        self._save()
@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import os
+import json
+import math
+import time
+import random
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+RESOURCES = ("customers", "products", "subscriptions", "orders")
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+@dataclass
+class FakeWooConfig:
+    latency_ms: float = 50.0
+    jitter_ms: float = 10.0
+    error_rate: float = 0.0
+    max_per_page: int = 100
+    seed: int = 42
+
+
+@dataclass
+class FakeWooStats:
+    requests: int = 0
+    pages: int = 0
+    records: int = 0
+    bytes_sent: int = 0
+    injected_errors: int = 0
+    per_resource: Dict[str, int] = field(default_factory=dict)
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _links(resource: str, record_id: int) -> Dict[str, List[Dict[str, str]]]:
+    base = f"https://shop.example/wp-json/wc/v3/{resource}"
+    return {"self": [{"href": f"{base}/{record_id}"}], "collection": [{"href": base}]}
+
+
+def _meta(rng: random.Random, count: int) -> List[dict]:
+    return [
+        {"id": rng.randint(1, 10**7), "key": f"_meta_{i}", "value": "x" * rng.randint(10, 120)}
+        for i in range(count)
+    ]
+
+
+def _address(rng: random.Random, index: int, with_contact: bool) -> dict:
+    address = {
+        "first_name": f"Voornaam{index}", "last_name": f"Achternaam{index}", "company": "",
+        "address_1": f"Straat {rng.randint(1, 200)}", "address_2": "", "city": rng.choice(["Utrecht", "Gent", "Zwolle", "Breda"]),
+        "state": "", "postcode": f"{rng.randint(1000, 9999)} AB", "country": rng.choice(["NL", "NL", "NL", "BE"]),
+    }
+    if with_contact:
+        address.update({"email": f"klant{index}@example.com", "phone": f"06{rng.randint(10**7, 10**8 - 1)}"})
+    return address
+
+
+def _line_items(rng: random.Random, owner_id: int) -> List[dict]:
+    items = []
+    for n in range(rng.randint(1, 4)):
+        price = rng.choice([4.99, 12.5, 29.99, 34.95])
+        quantity = rng.randint(1, 3)
+        items.append({
+            "id": owner_id * 10 + n, "name": f"Product {n}", "product_id": 100 + n, "variation_id": 0,
+            "quantity": quantity, "tax_class": "", "subtotal": f"{price * quantity:.2f}", "subtotal_tax": "0.00",
+            "total": f"{price * quantity:.2f}", "total_tax": "0.00", "taxes": [], "sku": f"SKU-{100 + n}",
+            "price": price, "meta_data": _meta(rng, 3),
+        })
+    return items
+
+
+def _shipping_lines(rng: random.Random, owner_id: int) -> List[dict]:
+    return [{"id": owner_id * 10 + 9, "method_title": "PostNL", "method_id": "flat_rate", "total": "4.95", "total_tax": "0.00", "meta_data": _meta(rng, 2)}]
+
+
+def generate_records(resource: str, count: int, days: int = 30, seed: int = 42) -> List[dict]:
+    """Synthetische records met dezelfde vorm (en ballast) als echte WooCommerce responses."""
+    rng = random.Random(f"{seed}-{resource}")
+    now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    records = []
+    for index in range(1, count + 1):
+        created = now - timedelta(seconds=rng.randint(0, max(1, days * 86400)))
+        modified = min(now, created + timedelta(hours=rng.randint(0, 48)))
+        record: dict = {
+            "id": index,
+            "date_created": created.strftime(DATE_FORMAT), "date_created_gmt": created.strftime(DATE_FORMAT),
+            "date_modified": modified.strftime(DATE_FORMAT), "date_modified_gmt": modified.strftime(DATE_FORMAT),
+            "meta_data": _meta(rng, 8), "_links": _links(resource, index),
+        }
+        if resource == "customers":
+            record.update({"email": f"klant{index}@example.com", "first_name": f"Voornaam{index}", "last_name": f"Achternaam{index}",
+                           "role": "customer", "billing": _address(rng, index, True), "shipping": _address(rng, index, False)})
+        elif resource == "products":
+            record.update({"name": f"Product {index}", "status": "publish", "type": "simple", "sku": f"SKU-{index}",
+                           "regular_price": "29.99", "sale_price": "", "tax_class": "", "description": "<p>" + "lorem " * 80 + "</p>"})
+        elif resource in ("orders", "subscriptions"):
+            items = _line_items(rng, index)
+            total = sum(float(item["total"]) for item in items) + 4.95
+            record.update({
+                "status": rng.choice(["completed", "processing", "active"] if resource == "subscriptions" else ["completed", "processing"]),
+                "customer_id": rng.randint(1, 5000), "order_key": f"wc_order_{index}", "number": str(index), "currency": "EUR",
+                "payment_method": "mollie_wc_gateway_ideal", "payment_method_title": "iDEAL", "total": f"{total:.2f}",
+                "total_tax": "0.00", "shipping_total": "4.95", "shipping_tax": "0.00", "discount_total": "0.00",
+                "date_paid": created.strftime(DATE_FORMAT), "date_completed": modified.strftime(DATE_FORMAT), "created_via": "checkout",
+                "billing": _address(rng, index, True), "shipping": _address(rng, index, False),
+                "line_items": items, "shipping_lines": _shipping_lines(rng, index), "refunds": [], "coupon_lines": [],
+            })
+            if resource == "subscriptions":
+                record.update({
+                    "billing_interval": rng.choice([1, 2, 4]), "billing_period": "week", "start_date_gmt": created.strftime(DATE_FORMAT),
+                    "next_payment_date_gmt": (now + timedelta(days=rng.randint(1, 28))).strftime(DATE_FORMAT), "end_date_gmt": "",
+                })
+        records.append(record)
+    return records
+
+
+def load_fixtures(directory: str) -> Dict[str, List[dict]]:
+    """Laad opgenomen responses uit ``<directory>/<resource>.json`` (een lijst records)."""
+    data = {}
+    for resource in RESOURCES:
+        path = os.path.join(directory, f"{resource}.json")
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data[resource] = json.load(f)
+            logging.info(f"Fixture {path}: {len(data[resource])} records")
+    return data
+
+
+class FakeWooServer:
+    """Lokale stand-in voor de WooCommerce REST API op ``/wp-json/wc/v3``.
+
+    Ondersteunt paginering met ``X-WP-Total``/``X-WP-TotalPages``, ``_fields``,
+    ``after``/``before``, ``modified_after``, ``orderby=id`` en ``role``, met
+    instelbare latency en een fractie 429/503 responses om de rate limiter te
+    testen.
+    """
+
+    def __init__(self, data: Dict[str, List[dict]], config: Optional[FakeWooConfig] = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.data = data
+        self.config = config or FakeWooConfig()
+        self.stats = FakeWooStats()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeWooServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-woo", daemon=True)
+        self._thread.start()
+        logging.info(f"Fake WooCommerce server op {self.base_url} ({', '.join(f'{k}={len(v)}' for k, v in self.data.items())})")
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeWooServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _should_fail(self) -> Optional[int]:
+        with self._lock:
+            self.stats.requests += 1
+            if self.config.error_rate > 0 and self._rng.random() < self.config.error_rate:
+                self.stats.injected_errors += 1
+                return self._rng.choice([429, 503])
+        return None
+
+    def _sleep(self) -> None:
+        with self._lock:
+            delay = self.config.latency_ms + self._rng.uniform(-self.config.jitter_ms, self.config.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def _select(self, resource: str, query: Dict[str, str]) -> List[dict]:
+        records = self.data.get(resource, [])
+        after = _parse_date(query.get("after"))
+        before = _parse_date(query.get("before"))
+        modified_after = _parse_date(query.get("modified_after"))
+        role = query.get("role")
+        status = query.get("status")
+        selected = []
+        for record in records:
+            created = _parse_date(record.get("date_created_gmt") or record.get("date_created"))
+            if after and (created is None or created <= after):
+                continue
+            if before and (created is None or created >= before):
+                continue
+            if modified_after:
+                modified = _parse_date(record.get("date_modified_gmt") or record.get("date_modified"))
+                if modified is None or modified <= modified_after:
+                    continue
+            if role and record.get("role", "customer") != role:
+                continue
+            if status and status != "any" and record.get("status") != status:
+                continue
+            selected.append(record)
+        if query.get("orderby") == "id":
+            selected.sort(key=lambda r: r.get("id", 0), reverse=query.get("order", "desc") == "desc")
+        else:
+            selected.sort(key=lambda r: r.get("date_created_gmt") or "", reverse=query.get("order", "desc") == "desc")
+        return selected
+
+    def handle(self, path: str, query: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        self._sleep()
+        failure = self._should_fail()
+        if failure:
+            return failure, {"Retry-After": "0"}, b'{"code":"rate_limited"}'
+
+        parts = [p for p in path.split("/") if p]
+        if len(parts) < 4 or parts[0] != "wp-json" or parts[3] not in self.data:
+            return 404, {}, b'{"code":"rest_no_route"}'
+        resource = parts[3]
+        fields = [f.split(".")[0] for f in query.get("_fields", "").split(",") if f]
+        project = (lambda r: {k: r[k] for k in fields if k in r}) if fields else (lambda r: r)
+
+        if len(parts) > 4:
+            record = next((r for r in self.data[resource] if str(r.get("id")) == parts[4]), None)
+            if record is None:
+                return 404, {}, b'{"code":"not_found"}'
+            return 200, {}, json.dumps(project(record)).encode("utf-8")
+
+        selected = self._select(resource, query)
+        per_page = max(1, min(self.config.max_per_page, int(query.get("per_page", 10))))
+        page = max(1, int(query.get("page", 1)))
+        chunk = [project(r) for r in selected[(page - 1) * per_page:page * per_page]]
+        body = json.dumps(chunk).encode("utf-8")
+        headers = {"X-WP-Total": str(len(selected)), "X-WP-TotalPages": str(math.ceil(len(selected) / per_page))}
+        with self._lock:
+            self.stats.pages += 1
+            self.stats.records += len(chunk)
+            self.stats.bytes_sent += len(body)
+            self.stats.per_resource[resource] = self.stats.per_resource.get(resource, 0) + 1
+        return 200, headers, body
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                status, headers, body = server.handle(url.path, query)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return Handler
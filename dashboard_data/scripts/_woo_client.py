@@ -2,11 +2,153 @@ from __future__ import annotations
 
 import os
 import time
+import queue
 import logging
-from typing import Dict, Iterator, List, Optional
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
 
 import requests
 from requests import Response
+from requests.adapters import HTTPAdapter
+
+
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+def fields_param(fields: Optional[Sequence[str]]) -> Optional[str]:
+    """Zet een veldprojectie om naar de waarde voor de ``_fields`` query parameter."""
+    if not fields:
+        return None
+    return ",".join(dict.fromkeys(f.strip() for f in fields if f and f.strip()))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse een Retry-After header (seconden of HTTP-datum) naar seconden."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def date_slices(start: datetime, end: datetime, slices: int) -> List[Tuple[datetime, datetime]]:
+    """Verdeel ``[start, end)`` in ``slices`` even lange, aansluitende tijdvakken."""
+    slices = max(1, int(slices))
+    step = (end - start) / slices
+    bounds = [start + step * i for i in range(slices)] + [end]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _format_gmt(value: datetime) -> str:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+class AdaptiveRateLimiter:
+    """Thread-safe limiter die de pauze tussen requests aanpast aan de shop.
+
+    Zolang de shop niet throttlet is er geen pauze (``min_delay``) en lopen de
+    workers vrij parallel. Bij 429/503 (of een Retry-After header) wordt de
+    pauze minstens ``min_backoff_delay`` en daarna vermenigvuldigd met
+    ``backoff_factor``; na ``success_threshold`` opeenvolgende successen wordt
+    de pauze weer verkleind met ``speedup_factor``, zodat één 503 na een paar
+    tientallen requests is uitgewerkt.
+    """
+
+    def __init__(
+        self,
+        initial_delay: float = 0.0,
+        min_delay: float = 0.0,
+        max_delay: float = 60.0,
+        backoff_factor: float = 2.0,
+        min_backoff_delay: float = 0.5,
+        speedup_factor: float = 0.5,
+        success_threshold: int = 5,
+        log_interval_seconds: float = 30.0,
+    ) -> None:
+        self.min_delay = max(0.0, min_delay)
+        self.max_delay = max(self.min_delay, max_delay)
+        self.delay = min(max(initial_delay, self.min_delay), self.max_delay)
+        self.backoff_factor = backoff_factor
+        self.min_backoff_delay = min_backoff_delay
+        self.speedup_factor = speedup_factor
+        self.success_threshold = success_threshold
+        self.log_interval_seconds = log_interval_seconds
+
+        self._lock = threading.Lock()
+        self._next_allowed = 0.0
+        self._consecutive_successes = 0
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+        self.total_requests = 0
+        self.backoff_events = 0
+
+    def wait(self) -> None:
+        """Blokkeer tot de volgende request mag starten."""
+        if self.delay <= 0 and self._next_allowed <= time.monotonic():
+            # Geen throttling actief: requests niet onderling spreiden
+            return
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_allowed)
+            self._next_allowed = start_at + self.delay
+        if start_at > now:
+            time.sleep(start_at - now)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self._record_request()
+            self._consecutive_successes += 1
+            if self._consecutive_successes >= self.success_threshold and self.delay > self.min_delay:
+                old_delay = self.delay
+                self.delay = max(self.min_delay, self.delay * self.speedup_factor)
+                if self.delay < 0.01:
+                    self.delay = self.min_delay
+                self._consecutive_successes = 0
+                logging.info(f"Rate limiter: versnellen, pauze {old_delay:.2f}s -> {self.delay:.2f}s")
+
+    def on_throttle(self, status_code: int, retry_after: Optional[float] = None) -> None:
+        """Verwerk een 429/503 en stel de volgende request minstens Retry-After uit."""
+        with self._lock:
+            self._record_request()
+            self.backoff_events += 1
+            self._consecutive_successes = 0
+            old_delay = self.delay
+            self.delay = min(self.max_delay, max(self.min_backoff_delay, self.delay * self.backoff_factor))
+            wait_seconds = self.delay if retry_after is None else min(self.max_delay, max(retry_after, self.delay))
+            self._next_allowed = max(self._next_allowed, time.monotonic() + wait_seconds)
+            logging.warning(
+                f"Rate limiter: HTTP {status_code} ontvangen (Retry-After={retry_after}), "
+                f"pauze {old_delay:.2f}s -> {self.delay:.2f}s, wachten {wait_seconds:.2f}s "
+                f"(backoffs: {self.backoff_events})"
+            )
+
+    def _record_request(self) -> None:
+        self.total_requests += 1
+        self._window_requests += 1
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed >= self.log_interval_seconds:
+            logging.info(
+                f"Rate limiter: {self._window_requests / elapsed:.2f} requests/s over {elapsed:.0f}s "
+                f"(pauze {self.delay:.2f}s, totaal {self.total_requests} requests, backoffs {self.backoff_events})"
+            )
+            self._window_start = now
+            self._window_requests = 0
 
 
 class WooClient:
@@ -18,6 +160,9 @@ class WooClient:
         api_version: str = "wc/v3",
         timeout_seconds: float = 60.0,
         rate_limit_sleep_seconds: float = 0.5,
+        max_workers: int = 1,
+        pool_size: Optional[int] = None,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
     ) -> None:
         self.base_url = base_url.rstrip("/")
         self.consumer_key = consumer_key
@@ -25,14 +170,53 @@ class WooClient:
         self.api_version = api_version.strip("/")
         self.timeout_seconds = timeout_seconds
         self.rate_limit_sleep_seconds = rate_limit_sleep_seconds
+        self.max_workers = max(1, int(max_workers))
+        # Start zonder pauze; rate_limit_sleep_seconds is de pauze na de eerste 429/503
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(min_backoff_delay=rate_limit_sleep_seconds or 0.5)
+        
+        # Payload statistieken, om het effect van _fields projecties te kunnen meten
+        self._stats_lock = threading.Lock()
+        self.payload_bytes = 0
+        self.parse_seconds = 0.0
+        self.parsed_responses = 0
+        
+        # Eén keep-alive sessie met connection pool, zodat pagina's geen nieuwe TCP/TLS handshake kosten
+        self.pool_size = pool_size or max(10, self.max_workers)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self) -> None:
+        limiter = self.rate_limiter
+        logging.info(f"WooClient gesloten: {limiter.total_requests} requests, {limiter.backoff_events} backoffs, eind-pauze {limiter.delay:.2f}s")
+        logging.info(
+            f"WooClient payload: {self.parsed_responses} responses, {self.payload_bytes / 1024 / 1024:.1f} MB, "
+            f"JSON parse {self.parse_seconds:.2f}s"
+        )
+        self.session.close()
+
+    def parse_json(self, resp: Response) -> Any:
+        """Parse de JSON body en houd payload grootte en parse tijd bij."""
+        started = time.perf_counter()
+        data = resp.json()
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self.payload_bytes += len(resp.content)
+            self.parse_seconds += elapsed
+            self.parsed_responses += 1
+        return data
 
     def _make_url(self, resource_path: str, api_version: Optional[str] = None) -> str:
         resource = resource_path.strip("/")
         version = api_version or self.api_version
         return f"{self.base_url}/wp-json/{version}/{resource}"
 
-    def get(self, resource_path: str, params: Optional[Dict[str, str]] = None, max_retries: int = 3, api_version: Optional[str] = None) -> Response:
+    def get(self, resource_path: str, params: Optional[Dict[str, str]] = None, max_retries: int = 3, api_version: Optional[str] = None, fields: Optional[Sequence[str]] = None) -> Response:
+        """GET op een resource; ``fields`` beperkt de response via ``_fields``."""
         params = params.copy() if params else {}
+        if fields_param(fields):
+            params["_fields"] = fields_param(fields)
         params.update({
             "consumer_key": self.consumer_key,
             "consumer_secret": self.consumer_secret,
@@ -41,10 +225,15 @@ class WooClient:
         
         for attempt in range(max_retries):
             try:
-                resp = requests.get(url, params=params, timeout=self.timeout_seconds)
-                if self.rate_limit_sleep_seconds > 0:
-                    time.sleep(self.rate_limit_sleep_seconds)
+                self.rate_limiter.wait()
+                resp = self.session.get(url, params=params, timeout=self.timeout_seconds)
+                if resp.status_code in THROTTLE_STATUS_CODES:
+                    # De limiter schuift de volgende toegestane start op; wait() slaapt bij de retry
+                    self.rate_limiter.on_throttle(resp.status_code, parse_retry_after(resp.headers.get("Retry-After")))
+                    if attempt < max_retries - 1:
+                        continue
                 resp.raise_for_status()
+                self.rate_limiter.on_success()
                 return resp
             except (requests.exceptions.ReadTimeout, requests.exceptions.ConnectTimeout) as e:
                 if attempt < max_retries - 1:
@@ -54,19 +243,44 @@ class WooClient:
             except Exception as e:
                 raise e
 
-    def paginate(self, resource_path: str, params: Optional[Dict[str, str]] = None, per_page: int = 100, api_version: Optional[str] = None) -> Iterator[List[dict]]:
-        page = 1
-        total_items = 0
-        logging.info(f"Start pagineren van {resource_path} (per_page={per_page})")
+    def _page_params(self, params: Optional[Dict[str, str]], per_page: int, page: int) -> Dict[str, str]:
+        page_params: Dict[str, str] = {"per_page": str(per_page), "page": str(page)}
+        if params:
+            page_params.update({k: str(v) for k, v in params.items()})
+        return page_params
+
+    def _fetch_page(self, resource_path: str, params: Optional[Dict[str, str]], per_page: int, page: int, api_version: Optional[str] = None) -> Response:
+        logging.info(f"Ophalen pagina {page} van {resource_path}...")
+        return self.get(resource_path, self._page_params(params, per_page, page), api_version=api_version)
+
+    def paginate(self, resource_path: str, params: Optional[Dict[str, str]] = None, per_page: int = 100, api_version: Optional[str] = None, max_workers: Optional[int] = None, start_page: int = 1, fields: Optional[Sequence[str]] = None) -> Iterator[List[dict]]:
+        """Yield pagina's van een WooCommerce resource, altijd in paginavolgorde.
+
+        Met ``max_workers`` > 1 (of ``self.max_workers``) wordt het totaal aantal
+        pagina's uit de ``X-WP-TotalPages`` header van de eerste response gelezen en
+        worden de overige pagina's parallel opgehaald. ``start_page`` laat een
+        onderbroken run verder gaan vanaf een checkpoint. ``fields`` wordt als
+        ``_fields`` meegestuurd zodat alleen de gebruikte velden over de lijn gaan;
+        een ``_fields`` in ``params`` gaat voor.
+        """
+        if params and "per_page" in params:
+            per_page = int(params["per_page"])
+        if fields_param(fields) and not (params and "_fields" in params):
+            params = {**(params or {}), "_fields": fields_param(fields)}
+        workers = self.max_workers if max_workers is None else max(1, int(max_workers))
+        if workers > 1:
+            yield from self._paginate_concurrent(resource_path, params, per_page, api_version, workers, start_page)
+        else:
+            yield from self._paginate_sequential(resource_path, params, per_page, api_version, start_page=start_page)
+
+    def _paginate_sequential(self, resource_path: str, params: Optional[Dict[str, str]] = None, per_page: int = 100, api_version: Optional[str] = None, start_page: int = 1, total_items: int = 0) -> Iterator[List[dict]]:
+        page = start_page
+        if total_items == 0:
+            logging.info(f"Start pagineren van {resource_path} vanaf pagina {start_page} (per_page={per_page})")
         
         while True:
-            page_params: Dict[str, str] = {"per_page": str(per_page), "page": str(page)}
-            if params:
-                page_params.update({k: str(v) for k, v in params.items()})
-            
-            logging.info(f"Ophalen pagina {page} van {resource_path}...")
-            resp = self.get(resource_path, page_params, api_version=api_version)
-            data = resp.json()
+            resp = self._fetch_page(resource_path, params, per_page, page, api_version)
+            data = self.parse_json(resp)
             
             if not isinstance(data, list):
                 logging.warning(f"Onverwacht response type voor {resource_path} pagina {page}: {type(data)}")
@@ -79,3 +293,143 @@ class WooClient:
             logging.info(f"Pagina {page}: {len(data)} items ontvangen (totaal: {total_items})")
             yield data
             page += 1
+
+    def _paginate_concurrent(self, resource_path: str, params: Optional[Dict[str, str]], per_page: int, api_version: Optional[str], workers: int, start_page: int = 1) -> Iterator[List[dict]]:
+        logging.info(f"Start parallel pagineren van {resource_path} vanaf pagina {start_page} (per_page={per_page}, workers={workers})")
+        
+        first = self._fetch_page(resource_path, params, per_page, start_page, api_version)
+        data = self.parse_json(first)
+        if not isinstance(data, list):
+            logging.warning(f"Onverwacht response type voor {resource_path} pagina {start_page}: {type(data)}")
+            return
+        if len(data) == 0:
+            logging.info(f"Geen data gevonden voor {resource_path}")
+            return
+        
+        total_items = len(data)
+        try:
+            total_pages = int(first.headers.get("X-WP-TotalPages", ""))
+        except ValueError:
+            total_pages = 0
+        total_header = first.headers.get("X-WP-Total")
+        logging.info(f"Pagina {start_page}: {len(data)} items ontvangen (X-WP-Total={total_header}, X-WP-TotalPages={total_pages or 'onbekend'})")
+        yield data
+        
+        if total_pages <= 0:
+            # Zonder paginatie headers terugvallen op sequentieel ophalen
+            logging.warning(f"Geen X-WP-TotalPages header voor {resource_path}, verder sequentieel")
+            yield from self._paginate_sequential(resource_path, params, per_page, api_version, start_page=start_page + 1, total_items=total_items)
+            return
+        
+        last_len = len(data)
+        next_page = start_page + 1
+        pending: Deque[Future] = deque()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                # Maximaal 2x workers pagina's tegelijk in de lucht om geheugen te begrenzen
+                while next_page <= total_pages or pending:
+                    while next_page <= total_pages and len(pending) < workers * 2:
+                        pending.append(executor.submit(self._fetch_page, resource_path, params, per_page, next_page, api_version))
+                        next_page += 1
+                    
+                    page_number = next_page - len(pending)
+                    page_data = self.parse_json(pending.popleft().result())
+                    if not isinstance(page_data, list):
+                        logging.warning(f"Onverwacht response type voor {resource_path} pagina {page_number}: {type(page_data)}")
+                        return
+                    if len(page_data) == 0:
+                        logging.info(f"Geen data meer gevonden op pagina {page_number}, stoppen met pagineren")
+                        return
+                    
+                    total_items += len(page_data)
+                    last_len = len(page_data)
+                    logging.info(f"Pagina {page_number}/{total_pages}: {len(page_data)} items ontvangen (totaal: {total_items})")
+                    yield page_data
+            finally:
+                for future in pending:
+                    future.cancel()
+        
+        # Records die tijdens het pagineren zijn bijgekomen staan op extra pagina's
+        if last_len >= per_page:
+            yield from self._paginate_sequential(resource_path, params, per_page, api_version, start_page=total_pages + 1, total_items=total_items)
+
+    def backfill(self, resource_path: str, start: datetime, end: datetime, slices: int, params: Optional[Dict[str, str]] = None, per_page: int = 100, api_version: Optional[str] = None, max_workers: Optional[int] = None, fields: Optional[Sequence[str]] = None) -> Iterator[List[dict]]:
+        """Yield een datumbereik in ``slices`` tijdvakken die parallel gepagineerd worden.
+
+        Elk tijdvak pagineert zelf sequentieel met ``after``/``before`` (GMT);
+        ``max_workers`` (standaard ``self.max_workers``) is het totaal aantal
+        tijdvakken dat tegelijk loopt. WooCommerce filtert exclusief op
+        ``after``/``before``, dus elk vak begint een seconde eerder zodat records
+        op een grens niet wegvallen; dubbel binnengekomen records worden op ID
+        ontdubbeld. Pagina's komen niet in datumvolgorde binnen.
+        """
+        workers = self.max_workers if max_workers is None else max(1, int(max_workers))
+        windows = date_slices(start, end, slices)
+        base_params = dict(params or {})
+        if "per_page" in base_params:
+            per_page = int(base_params["per_page"])
+        if fields_param(fields) and "_fields" not in base_params:
+            base_params["_fields"] = fields_param(fields)
+        logging.info(f"Start backfill van {resource_path} van {_format_gmt(start)} tot {_format_gmt(end)} in {len(windows)} tijdvakken (workers={workers})")
+        
+        results: "queue.Queue" = queue.Queue(maxsize=workers * 2)
+        stop = threading.Event()
+        
+        def put(item: Tuple[str, Any]) -> bool:
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def fetch_window(index: int, after: datetime, before: datetime) -> None:
+            window_params = {
+                **base_params,
+                "after": _format_gmt(after - timedelta(seconds=1)),
+                "before": _format_gmt(before),
+                "dates_are_gmt": "true",
+            }
+            try:
+                count = 0
+                for page in self._paginate_sequential(resource_path, window_params, per_page, api_version):
+                    if not put(("page", page)):
+                        return
+                    count += len(page)
+                logging.info(f"Tijdvak {index}/{len(windows)} ({window_params['after']} - {window_params['before']}): {count} records")
+                put(("done", None))
+            except BaseException as e:
+                put(("error", e))
+        
+        seen_ids = set()
+        finished = 0
+        total_items = 0
+        duplicates = 0
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for index, (after, before) in enumerate(windows, 1):
+                executor.submit(fetch_window, index, after, before)
+            while finished < len(windows):
+                kind, payload = results.get()
+                if kind == "done":
+                    finished += 1
+                    continue
+                if kind == "error":
+                    raise payload
+                unique = []
+                for record in payload:
+                    record_id = record.get("id") if isinstance(record, dict) else None
+                    if record_id is not None:
+                        if record_id in seen_ids:
+                            duplicates += 1
+                            continue
+                        seen_ids.add(record_id)
+                    unique.append(record)
+                if unique:
+                    total_items += len(unique)
+                    yield unique
+        finally:
+            stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+        logging.info(f"Backfill van {resource_path} klaar: {total_items} unieke records, {duplicates} dubbele overgeslagen")
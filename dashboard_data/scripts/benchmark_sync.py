@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""Benchmark van de dashboard sync tegen een lokale fake WooCommerce server.
+
+Draait de tabel-updates van ``update_all`` of ``update_all_from_woo`` tegen
+``_fake_woo.FakeWooServer`` (synthetische of opgenomen data) en een in-memory
+stand-in voor de pyodbc connectie, en rapporteert per stap pagina's/s, rijen/s,
+HTTP- en databasetijd, plus de piek RSS van het proces. Met ``--output`` en
+``--baseline`` worden resultaten bewaard en vergeleken, zodat een regressie
+zichtbaar is voor een deploy.
+
+    python benchmark_sync.py --orders 5000 --latency-ms 80 --error-rate 0.02
+    python benchmark_sync.py --output bench.json
+    python benchmark_sync.py --baseline bench.json --max-regression 0.2
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from _fake_woo import RESOURCES, FakeWooConfig, FakeWooServer, generate_records, load_fixtures
+from _woo_client import WooClient
+
+
+class FakeCursor:
+    """Stand-in voor een pyodbc cursor: telt statements en rijen, voert niets uit."""
+
+    def __init__(self, conn: "FakeConnection") -> None:
+        self.conn = conn
+        self.rowcount = -1
+        self.fast_executemany = False
+
+    def execute(self, sql: str, *params: Any) -> "FakeCursor":
+        self.conn._record(1, 0)
+        self.rowcount = 0
+        return self
+
+    def executemany(self, sql: str, seq_of_params: Any) -> None:
+        rows = len(list(seq_of_params))
+        self.conn._record(1, rows)
+        self.rowcount = rows
+
+    def fetchone(self) -> Optional[Tuple]:
+        return None
+
+    def fetchall(self) -> List[Tuple]:
+        return []
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "FakeCursor":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class FakeConnection:
+    """In-memory doel voor de sync; ``statement_latency_ms`` simuleert een round trip."""
+
+    def __init__(self, statement_latency_ms: float = 0.0, row_latency_us: float = 0.0) -> None:
+        self.statement_latency_ms = statement_latency_ms
+        self.row_latency_us = row_latency_us
+        self.statements = 0
+        self.rows_written = 0
+        self.commits = 0
+        self.db_seconds = 0.0
+
+    def _record(self, statements: int, rows: int) -> None:
+        started = time.perf_counter()
+        delay = statements * self.statement_latency_ms / 1000.0 + rows * self.row_latency_us / 1e6
+        if delay > 0:
+            time.sleep(delay)
+        self.statements += statements
+        self.rows_written += rows
+        self.db_seconds += time.perf_counter() - started
+
+    def cursor(self) -> FakeCursor:
+        return FakeCursor(self)
+
+    def commit(self) -> None:
+        self.commits += 1
+        self._record(1, 0)
+
+    def rollback(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux rapporteert KB, macOS bytes
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def table_steps(target: str, orders_days: int, orders_batch_size: int, orders_slices: int) -> List[Tuple[str, Callable]]:
+    if target == "update_all":
+        import update_all as module
+        return [
+            ("customers", module.update_customers),
+            ("products", module.update_products),
+            ("subscription_tables", lambda conn, woo: module.update_subscription_tables(conn, woo)),
+            ("orders", lambda conn, woo: module.update_orders(conn, woo, orders_days, orders_batch_size, slices=orders_slices)),
+        ]
+    import update_all_from_woo as module
+    return [
+        ("customers", module.update_customers),
+        ("products", module.update_products),
+        ("subscription_tables", lambda conn, woo: module.update_subscription_tables(conn, woo)),
+        ("orders", lambda conn, woo: module.update_orders(conn, woo, orders_days)),
+    ]
+
+
+def run_benchmark(args: Any) -> Dict[str, Any]:
+    if args.fixtures:
+        data = load_fixtures(args.fixtures)
+    else:
+        counts = {"customers": args.customers, "products": args.products, "subscriptions": args.subscriptions, "orders": args.orders}
+        data = {name: generate_records(name, counts[name], days=args.orders_days, seed=args.seed) for name in RESOURCES}
+    for name in RESOURCES:
+        data.setdefault(name, [])
+
+    config = FakeWooConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate, max_per_page=args.max_per_page, seed=args.seed)
+    results: Dict[str, Any] = {
+        "target": args.target,
+        "workers": args.workers,
+        "rate_limit_sleep": args.rate_limit_sleep if args.rate_limit_sleep is not None else "productie",
+        "steps": {},
+    }
+
+    with FakeWooServer(data, config) as server:
+        conn = FakeConnection(args.db_latency_ms, args.db_row_latency_us)
+        # Dezelfde constructor argumenten als update_all.py en update_all_from_woo.py, zodat de rate limiter meetelt
+        client_kwargs: Dict[str, Any] = {"max_workers": args.workers, "pool_size": args.pool_size}
+        if args.rate_limit_sleep is not None:
+            client_kwargs["rate_limit_sleep_seconds"] = args.rate_limit_sleep
+        woo_client = WooClient(server.base_url, "ck_bench", "cs_bench", **client_kwargs)
+        started_total = time.perf_counter()
+        try:
+            for name, step in table_steps(args.target, args.orders_days, args.orders_batch_size, args.orders_slices):
+                if name in args.skip:
+                    continue
+                pages_before, records_before = server.stats.pages, server.stats.records
+                rows_before, db_before = conn.rows_written, conn.db_seconds
+                bytes_before, parse_before = woo_client.payload_bytes, woo_client.parse_seconds
+                started = time.perf_counter()
+                step(conn, woo_client)
+                elapsed = time.perf_counter() - started
+                pages = server.stats.pages - pages_before
+                rows = conn.rows_written - rows_before
+                results["steps"][name] = {
+                    "seconds": round(elapsed, 3),
+                    "pages": pages,
+                    "records_fetched": server.stats.records - records_before,
+                    "rows_written": rows,
+                    "pages_per_second": round(pages / elapsed, 2) if elapsed else 0.0,
+                    "rows_per_second": round(rows / elapsed, 1) if elapsed else 0.0,
+                    "payload_mb": round((woo_client.payload_bytes - bytes_before) / 1024 / 1024, 2),
+                    "parse_seconds": round(woo_client.parse_seconds - parse_before, 3),
+                    "db_seconds": round(conn.db_seconds - db_before, 3),
+                }
+        finally:
+            woo_client.close()
+        total = time.perf_counter() - started_total
+
+    results["total"] = {
+        "seconds": round(total, 3),
+        "pages": server.stats.pages,
+        "requests": server.stats.requests,
+        "injected_errors": server.stats.injected_errors,
+        "rows_written": conn.rows_written,
+        "statements": conn.statements,
+        "pages_per_second": round(server.stats.pages / total, 2) if total else 0.0,
+        "rows_per_second": round(conn.rows_written / total, 1) if total else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "limiter_backoffs": woo_client.rate_limiter.backoff_events,
+        "limiter_end_delay": round(woo_client.rate_limiter.delay, 3),
+    }
+    return results
+
+
+def report(results: Dict[str, Any]) -> None:
+    logging.info(f"Benchmark {results['target']} (workers={results['workers']}, rate limiter: {results.get('rate_limit_sleep', 'productie')})")
+    for name, step in results["steps"].items():
+        logging.info(
+            f"  {name:<20} {step['seconds']:>8.2f}s  {step['pages']:>5} pagina's ({step['pages_per_second']:.1f}/s)  "
+            f"{step['rows_written']:>7} rijen ({step['rows_per_second']:.0f}/s)  payload {step['payload_mb']:.1f} MB  "
+            f"parse {step['parse_seconds']:.2f}s  db {step['db_seconds']:.2f}s"
+        )
+    total = results["total"]
+    logging.info(
+        f"  {'totaal':<20} {total['seconds']:>8.2f}s  {total['pages']:>5} pagina's ({total['pages_per_second']:.1f}/s)  "
+        f"{total['rows_written']:>7} rijen ({total['rows_per_second']:.0f}/s)  {total['requests']} requests, "
+        f"{total['injected_errors']} geïnjecteerde fouten, piek RSS {total['peak_rss_mb'] or 0:.0f} MB"
+    )
+    logging.info(f"  rate limiter: {total.get('limiter_backoffs', 0)} backoffs, eind-pauze {total.get('limiter_end_delay', 0):.2f}s")
+
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Geef de stappen terug waarvan rijen/s meer dan ``max_regression`` is gedaald."""
+    regressions = []
+    for name, step in results["steps"].items():
+        old = baseline.get("steps", {}).get(name)
+        if not old or not old.get("rows_per_second"):
+            continue
+        change = step["rows_per_second"] / old["rows_per_second"] - 1
+        logging.info(f"  {name:<20} rijen/s {old['rows_per_second']:.0f} -> {step['rows_per_second']:.0f} ({change:+.0%})")
+        if change < -max_regression:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark de dashboard sync tegen een lokale fake WooCommerce server")
+    parser.add_argument("--target", choices=["update_all", "update_all_from_woo"], default="update_all", help="Welk sync script (standaard: update_all)")
+    parser.add_argument("--skip", nargs="+", default=[], help="Stappen om over te slaan (customers products subscription_tables orders)")
+    parser.add_argument("--fixtures", help="Map met opgenomen <resource>.json bestanden in plaats van synthetische data")
+    parser.add_argument("--customers", type=int, default=2000, help="Aantal synthetische customers (standaard: 2000)")
+    parser.add_argument("--products", type=int, default=200, help="Aantal synthetische products (standaard: 200)")
+    parser.add_argument("--subscriptions", type=int, default=2000, help="Aantal synthetische subscriptions (standaard: 2000)")
+    parser.add_argument("--orders", type=int, default=5000, help="Aantal synthetische orders (standaard: 5000)")
+    parser.add_argument("--orders-days", type=int, default=30, help="Orders venster in dagen (standaard: 30)")
+    parser.add_argument("--orders-batch-size", type=int, default=1000, help="Orders per database batch (alleen update_all, standaard: 1000)")
+    parser.add_argument("--orders-slices", type=int, default=1, help="Tijdvakken voor de orders backfill (alleen update_all, standaard: 1)")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WOO_MAX_WORKERS", "4")), help="WooClient max_workers (standaard: WOO_MAX_WORKERS of 4)")
+    parser.add_argument("--pool-size", type=int, default=int(os.environ.get("WOO_POOL_SIZE", "10")), help="WooClient pool_size (standaard: WOO_POOL_SIZE of 10, zoals de sync scripts)")
+    parser.add_argument("--rate-limit-sleep", type=float, default=None, help="WooClient rate_limit_sleep_seconds (standaard: de default van de sync scripts)")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Gesimuleerde API latency per request (standaard: 50)")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="Spreiding op de latency (standaard: 10)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fractie requests die 429/503 krijgt (standaard: 0)")
+    parser.add_argument("--max-per-page", type=int, default=100, help="Maximum per_page van de server (standaard: 100)")
+    parser.add_argument("--db-latency-ms", type=float, default=2.0, help="Gesimuleerde database round trip per statement (standaard: 2)")
+    parser.add_argument("--db-row-latency-us", type=float, default=20.0, help="Gesimuleerde database tijd per rij in microseconden (standaard: 20)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed voor synthetische data en foutinjectie")
+    parser.add_argument("--verbose", action="store_true", help="Ook de INFO logging van de sync tonen")
+    parser.add_argument("--output", help="Resultaten als JSON wegschrijven")
+    parser.add_argument("--baseline", help="Eerder --output bestand om tegen te vergelijken")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Toegestane daling in rijen/s t.o.v. de baseline (standaard: 0.2)")
+    args = parser.parse_args()
+
+    # De sync zelf logt per pagina; standaard alleen waarschuwingen tijdens de run
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    results = run_benchmark(args)
+    logging.getLogger().setLevel(logging.INFO)
+    report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        logging.info(f"Resultaten geschreven naar {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.max_regression)
+        if regressions:
+            logging.error(f"Regressie in rijen/s voor: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Meet het effect van _fields projecties op payload grootte en parse tijd.
+
+Haalt per resource dezelfde pagina's twee keer op: één keer volledig en één keer
+met de veldprojectie die update_all gebruikt, en toont bytes, download tijd en
+JSON parse tijd naast elkaar. Alleen lezen, er wordt niets naar SQL geschreven.
+
+    python measure_field_projection.py --pages 3 --per-page 50
+"""
+from __future__ import annotations
+
+import time
+import logging
+from typing import Dict, List, Optional
+
+from _woo_client import WooClient
+from update_all import (
+    CUSTOMER_FIELDS,
+    ORDER_FIELDS,
+    PRODUCT_FIELDS,
+    SUBSCRIPTION_TABLES,
+    get_woo_config_from_env,
+    subscription_fields,
+)
+
+
+PROJECTIONS: Dict[str, List[str]] = {
+    "customers": CUSTOMER_FIELDS,
+    "products": PRODUCT_FIELDS,
+    "subscriptions": subscription_fields(list(SUBSCRIPTION_TABLES)),
+    "orders": ORDER_FIELDS,
+}
+
+
+def measure(woo_client: WooClient, resource: str, pages: int, per_page: int, fields: Optional[List[str]]) -> Dict[str, float]:
+    totals = {"pages": 0, "records": 0, "bytes": 0, "download_seconds": 0.0, "parse_seconds": 0.0}
+    for page in range(1, pages + 1):
+        started = time.perf_counter()
+        resp = woo_client.get(resource, {"per_page": str(per_page), "page": str(page)}, fields=fields)
+        content = resp.content
+        totals["download_seconds"] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        data = resp.json()
+        totals["parse_seconds"] += time.perf_counter() - started
+
+        totals["pages"] += 1
+        totals["bytes"] += len(content)
+        totals["records"] += len(data) if isinstance(data, list) else 0
+        if not data:
+            break
+    return totals
+
+
+def compare(woo_client: WooClient, resources: List[str], pages: int, per_page: int) -> None:
+    for resource in resources:
+        full = measure(woo_client, resource, pages, per_page, None)
+        projected = measure(woo_client, resource, pages, per_page, PROJECTIONS[resource])
+        ratio = projected["bytes"] / full["bytes"] if full["bytes"] else 0.0
+        logging.info(
+            f"{resource}: {full['records']} records over {full['pages']} pagina's | "
+            f"volledig {full['bytes'] / 1024:.0f} KB, download {full['download_seconds']:.2f}s, parse {full['parse_seconds'] * 1000:.1f}ms | "
+            f"_fields {projected['bytes'] / 1024:.0f} KB, download {projected['download_seconds']:.2f}s, parse {projected['parse_seconds'] * 1000:.1f}ms | "
+            f"payload {ratio:.0%} van volledig"
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Vergelijk WooCommerce responses met en zonder _fields projectie")
+    parser.add_argument("--resources", nargs="+", choices=sorted(PROJECTIONS), default=sorted(PROJECTIONS), help="Te meten resources (standaard: alle)")
+    parser.add_argument("--pages", type=int, default=3, help="Aantal pagina's per resource (standaard: 3)")
+    parser.add_argument("--per-page", type=int, default=50, help="Records per pagina (standaard: 50)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    base_url, consumer_key, consumer_secret = get_woo_config_from_env()
+    woo_client = WooClient(base_url, consumer_key, consumer_secret)
+    try:
+        compare(woo_client, args.resources, args.pages, args.per_page)
+    finally:
+        woo_client.close()
@@ -3,10 +3,13 @@ from __future__ import annotations
 
 import os
 import sys
+import time
+import queue
 import logging
+import threading
 from dataclasses import dataclass
 from decimal import Decimal
-from typing import Dict, Iterator, List, Optional, Tuple, Any
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Any
 from datetime import datetime, timezone, timedelta
 
 import pyodbc
@@ -15,6 +18,7 @@ from dotenv import load_dotenv
 from dateutil import parser as date_parser
 
 from _woo_client import WooClient
+from _checkpoint import CheckpointStore
 
 load_dotenv()
 
@@ -227,6 +231,45 @@ class MontaClient:
 # CUSTOMERS UPDATE
 # ============================================================================
 
+# Velden die build_customer_rows leest; via _fields blijven meta_data en _links weg
+CUSTOMER_FIELDS = ["id", "email", "first_name", "last_name", "billing", "date_created"]
+
+
+def build_customer_rows(customer: dict) -> List[Tuple]:
+    """Bouw de Customers rij voor één WooCommerce customer of WordPress subscriber"""
+    try:
+        customer_id = int(customer.get("id"))
+        email = normalize_email(customer.get("email"))
+        first_name = (customer.get("first_name") or "").strip() or None
+        last_name = (customer.get("last_name") or "").strip() or None
+        phone = (customer.get("billing", {}).get("phone") or "").strip() or None
+        company = (customer.get("billing", {}).get("company") or "").strip() or None
+        date_registered = parse_dt(customer.get("date_created"))
+        
+        if customer_id and email:
+            return [(customer_id, email, first_name, last_name, phone, company, date_registered)]
+    except Exception as e:
+        logging.warning(f"Fout bij verwerken customer {customer.get('id')}: {e}")
+    return []
+
+
+def write_customers(conn: pyodbc.Connection, customers_data: List[Tuple], commit: bool = True) -> None:
+    if customers_data:
+        with conn.cursor() as cursor:
+            cursor.executemany(
+                """
+                INSERT INTO Customers (CustomerID, Email, FirstName, LastName, Phone, Company, DateRegistered)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                customers_data
+            )
+            if commit:
+                conn.commit()
+            logging.info(f"{len(customers_data)} customers ingevoegd")
+    else:
+        logging.warning("Geen customers gevonden")
+
+
 def update_customers(conn: pyodbc.Connection, woo_client: WooClient) -> None:
     """Update customers tabel - complete replace, inclusief WooCommerce customers en WordPress subscribers"""
     logging.info("Start bijwerken van customers...")
@@ -243,26 +286,13 @@ def update_customers(conn: pyodbc.Connection, woo_client: WooClient) -> None:
     # 1. Alle WooCommerce customers ophalen
     logging.info("Ophalen van WooCommerce customers...")
     woo_customers_count = 0
-    for page in woo_client.paginate("customers", per_page=50):
+    for page in woo_client.paginate("customers", per_page=50, fields=CUSTOMER_FIELDS):
         for customer in page:
-            try:
-                customer_id = int(customer.get("id"))
-                email = normalize_email(customer.get("email"))
-                first_name = (customer.get("first_name") or "").strip() or None
-                last_name = (customer.get("last_name") or "").strip() or None
-                phone = (customer.get("billing", {}).get("phone") or "").strip() or None
-                company = (customer.get("billing", {}).get("company") or "").strip() or None
-                date_registered = parse_dt(customer.get("date_created"))
-                
-                if customer_id and email and customer_id not in processed_user_ids:
-                    customers_data.append((
-                        customer_id, email, first_name, last_name, phone, company, date_registered
-                    ))
-                    processed_user_ids.add(customer_id)
+            for row in build_customer_rows(customer):
+                if row[0] not in processed_user_ids:
+                    customers_data.append(row)
+                    processed_user_ids.add(row[0])
                     woo_customers_count += 1
-            except Exception as e:
-                logging.warning(f"Fout bij verwerken WooCommerce customer {customer.get('id')}: {e}")
-                continue
     
     logging.info(f"{woo_customers_count} WooCommerce customers gevonden")
     
@@ -271,28 +301,14 @@ def update_customers(conn: pyodbc.Connection, woo_client: WooClient) -> None:
     subscribers_count = 0
     try:
         # WooCommerce customers endpoint met role=subscriber parameter gebruiken
-        for page in woo_client.paginate("customers", params={"role": "subscriber"}, per_page=50):
+        for page in woo_client.paginate("customers", params={"role": "subscriber"}, per_page=50, fields=CUSTOMER_FIELDS):
             for user in page:
-                try:
-                    user_id = int(user.get("id"))
-                    email = normalize_email(user.get("email"))
-                    
-                    # Alleen toevoegen als deze user nog niet als WooCommerce customer is toegevoegd
-                    if user_id and email and user_id not in processed_user_ids:
-                        first_name = (user.get("first_name") or "").strip() or None
-                        last_name = (user.get("last_name") or "").strip() or None
-                        phone = (user.get("billing", {}).get("phone") or "").strip() or None
-                        company = (user.get("billing", {}).get("company") or "").strip() or None
-                        date_registered = parse_dt(user.get("date_created"))
-                        
-                        customers_data.append((
-                            user_id, email, first_name, last_name, phone, company, date_registered
-                        ))
-                        processed_user_ids.add(user_id)
+                # Alleen toevoegen als deze user nog niet als WooCommerce customer is toegevoegd
+                for row in build_customer_rows(user):
+                    if row[0] not in processed_user_ids:
+                        customers_data.append(row)
+                        processed_user_ids.add(row[0])
                         subscribers_count += 1
-                except Exception as e:
-                    logging.warning(f"Fout bij verwerken WordPress subscriber {user.get('id')}: {e}")
-                    continue
     except Exception as e:
         logging.warning(f"Fout bij ophalen van WordPress subscribers via customers endpoint: {e}")
         logging.info("Mogelijk ondersteunt de WooCommerce versie geen role filtering op customers endpoint")
@@ -300,25 +316,64 @@ def update_customers(conn: pyodbc.Connection, woo_client: WooClient) -> None:
     logging.info(f"{subscribers_count} WordPress subscribers gevonden")
     
     # Alle customers (WooCommerce + subscribers) invoegen
+    write_customers(conn, customers_data)
     if customers_data:
+        logging.info(f"{len(customers_data)} totaal customers ({woo_customers_count} WooCommerce customers + {subscribers_count} subscribers)")
+
+
+# ============================================================================
+# PRODUCTS UPDATE
+# ============================================================================
+
+PRODUCT_FIELDS = [
+    "id", "name", "status", "sku", "regular_price", "sale_price", "tax_class",
+    "date_created", "date_modified", "type",
+]
+
+
+def build_product_rows(product: dict) -> List[Tuple]:
+    """Bouw de Products rij voor één WooCommerce product"""
+    try:
+        product_id = int(product.get("id"))
+        name = (product.get("name") or "").strip()
+        status = (product.get("status") or "").strip() or "publish"
+        product_type_taxonomy_id = None  # Niet beschikbaar in WooCommerce API
+        sku = (product.get("sku") or "").strip() or None
+        regular_price = to_decimal(product.get("regular_price")) or 0.0
+        sale_price = to_decimal(product.get("sale_price"))
+        tax_class = (product.get("tax_class") or "").strip() or None
+        created_date = parse_dt(product.get("date_created"))
+        modified_date = parse_dt(product.get("date_modified"))
+        product_type = (product.get("type") or "").strip() or None
+        
+        if product_id and name:
+            return [(
+                product_id, name, status, product_type_taxonomy_id, sku,
+                regular_price, sale_price, tax_class, created_date, modified_date, product_type
+            )]
+    except Exception as e:
+        logging.warning(f"Fout bij verwerken product {product.get('id')}: {e}")
+    return []
+
+
+def write_products(conn: pyodbc.Connection, products_data: List[Tuple], commit: bool = True) -> None:
+    if products_data:
         with conn.cursor() as cursor:
             cursor.executemany(
                 """
-                INSERT INTO Customers (CustomerID, Email, FirstName, LastName, Phone, Company, DateRegistered)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO Products (ProductID, Name, Status, ProductTypeTaxonomyID, SKU,
+                                   RegularPrice, SalePrice, TaxClass, CreatedDate, ModifiedDate, ProductType)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """,
-                customers_data
+                products_data
             )
-            conn.commit()
-            logging.info(f"{len(customers_data)} totaal customers ingevoegd ({woo_customers_count} WooCommerce customers + {subscribers_count} subscribers)")
+            if commit:
+                conn.commit()
+            logging.info(f"{len(products_data)} products ingevoegd")
     else:
-        logging.warning("Geen customers gevonden")
+        logging.warning("Geen products gevonden")
 
 
-# ============================================================================
-# PRODUCTS UPDATE
-# ============================================================================
-
 def update_products(conn: pyodbc.Connection, woo_client: WooClient) -> None:
     """Update products tabel - complete replace"""
     logging.info("Start bijwerken van products...")
@@ -331,45 +386,12 @@ def update_products(conn: pyodbc.Connection, woo_client: WooClient) -> None:
     
     # Alle products ophalen vanuit WooCommerce
     products_data = []
-    for page in woo_client.paginate("products", per_page=50):
+    for page in woo_client.paginate("products", per_page=50, fields=PRODUCT_FIELDS):
         for product in page:
-            try:
-                product_id = int(product.get("id"))
-                name = (product.get("name") or "").strip()
-                status = (product.get("status") or "").strip() or "publish"
-                product_type_taxonomy_id = None  # Niet beschikbaar in WooCommerce API
-                sku = (product.get("sku") or "").strip() or None
-                regular_price = to_decimal(product.get("regular_price")) or 0.0
-                sale_price = to_decimal(product.get("sale_price"))
-                tax_class = (product.get("tax_class") or "").strip() or None
-                created_date = parse_dt(product.get("date_created"))
-                modified_date = parse_dt(product.get("date_modified"))
-                product_type = (product.get("type") or "").strip() or None
-                
-                if product_id and name:
-                    products_data.append((
-                        product_id, name, status, product_type_taxonomy_id, sku,
-                        regular_price, sale_price, tax_class, created_date, modified_date, product_type
-                    ))
-            except Exception as e:
-                logging.warning(f"Fout bij verwerken product {product.get('id')}: {e}")
-                continue
+            products_data.extend(build_product_rows(product))
     
     # Products invoegen
-    if products_data:
-        with conn.cursor() as cursor:
-            cursor.executemany(
-                """
-                INSERT INTO Products (ProductID, Name, Status, ProductTypeTaxonomyID, SKU,
-                                   RegularPrice, SalePrice, TaxClass, CreatedDate, ModifiedDate, ProductType)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                products_data
-            )
-            conn.commit()
-            logging.info(f"{len(products_data)} products ingevoegd")
-    else:
-        logging.warning("Geen products gevonden")
+    write_products(conn, products_data)
 
 
 # ============================================================================
@@ -483,50 +505,106 @@ def update_stock(conn: pyodbc.Connection, monta_client: Optional[MontaClient], s
 
 
 # ============================================================================
-# SUBSCRIPTIONS UPDATE
+# SUBSCRIPTIONS UPDATE (subscriptions, items en shipping in één fetch)
 # ============================================================================
 
-def update_subscriptions(conn: pyodbc.Connection, woo_client: WooClient) -> None:
-    """Update subscriptions tabel - complete replace"""
-    logging.info("Start bijwerken van subscriptions...")
-    
-    # Tabel legen
-    with conn.cursor() as cursor:
-        cursor.execute("DELETE FROM Subscriptions")
-        conn.commit()
-        logging.info("Subscriptions tabel geleegd")
-    
-    # Alle subscriptions ophalen vanuit WooCommerce
-    subscriptions_data = []
-    for page in woo_client.paginate("subscriptions", per_page=50):
-        for subscription in page:
+SUBSCRIPTION_TABLES = ("subscriptions", "subscription_items", "subscription_shipping")
+
+
+def build_subscription_rows(subscription: dict) -> List[Tuple]:
+    """Bouw de Subscriptions rij voor één WooCommerce subscription"""
+    try:
+        subscription_id = int(subscription.get("id"))
+        status = (subscription.get("status") or "").strip() or "unknown"
+        customer_id = int((subscription.get("customer_id") or 0)) or None
+        billing_email = None
+        try:
+            billing_email = (subscription.get("billing") or {}).get("email") or None
+        except Exception:
+            pass
+        
+        interval = int((subscription.get("billing_interval") or 0)) or 0
+        period = (subscription.get("billing_period") or "").strip() or "month"
+        
+        start_date = parse_dt(subscription.get("date_created_gmt") or subscription.get("start_date_gmt"))
+        next_payment = parse_dt(subscription.get("next_payment_date_gmt") or subscription.get("next_payment_gmt"))
+        end_date = parse_dt(subscription.get("end_date_gmt") or subscription.get("date_completed_gmt"))
+        
+        if subscription_id:
+            return [(
+                subscription_id, status, customer_id, billing_email,
+                interval, period, start_date, next_payment, end_date
+            )]
+    except Exception as e:
+        logging.warning(f"Fout bij verwerken subscription {subscription.get('id')}: {e}")
+    return []
+
+
+def build_subscription_item_rows(subscription: dict) -> List[Tuple]:
+    """Bouw de SubscriptionItems rijen voor één WooCommerce subscription"""
+    rows = []
+    try:
+        subscription_id = int(subscription.get("id"))
+        line_items = subscription.get("line_items", [])
+        
+        for item in line_items:
             try:
-                subscription_id = int(subscription.get("id"))
-                status = (subscription.get("status") or "").strip() or "unknown"
-                customer_id = int((subscription.get("customer_id") or 0)) or None
-                billing_email = None
-                try:
-                    billing_email = (subscription.get("billing") or {}).get("email") or None
-                except Exception:
-                    pass
+                item_id = int(item.get("id"))
+                name = (item.get("name") or "").strip()
+                product_id = int((item.get("product_id") or 0)) or None
+                variation_id = int((item.get("variation_id") or 0)) or None
+                sku = (item.get("sku") or "").strip() or None
+                quantity = int((item.get("quantity") or 1))
                 
-                interval = int((subscription.get("billing_interval") or 0)) or 0
-                period = (subscription.get("billing_period") or "").strip() or "month"
+                subtotal = to_decimal(item.get("subtotal"))
+                subtotal_tax = to_decimal(item.get("subtotal_tax"))
+                total = to_decimal(item.get("total"))
+                total_tax = to_decimal(item.get("total_tax"))
+                tax_class = (item.get("tax_class") or "").strip() or None
+                tax_data = str(item.get("taxes", []))
                 
-                start_date = parse_dt(subscription.get("date_created_gmt") or subscription.get("start_date_gmt"))
-                next_payment = parse_dt(subscription.get("next_payment_date_gmt") or subscription.get("next_payment_gmt"))
-                end_date = parse_dt(subscription.get("end_date_gmt") or subscription.get("date_completed_gmt"))
+                if item_id and subscription_id:
+                    rows.append((
+                        item_id, subscription_id, "line_item", name, product_id, variation_id,
+                        sku, quantity, subtotal, subtotal_tax, total, total_tax, tax_class, tax_data
+                    ))
+            except Exception as e:
+                logging.warning(f"Fout bij verwerken subscription item {item.get('id')}: {e}")
+                continue
                 
-                if subscription_id:
-                    subscriptions_data.append((
-                        subscription_id, status, customer_id, billing_email,
-                        interval, period, start_date, next_payment, end_date
+    except Exception as e:
+        logging.warning(f"Fout bij verwerken subscription {subscription.get('id')}: {e}")
+    return rows
+
+
+def build_subscription_shipping_rows(subscription: dict) -> List[Tuple]:
+    """Bouw de SubscriptionShipping rijen voor één WooCommerce subscription"""
+    rows = []
+    try:
+        subscription_id = int(subscription.get("id"))
+        shipping_lines = subscription.get("shipping_lines", [])
+        
+        for shipping in shipping_lines:
+            try:
+                shipping_id = int(shipping.get("id"))
+                method_title = (shipping.get("method_title") or "").strip()
+                total = to_decimal(shipping.get("total"))
+                total_tax = to_decimal(shipping.get("total_tax"))
+                
+                if shipping_id and subscription_id:
+                    rows.append((
+                        shipping_id, subscription_id, method_title, total, total_tax
                     ))
             except Exception as e:
-                logging.warning(f"Fout bij verwerken subscription {subscription.get('id')}: {e}")
+                logging.warning(f"Fout bij verwerken subscription shipping {shipping.get('id')}: {e}")
                 continue
-    
-    # Subscriptions invoegen
+                
+    except Exception as e:
+        logging.warning(f"Fout bij verwerken subscription {subscription.get('id')}: {e}")
+    return rows
+
+
+def write_subscriptions(conn: pyodbc.Connection, subscriptions_data: List[Tuple], commit: bool = True) -> None:
     if subscriptions_data:
         with conn.cursor() as cursor:
             cursor.executemany(
@@ -537,65 +615,14 @@ def update_subscriptions(conn: pyodbc.Connection, woo_client: WooClient) -> None
                 """,
                 subscriptions_data
             )
-            conn.commit()
+            if commit:
+                conn.commit()
             logging.info(f"{len(subscriptions_data)} subscriptions ingevoegd")
     else:
         logging.warning("Geen subscriptions gevonden")
 
 
-# ============================================================================
-# SUBSCRIPTION ITEMS UPDATE
-# ============================================================================
-
-def update_subscription_items(conn: pyodbc.Connection, woo_client: WooClient) -> None:
-    """Update subscription items tabel - complete replace"""
-    logging.info("Start bijwerken van subscription items...")
-    
-    # Tabel legen
-    with conn.cursor() as cursor:
-        cursor.execute("DELETE FROM SubscriptionItems")
-        conn.commit()
-        logging.info("SubscriptionItems tabel geleegd")
-    
-    # Alle subscriptions ophalen om items op te halen
-    subscription_items_data = []
-    
-    for page in woo_client.paginate("subscriptions", per_page=50):
-        for subscription in page:
-            try:
-                subscription_id = int(subscription.get("id"))
-                line_items = subscription.get("line_items", [])
-                
-                for item in line_items:
-                    try:
-                        item_id = int(item.get("id"))
-                        name = (item.get("name") or "").strip()
-                        product_id = int((item.get("product_id") or 0)) or None
-                        variation_id = int((item.get("variation_id") or 0)) or None
-                        sku = (item.get("sku") or "").strip() or None
-                        quantity = int((item.get("quantity") or 1))
-                        
-                        subtotal = to_decimal(item.get("subtotal"))
-                        subtotal_tax = to_decimal(item.get("subtotal_tax"))
-                        total = to_decimal(item.get("total"))
-                        total_tax = to_decimal(item.get("total_tax"))
-                        tax_class = (item.get("tax_class") or "").strip() or None
-                        tax_data = str(item.get("taxes", []))
-                        
-                        if item_id and subscription_id:
-                            subscription_items_data.append((
-                                item_id, subscription_id, "line_item", name, product_id, variation_id,
-                                sku, quantity, subtotal, subtotal_tax, total, total_tax, tax_class, tax_data
-                            ))
-                    except Exception as e:
-                        logging.warning(f"Fout bij verwerken subscription item {item.get('id')}: {e}")
-                        continue
-                        
-            except Exception as e:
-                logging.warning(f"Fout bij verwerken subscription {subscription.get('id')}: {e}")
-                continue
-    
-    # Subscription items invoegen
+def write_subscription_items(conn: pyodbc.Connection, subscription_items_data: List[Tuple], commit: bool = True) -> None:
     if subscription_items_data:
         with conn.cursor() as cursor:
             cursor.executemany(
@@ -608,55 +635,14 @@ def update_subscription_items(conn: pyodbc.Connection, woo_client: WooClient) ->
                 """,
                 subscription_items_data
             )
-            conn.commit()
+            if commit:
+                conn.commit()
             logging.info(f"{len(subscription_items_data)} subscription items ingevoegd")
     else:
         logging.warning("Geen subscription items gevonden")
 
 
-# ============================================================================
-# SUBSCRIPTION SHIPPING UPDATE
-# ============================================================================
-
-def update_subscription_shipping(conn: pyodbc.Connection, woo_client: WooClient) -> None:
-    """Update subscription shipping tabel - complete replace"""
-    logging.info("Start bijwerken van subscription shipping...")
-    
-    # Tabel legen
-    with conn.cursor() as cursor:
-        cursor.execute("DELETE FROM SubscriptionShipping")
-        conn.commit()
-        logging.info("SubscriptionShipping tabel geleegd")
-    
-    # Alle subscriptions ophalen om shipping op te halen
-    subscription_shipping_data = []
-    
-    for page in woo_client.paginate("subscriptions", per_page=50):
-        for subscription in page:
-            try:
-                subscription_id = int(subscription.get("id"))
-                shipping_lines = subscription.get("shipping_lines", [])
-                
-                for shipping in shipping_lines:
-                    try:
-                        shipping_id = int(shipping.get("id"))
-                        method_title = (shipping.get("method_title") or "").strip()
-                        total = to_decimal(shipping.get("total"))
-                        total_tax = to_decimal(shipping.get("total_tax"))
-                        
-                        if shipping_id and subscription_id:
-                            subscription_shipping_data.append((
-                                shipping_id, subscription_id, method_title, total, total_tax
-                            ))
-                    except Exception as e:
-                        logging.warning(f"Fout bij verwerken subscription shipping {shipping.get('id')}: {e}")
-                        continue
-                        
-            except Exception as e:
-                logging.warning(f"Fout bij verwerken subscription {subscription.get('id')}: {e}")
-                continue
-    
-    # Subscription shipping invoegen
+def write_subscription_shipping(conn: pyodbc.Connection, subscription_shipping_data: List[Tuple], commit: bool = True) -> None:
     if subscription_shipping_data:
         with conn.cursor() as cursor:
             cursor.executemany(
@@ -667,18 +653,568 @@ def update_subscription_shipping(conn: pyodbc.Connection, woo_client: WooClient)
                 """,
                 subscription_shipping_data
             )
-            conn.commit()
+            if commit:
+                conn.commit()
             logging.info(f"{len(subscription_shipping_data)} subscription shipping records ingevoegd")
     else:
         logging.warning("Geen subscription shipping gevonden")
 
 
+# Per tabel: (SQL tabelnaam, row builder, writer)
+SUBSCRIPTION_FANOUT = {
+    "subscriptions": ("Subscriptions", build_subscription_rows, write_subscriptions),
+    "subscription_items": ("SubscriptionItems", build_subscription_item_rows, write_subscription_items),
+    "subscription_shipping": ("SubscriptionShipping", build_subscription_shipping_rows, write_subscription_shipping),
+}
+
+# Velden per builder; de fetch vraagt de vereniging op van de tabellen die bijgewerkt worden
+SUBSCRIPTION_FIELDS = {
+    "subscriptions": [
+        "id", "status", "customer_id", "billing", "billing_interval", "billing_period",
+        "date_created_gmt", "start_date_gmt", "next_payment_date_gmt", "next_payment_gmt",
+        "end_date_gmt", "date_completed_gmt",
+    ],
+    "subscription_items": ["id", "line_items"],
+    "subscription_shipping": ["id", "shipping_lines"],
+}
+
+
+def subscription_fields(tables: List[str]) -> List[str]:
+    return [field for table in tables for field in SUBSCRIPTION_FIELDS[table]]
+
+
+def update_subscription_tables(conn: pyodbc.Connection, woo_client: WooClient, tables: Optional[List[str]] = None) -> None:
+    """Update subscription tabellen - complete replace, met één paginering over subscriptions
+    
+    Elke pagina wordt één keer opgehaald en naar de row builders van alle gevraagde
+    tabellen gestuurd, in plaats van een aparte volledige download per tabel.
+    
+    Args:
+        conn: Database connectie
+        woo_client: WooCommerce client
+        tables: Subset van SUBSCRIPTION_TABLES (standaard alle drie)
+    """
+    tables = [t for t in SUBSCRIPTION_TABLES if tables is None or t in tables]
+    if not tables:
+        logging.info("Geen subscription tabellen om bij te werken")
+        return
+    logging.info(f"Start bijwerken van {', '.join(tables)} (één fetch)...")
+    
+    # Tabellen legen
+    with conn.cursor() as cursor:
+        for table in tables:
+            sql_table = SUBSCRIPTION_FANOUT[table][0]
+            cursor.execute(f"DELETE FROM {sql_table}")
+            logging.info(f"{sql_table} tabel geleegd")
+        conn.commit()
+    
+    # Alle subscriptions één keer ophalen en naar elke builder sturen
+    rows: Dict[str, List[Tuple]] = {table: [] for table in tables}
+    for page in woo_client.paginate("subscriptions", per_page=50, fields=subscription_fields(tables)):
+        for subscription in page:
+            for table in tables:
+                rows[table].extend(SUBSCRIPTION_FANOUT[table][1](subscription))
+    
+    # Per tabel invoegen
+    for table in tables:
+        SUBSCRIPTION_FANOUT[table][2](conn, rows[table])
+
+
+def update_subscriptions(conn: pyodbc.Connection, woo_client: WooClient) -> None:
+    """Update subscriptions tabel - complete replace"""
+    update_subscription_tables(conn, woo_client, ["subscriptions"])
+
+
+def update_subscription_items(conn: pyodbc.Connection, woo_client: WooClient) -> None:
+    """Update subscription items tabel - complete replace"""
+    update_subscription_tables(conn, woo_client, ["subscription_items"])
+
+
+def update_subscription_shipping(conn: pyodbc.Connection, woo_client: WooClient) -> None:
+    """Update subscription shipping tabel - complete replace"""
+    update_subscription_tables(conn, woo_client, ["subscription_shipping"])
+
+
+# ============================================================================
+# INCREMENTELE SYNC (high-water mark per tabel)
+# ============================================================================
+
+# Marge op de high-water mark voor records die in dezelfde seconde gewijzigd zijn
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+
+@dataclass
+class IncrementalTarget:
+    """Doeltabel voor incrementele sync: rijen worden per resource-ID vervangen"""
+    sql_table: str
+    id_column: str
+    build_rows: Callable[[dict], List[Tuple]]
+    write_rows: Callable[..., None]  # (conn, rows, commit=False) zodat delete en insert één transactie zijn
+
+
+def ensure_sync_state_table(conn: pyodbc.Connection) -> None:
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            IF OBJECT_ID(N'[dbo].[SyncState]', N'U') IS NULL
+            BEGIN
+                CREATE TABLE [dbo].[SyncState] (
+                    [TableName] NVARCHAR(100) NOT NULL PRIMARY KEY,
+                    [HighWaterMark] DATETIME2(0) NULL,
+                    [LastFullSync] DATETIME2(0) NULL,
+                    [UpdatedAt] DATETIME2(0) NOT NULL DEFAULT SYSUTCDATETIME()
+                );
+            END;
+            """
+        )
+        conn.commit()
+
+
+def get_sync_state(conn: pyodbc.Connection, table_name: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Geef (HighWaterMark, LastFullSync) terug voor een tabel, beide in UTC"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT HighWaterMark, LastFullSync FROM SyncState WHERE TableName = ?", table_name)
+        row = cursor.fetchone()
+    if not row:
+        return None, None
+    return row[0], row[1]
+
+
+def set_sync_state(conn: pyodbc.Connection, table_name: str, high_water_mark: Optional[datetime], full_sync: bool) -> None:
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            MERGE SyncState AS target
+            USING (SELECT ? AS TableName, ? AS HighWaterMark, ? AS FullSync) AS source
+               ON target.TableName = source.TableName
+            WHEN MATCHED THEN UPDATE SET
+                HighWaterMark = COALESCE(source.HighWaterMark, target.HighWaterMark),
+                LastFullSync = CASE WHEN source.FullSync = 1 THEN SYSUTCDATETIME() ELSE target.LastFullSync END,
+                UpdatedAt = SYSUTCDATETIME()
+            WHEN NOT MATCHED THEN INSERT (TableName, HighWaterMark, LastFullSync, UpdatedAt)
+                VALUES (source.TableName, source.HighWaterMark,
+                        CASE WHEN source.FullSync = 1 THEN SYSUTCDATETIME() ELSE NULL END, SYSUTCDATETIME());
+            """,
+            table_name, high_water_mark, 1 if full_sync else 0
+        )
+        conn.commit()
+
+
+def get_modified_gmt(record: dict) -> Optional[datetime]:
+    value = record.get("date_modified_gmt") or record.get("date_modified")
+    if is_nullish(value):
+        return None
+    try:
+        return date_parser.parse(value).replace(tzinfo=None)
+    except Exception:
+        return None
+
+
+def delete_by_ids(cursor: pyodbc.Cursor, sql_table: str, id_column: str, ids: List[int]) -> int:
+    deleted = 0
+    # SQL Server staat maximaal 2100 parameters per statement toe
+    for start in range(0, len(ids), 1000):
+        chunk = ids[start:start + 1000]
+        placeholders = ",".join(["?" for _ in chunk])
+        cursor.execute(f"DELETE FROM {sql_table} WHERE {id_column} IN ({placeholders})", chunk)
+        deleted += max(cursor.rowcount, 0)
+    return deleted
+
+
+def reconcile_deletions(conn: pyodbc.Connection, woo_client: WooClient, fetches: List[Tuple[str, Dict[str, str]]], targets: List[IncrementalTarget]) -> bool:
+    """Verwijder rijen waarvan de resource niet meer in WooCommerce bestaat
+    
+    Haalt alleen de IDs op (_fields=id). Retourneert False als een fetch mislukt, zodat er nooit op basis van een onvolledige ID-lijst wordt verwijderd.
+    """
+    remote_ids = set()
+    for resource, params in fetches:
+        try:
+            for page in woo_client.paginate(resource, params={**params, "_fields": "id"}, per_page=100):
+                remote_ids.update(int(record["id"]) for record in page if record.get("id"))
+        except Exception as e:
+            logging.warning(f"Reconcile van {resource} {params} mislukt, geen verwijderingen uitgevoerd: {e}")
+            return False
+    
+    primary = targets[0]
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT DISTINCT {primary.id_column} FROM {primary.sql_table} WHERE {primary.id_column} IS NOT NULL")
+        local_ids = {int(row[0]) for row in cursor.fetchall()}
+        
+        missing_ids = sorted(local_ids - remote_ids)
+        for target in targets:
+            if missing_ids:
+                deleted = delete_by_ids(cursor, target.sql_table, target.id_column, missing_ids)
+                logging.info(f"Reconcile {target.sql_table}: {deleted} verwijderde records opgeruimd")
+        conn.commit()
+    
+    logging.info(f"Reconcile {primary.sql_table}: {len(remote_ids)} in WooCommerce, {len(local_ids)} lokaal, {len(missing_ids)} verwijderd")
+    return True
+
+
+def sync_incremental(
+    conn: pyodbc.Connection,
+    woo_client: WooClient,
+    state_key: str,
+    fetches: List[Tuple[str, Dict[str, str]]],
+    targets: List[IncrementalTarget],
+    full_sync_days: int = 7,
+    fields: Optional[List[str]] = None,
+) -> None:
+    """Upsert alleen records die sinds de high-water mark gewijzigd zijn
+    
+    Args:
+        conn: Database connectie
+        woo_client: WooCommerce client
+        state_key: Sleutel in SyncState
+        fetches: (resource, params) paren die samen de volledige set vormen
+        targets: Doeltabellen; de eerste is de hoofdtabel voor reconcile
+        full_sync_days: Na zoveel dagen een reconcile uitvoeren om verwijderingen te vinden
+        fields: Veldprojectie voor de builders; de modified velden voor de watermark worden toegevoegd
+    """
+    ensure_sync_state_table(conn)
+    high_water_mark, last_full_sync = get_sync_state(conn, state_key)
+    since = high_water_mark - WATERMARK_OVERLAP if high_water_mark else None
+    
+    if since:
+        logging.info(f"Incrementele sync {state_key}: wijzigingen sinds {since.isoformat()} (UTC)")
+    else:
+        logging.info(f"Incrementele sync {state_key}: geen high-water mark, alles ophalen")
+    
+    if fields:
+        fields = list(fields) + ["date_modified_gmt", "date_modified"]
+    
+    new_high_water_mark = high_water_mark
+    processed_ids = set()
+    upserted = 0
+    
+    for resource, params in fetches:
+        fetch_params = dict(params)
+        if since:
+            fetch_params.update({"modified_after": since.strftime("%Y-%m-%dT%H:%M:%S"), "dates_are_gmt": "true"})
+        try:
+            for page in woo_client.paginate(resource, params=fetch_params, per_page=50, fields=fields):
+                page_ids = []
+                rows: Dict[str, List[Tuple]] = {target.sql_table: [] for target in targets}
+                for record in page:
+                    modified = get_modified_gmt(record)
+                    # Niet elk endpoint ondersteunt modified_after; daarom ook client-side filteren
+                    if since and modified and modified < since:
+                        continue
+                    try:
+                        record_id = int(record.get("id"))
+                    except (TypeError, ValueError):
+                        continue
+                    if record_id in processed_ids:
+                        continue
+                    processed_ids.add(record_id)
+                    page_ids.append(record_id)
+                    if modified and (new_high_water_mark is None or modified > new_high_water_mark):
+                        new_high_water_mark = modified
+                    for target in targets:
+                        rows[target.sql_table].extend(target.build_rows(record))
+                
+                if not page_ids:
+                    continue
+                
+                # Upsert: bestaande rijen voor deze IDs vervangen, per pagina in één transactie
+                with conn.cursor() as cursor:
+                    for target in targets:
+                        delete_by_ids(cursor, target.sql_table, target.id_column, page_ids)
+                for target in targets:
+                    if rows[target.sql_table]:
+                        target.write_rows(conn, rows[target.sql_table], commit=False)
+                conn.commit()
+                upserted += len(page_ids)
+        except Exception:
+            # Een half verwerkte pagina terugdraaien; eerdere pagina's zijn al gecommit
+            conn.rollback()
+            raise
+    
+    logging.info(f"Incrementele sync {state_key}: {upserted} gewijzigde records bijgewerkt")
+    
+    full_sync_due = (
+        last_full_sync is None
+        or datetime.now(timezone.utc).replace(tzinfo=None) - last_full_sync >= timedelta(days=full_sync_days)
+    )
+    reconciled = False
+    if full_sync_due:
+        logging.info(f"Periodieke reconcile voor {state_key} (laatste: {last_full_sync or 'nooit'})")
+        reconciled = reconcile_deletions(conn, woo_client, fetches, targets)
+    
+    set_sync_state(conn, state_key, new_high_water_mark, reconciled)
+
+
+def update_products_incremental(conn: pyodbc.Connection, woo_client: WooClient, full_sync_days: int = 7) -> None:
+    """Update products tabel incrementeel op basis van date_modified"""
+    sync_incremental(
+        conn, woo_client, "products",
+        fetches=[("products", {})],
+        targets=[IncrementalTarget("Products", "ProductID", build_product_rows, write_products)],
+        full_sync_days=full_sync_days,
+        fields=PRODUCT_FIELDS,
+    )
+
+
+def update_subscription_tables_incremental(conn: pyodbc.Connection, woo_client: WooClient, tables: Optional[List[str]] = None, full_sync_days: int = 7) -> None:
+    """Update subscription tabellen incrementeel; items en shipping volgen hun subscription"""
+    tables = [t for t in SUBSCRIPTION_TABLES if tables is None or t in tables]
+    if not tables:
+        logging.info("Geen subscription tabellen om bij te werken")
+        return
+    targets = [
+        IncrementalTarget(SUBSCRIPTION_FANOUT[table][0], "SubscriptionID", SUBSCRIPTION_FANOUT[table][1], SUBSCRIPTION_FANOUT[table][2])
+        for table in tables
+    ]
+    # Eigen state per tabelcombinatie, zodat een overgeslagen tabel geen wijzigingen mist
+    sync_incremental(
+        conn, woo_client, "subscriptions:" + ",".join(tables),
+        fetches=[("subscriptions", {})],
+        targets=targets,
+        full_sync_days=full_sync_days,
+        fields=subscription_fields(tables),
+    )
+
+
 # ============================================================================
 # ORDERS UPDATE (laatste X dagen)
 # ============================================================================
 
-def update_orders(conn: pyodbc.Connection, woo_client: WooClient, days_back: int = 30) -> None:
-    """Update orders van laatste X dagen (standaard 30 dagen) met batch processing"""
+ORDER_FIELDS = [
+    "id", "date_created", "date_modified", "status", "customer_id", "order_key", "number",
+    "currency", "payment_method", "total", "total_tax", "shipping_total", "shipping_tax",
+    "date_completed", "date_paid", "created_via", "billing", "shipping", "line_items",
+    "shipping_lines",
+]
+
+
+def build_order_rows(order: dict) -> Tuple[Optional[Tuple], List[Tuple], List[Tuple]]:
+    """Bouw de Orders rij plus OrderItems en OrderShipping rijen voor één WooCommerce order"""
+    order_items_data = []
+    order_shipping_data = []
+    try:
+        order_id = int(order.get("id"))
+        order_date = parse_dt(order.get("date_created"))
+        order_modified = parse_dt(order.get("date_modified"))
+        order_status = (order.get("status") or "").strip() or "unknown"
+        customer_id = int((order.get("customer_id") or 0)) or None
+        order_key = (order.get("order_key") or "").strip() or None
+        order_number = (order.get("number") or "").strip() or None
+        currency = (order.get("currency") or "").strip() or "EUR"
+        payment_method = (order.get("payment_method") or "").strip() or None
+        order_total = to_decimal(order.get("total")) or 0.0
+        order_tax = to_decimal(order.get("total_tax")) or 0.0
+        order_shipping = to_decimal(order.get("shipping_total")) or 0.0
+        order_shipping_tax = to_decimal(order.get("shipping_tax")) or 0.0
+        date_completed = parse_dt(order.get("date_completed"))
+        date_paid = parse_dt(order.get("date_paid"))
+        created_via = (order.get("created_via") or "").strip() or None
+        
+        # Billing informatie
+        billing = order.get("billing", {})
+        billing_first_name = (billing.get("first_name") or "").strip() or None
+        billing_last_name = (billing.get("last_name") or "").strip() or None
+        billing_email = (billing.get("email") or "").strip() or None
+        billing_phone = (billing.get("phone") or "").strip() or None
+        billing_company = (billing.get("company") or "").strip() or None
+        billing_address1 = (billing.get("address_1") or "").strip() or None
+        billing_address2 = (billing.get("address_2") or "").strip() or None
+        billing_city = (billing.get("city") or "").strip() or None
+        billing_postcode = (billing.get("postcode") or "").strip() or None
+        billing_country = (billing.get("country") or "").strip() or None
+        
+        # Shipping informatie
+        shipping = order.get("shipping", {})
+        shipping_first_name = (shipping.get("first_name") or "").strip() or None
+        shipping_last_name = (shipping.get("last_name") or "").strip() or None
+        shipping_company = (shipping.get("company") or "").strip() or None
+        shipping_address1 = (shipping.get("address_1") or "").strip() or None
+        shipping_address2 = (shipping.get("address_2") or "").strip() or None
+        shipping_city = (shipping.get("city") or "").strip() or None
+        shipping_postcode = (shipping.get("postcode") or "").strip() or None
+        shipping_country = (shipping.get("country") or "").strip() or None
+        
+        if not order_id:
+            return None, [], []
+        
+        order_row = (
+            order_id, order_date, order_modified, order_status, customer_id,
+            order_key, order_number, currency, payment_method, order_total,
+            order_tax, order_shipping, order_shipping_tax, date_completed,
+            date_paid, billing_first_name, billing_last_name, billing_email,
+            billing_phone, billing_company, billing_address1, billing_address2,
+            billing_city, billing_postcode, billing_country, shipping_first_name,
+            shipping_last_name, shipping_company, shipping_address1,
+            shipping_address2, shipping_city, shipping_postcode, shipping_country,
+            created_via
+        )
+        
+        # Order items ophalen
+        line_items = order.get("line_items", [])
+        for item in line_items:
+            try:
+                # Veilige conversie voor item_id
+                item_id_raw = item.get("id")
+                if not item_id_raw:
+                    logging.warning(f"Order item zonder ID gevonden in order {order_id}, skip")
+                    continue
+                item_id = int(item_id_raw)
+                
+                product_id = int((item.get("product_id") or 0)) or None
+                variation_id = int((item.get("variation_id") or 0)) or None
+                name = (item.get("name") or "").strip()
+                quantity = int((item.get("quantity") or 1))
+                subtotal = to_decimal(item.get("subtotal"))
+                subtotal_tax = to_decimal(item.get("subtotal_tax"))
+                total = to_decimal(item.get("total"))
+                total_tax = to_decimal(item.get("total_tax"))
+                sku = (item.get("sku") or "").strip() or None
+                
+                if item_id:
+                    order_items_data.append((
+                        item_id, order_id, "line_item", name, product_id,
+                        variation_id, sku, quantity, subtotal, subtotal_tax, total, total_tax, None
+                    ))
+            except Exception as e:
+                logging.warning(f"Fout bij verwerken order item {item.get('id')}: {e}")
+                continue
+        
+        # Order shipping ophalen
+        shipping_lines = order.get("shipping_lines", [])
+        for shipping in shipping_lines:
+            try:
+                # Veilige conversie voor shipping_id
+                shipping_id_raw = shipping.get("id")
+                if not shipping_id_raw:
+                    logging.warning(f"Order shipping zonder ID gevonden in order {order_id}, skip")
+                    continue
+                shipping_id = int(shipping_id_raw)
+                
+                method_title = (shipping.get("method_title") or "").strip()
+                total = to_decimal(shipping.get("total"))
+                total_tax = to_decimal(shipping.get("total_tax"))
+                
+                if shipping_id:
+                    order_shipping_data.append((
+                        shipping_id, order_id, method_title, total, total_tax
+                    ))
+            except Exception as e:
+                logging.warning(f"Fout bij verwerken order shipping {shipping.get('id')}: {e}")
+                continue
+        
+        return order_row, order_items_data, order_shipping_data
+                
+    except Exception as e:
+        logging.warning(f"Fout bij verwerken order {order.get('id')}: {e}")
+        return None, [], []
+
+
+class StageStats:
+    """Doorvoer en wachttijd van één pipeline stage"""
+    
+    def __init__(self, name: str, unit: str) -> None:
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.idle_seconds = 0.0
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+    
+    def idle(self, since: float) -> None:
+        self.idle_seconds += time.monotonic() - since
+    
+    def finish(self) -> None:
+        self.finished = time.monotonic()
+    
+    def log_summary(self) -> None:
+        elapsed = max((self.finished or time.monotonic()) - self.started, 1e-9)
+        busy = max(elapsed - self.idle_seconds, 0.0)
+        logging.info(
+            f"- Stage {self.name}: {self.items} {self.unit} in {elapsed:.1f}s "
+            f"({self.items / elapsed:.1f} {self.unit}/s), idle {self.idle_seconds:.1f}s "
+            f"({100 * self.idle_seconds / elapsed:.0f}%), bezig {busy:.1f}s"
+        )
+
+
+class PipelineAborted(Exception):
+    """Een andere stage is gestopt; deze stage stopt ook"""
+
+
+# Markeert het einde van een queue
+_END_OF_STREAM = object()
+
+
+def _queue_put(q: "queue.Queue", item: Any, stop: threading.Event, stats: StageStats) -> None:
+    # Blokkeren op een volle queue is backpressure en telt als idle tijd
+    since = time.monotonic()
+    while True:
+        if stop.is_set():
+            raise PipelineAborted()
+        try:
+            q.put(item, timeout=0.5)
+            break
+        except queue.Full:
+            continue
+    stats.idle(since)
+
+
+def _queue_get(q: "queue.Queue", stop: threading.Event, stats: StageStats) -> Any:
+    since = time.monotonic()
+    while True:
+        if stop.is_set():
+            raise PipelineAborted()
+        try:
+            item = q.get(timeout=0.5)
+            break
+        except queue.Empty:
+            continue
+    stats.idle(since)
+    return item
+
+
+def _resume_page(woo_client: WooClient, params: Dict[str, str], last_page: int, last_order_id: int) -> int:
+    """Pagina om een onderbroken orders run te hervatten.
+
+    Begint bij de laatst verwerkte pagina (één pagina overlap; het filter op
+    ``last_order_id`` slaat de al opgeslagen orders over). Zijn er sindsdien
+    orders verwijderd, dan zijn de pagina's naar voren geschoven; dan wordt
+    teruggelopen tot de eerste order op de pagina al verwerkt was.
+    """
+    page = max(1, last_page)
+    while page > 1:
+        pages = woo_client.paginate("orders", {**params, "_fields": "id"}, start_page=page, max_workers=1)
+        try:
+            first_page = next(pages, [])
+        finally:
+            pages.close()
+        if first_page and int(first_page[0].get("id") or 0) <= last_order_id:
+            break
+        page -= 1
+    return page
+
+
+def update_orders(conn: pyodbc.Connection, woo_client: WooClient, days_back: int = 30,
+                  batch_size: int = 1000, queue_size: int = 4,
+                  checkpoints: Optional[CheckpointStore] = None, slices: int = 1) -> None:
+    """Update orders van laatste X dagen (standaard 30 dagen) met batch processing
+    
+    Ophalen, transformeren en wegschrijven lopen als drie stages met begrensde
+    queues, zodat netwerk- en databasetijd overlappen. De fetch en transform stage
+    draaien in eigen threads; de database writer draait op de aanroepende thread
+    omdat de pyodbc connectie niet gedeeld wordt.
+    
+    Args:
+        conn: Database connectie
+        woo_client: WooCommerce client
+        days_back: Aantal dagen terug voor orders (standaard 30)
+        batch_size: Aantal orders per database batch (standaard 1000)
+        queue_size: Maximaal aantal pagina's/batches per queue voor backpressure (standaard 4)
+        checkpoints: Optioneel; na elke gecommitte batch wordt de laatste pagina en
+            order ID vastgelegd, zodat een hervatte run daar verder gaat
+        slices: Aantal tijdvakken voor een backfill (standaard 1). Bij meer dan één
+            worden de tijdvakken parallel opgehaald (begrensd door WOO_MAX_WORKERS)
+            en op order ID ontdubbeld; een hervatte run begint dan opnieuw met
+            hetzelfde venster, wat veilig is omdat elke batch zijn orders vervangt
+    """
     logging.info(f"Start bijwerken van orders (laatste {days_back} dagen)...")
     
     # Waarschuwing voor grote datasets
@@ -691,18 +1227,28 @@ def update_orders(conn: pyodbc.Connection, woo_client: WooClient, days_back: int
     # Datum X dagen geleden in ISO 8601 formaat
     days_ago = (datetime.now(timezone.utc) - timedelta(days=days_back)).isoformat()
     
-    # Batch configuratie
-    BATCH_SIZE = 1000  # Aantal orders per batch
+    # Hervatten vanaf checkpoint: zelfde 'after' zodat de paginering gelijk blijft
+    start_page = 1
+    last_order_id = 0
+    checkpoint = checkpoints.get("orders") if checkpoints else {}
+    if checkpoint.get("status") == "in_progress" and checkpoint.get("after"):
+        days_ago = checkpoint["after"]
+        if slices > 1:
+            # Tijdvakken komen door elkaar binnen; er is geen pagina om vanaf te hervatten
+            logging.info(f"Hervatten orders: backfill opnieuw vanaf {days_ago} ({checkpoint.get('orders_saved', 0)} orders al opgeslagen)")
+        else:
+            last_order_id = int(checkpoint.get("last_order_id", 0))
     
-    # Data containers voor huidige batch
-    orders_data = []
-    order_items_data = []
-    order_shipping_data = []
+    # Oplopend op ID, zodat nieuwe orders achteraan komen en pagina's stabiel blijven
+    params = {"after": days_ago, "per_page": 50, "orderby": "id", "order": "asc"}
     
-    params = {"after": days_ago, "per_page": 50}
+    if last_order_id:
+        # Niet last_page + 1: een verwijderde order schuift de volgende pagina's naar voren
+        start_page = _resume_page(woo_client, params, int(checkpoint.get("last_page", 0)), last_order_id)
+        logging.info(f"Hervatten orders vanaf pagina {start_page} (laatste order ID {last_order_id}, {checkpoint.get('orders_saved', 0)} orders al opgeslagen)")
     
     logging.info(f"Start ophalen orders vanaf datum: {days_ago}")
-    logging.info(f"Batch verwerking: {BATCH_SIZE} orders per batch")
+    logging.info(f"Batch verwerking: {batch_size} orders per batch, queue grootte {queue_size}")
     
     orders_processed = 0
     page_count = 0
@@ -811,142 +1357,126 @@ def update_orders(conn: pyodbc.Connection, woo_client: WooClient, days_back: int
         
         return len(batch_orders)
     
-    for page in woo_client.paginate("orders", params):
-        page_count += 1
-        page_orders = len(page)
-        logging.info(f"Verwerken van pagina {page_count} met {page_orders} orders...")
-        
-        for order in page:
-            try:
-                order_id = int(order.get("id"))
-                order_date = parse_dt(order.get("date_created"))
-                order_modified = parse_dt(order.get("date_modified"))
-                order_status = (order.get("status") or "").strip() or "unknown"
-                customer_id = int((order.get("customer_id") or 0)) or None
-                order_key = (order.get("order_key") or "").strip() or None
-                order_number = (order.get("number") or "").strip() or None
-                currency = (order.get("currency") or "").strip() or "EUR"
-                payment_method = (order.get("payment_method") or "").strip() or None
-                order_total = to_decimal(order.get("total")) or 0.0
-                order_tax = to_decimal(order.get("total_tax")) or 0.0
-                order_shipping = to_decimal(order.get("shipping_total")) or 0.0
-                order_shipping_tax = to_decimal(order.get("shipping_tax")) or 0.0
-                date_completed = parse_dt(order.get("date_completed"))
-                date_paid = parse_dt(order.get("date_paid"))
-                created_via = (order.get("created_via") or "").strip() or None
+    page_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    batch_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    fetch_stats = StageStats("fetch", "pagina's")
+    transform_stats = StageStats("transform", "orders")
+    writer_stats = StageStats("db writer", "orders")
+    
+    def fetch_stage() -> None:
+        nonlocal page_count
+        try:
+            if slices > 1:
+                backfill_params = {key: value for key, value in params.items() if key != "after"}
+                pages = woo_client.backfill("orders", date_parser.parse(days_ago), datetime.now(timezone.utc), slices, backfill_params, fields=ORDER_FIELDS)
+            else:
+                pages = woo_client.paginate("orders", params, start_page=start_page, fields=ORDER_FIELDS)
+            while True:
+                # Wachten op de WooCommerce API is het werk van deze stage, niet idle
+                page = next(pages, _END_OF_STREAM)
+                if page is _END_OF_STREAM:
+                    break
+                page_count += 1
+                fetch_stats.items += 1
+                _queue_put(page_queue, page, stop, fetch_stats)
+            _queue_put(page_queue, _END_OF_STREAM, stop, fetch_stats)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            fetch_stats.finish()
+    
+    def transform_stage() -> None:
+        nonlocal orders_processed
+        orders_data: List[Tuple] = []
+        order_items_data: List[Tuple] = []
+        order_shipping_data: List[Tuple] = []
+        pages_seen = 0
+        try:
+            while True:
+                page = _queue_get(page_queue, stop, transform_stats)
+                if page is _END_OF_STREAM:
+                    break
+                pages_seen += 1
+                logging.info(f"Verwerken van pagina {pages_seen} met {len(page)} orders...")
                 
-                # Billing informatie
-                billing = order.get("billing", {})
-                billing_first_name = (billing.get("first_name") or "").strip() or None
-                billing_last_name = (billing.get("last_name") or "").strip() or None
-                billing_email = (billing.get("email") or "").strip() or None
-                billing_phone = (billing.get("phone") or "").strip() or None
-                billing_company = (billing.get("company") or "").strip() or None
-                billing_address1 = (billing.get("address_1") or "").strip() or None
-                billing_address2 = (billing.get("address_2") or "").strip() or None
-                billing_city = (billing.get("city") or "").strip() or None
-                billing_postcode = (billing.get("postcode") or "").strip() or None
-                billing_country = (billing.get("country") or "").strip() or None
+                for order in page:
+                    order_row, items, shipping = build_order_rows(order)
+                    if order_row is None:
+                        continue
+                    # Orders die voor de onderbreking al zijn opgeslagen overslaan
+                    if order_row[0] <= last_order_id:
+                        continue
+                    orders_data.append(order_row)
+                    order_items_data.extend(items)
+                    order_shipping_data.extend(shipping)
+                    orders_processed += 1
+                    transform_stats.items += 1
                 
-                # Shipping informatie
-                shipping = order.get("shipping", {})
-                shipping_first_name = (shipping.get("first_name") or "").strip() or None
-                shipping_last_name = (shipping.get("last_name") or "").strip() or None
-                shipping_company = (shipping.get("company") or "").strip() or None
-                shipping_address1 = (shipping.get("address_1") or "").strip() or None
-                shipping_address2 = (shipping.get("address_2") or "").strip() or None
-                shipping_city = (shipping.get("city") or "").strip() or None
-                shipping_postcode = (shipping.get("postcode") or "").strip() or None
-                shipping_country = (shipping.get("country") or "").strip() or None
+                # Voortgang logging per pagina
+                logging.info(f"Pagina {pages_seen} voltooid. Orders verwerkt: {orders_processed} (batch items: {len(orders_data)}, order items: {len(order_items_data)}, shipping: {len(order_shipping_data)})")
                 
-                if order_id:
-                    orders_data.append((
-                        order_id, order_date, order_modified, order_status, customer_id,
-                        order_key, order_number, currency, payment_method, order_total,
-                        order_tax, order_shipping, order_shipping_tax, date_completed,
-                        date_paid, billing_first_name, billing_last_name, billing_email,
-                        billing_phone, billing_company, billing_address1, billing_address2,
-                        billing_city, billing_postcode, billing_country, shipping_first_name,
-                        shipping_last_name, shipping_company, shipping_address1,
-                        shipping_address2, shipping_city, shipping_postcode, shipping_country,
-                        created_via
-                    ))
-                    orders_processed += 1
-                    
-                    # Order items ophalen
-                    line_items = order.get("line_items", [])
-                    for item in line_items:
-                        try:
-                            # Veilige conversie voor item_id
-                            item_id_raw = item.get("id")
-                            if not item_id_raw:
-                                logging.warning(f"Order item zonder ID gevonden in order {order_id}, skip")
-                                continue
-                            item_id = int(item_id_raw)
-                            
-                            product_id = int((item.get("product_id") or 0)) or None
-                            variation_id = int((item.get("variation_id") or 0)) or None
-                            name = (item.get("name") or "").strip()
-                            quantity = int((item.get("quantity") or 1))
-                            subtotal = to_decimal(item.get("subtotal"))
-                            subtotal_tax = to_decimal(item.get("subtotal_tax"))
-                            total = to_decimal(item.get("total"))
-                            total_tax = to_decimal(item.get("total_tax"))
-                            sku = (item.get("sku") or "").strip() or None
-                            
-                            if item_id:
-                                order_items_data.append((
-                                    item_id, order_id, "line_item", name, product_id,
-                                    variation_id, sku, quantity, subtotal, subtotal_tax, total, total_tax, None
-                                ))
-                        except Exception as e:
-                            logging.warning(f"Fout bij verwerken order item {item.get('id')}: {e}")
-                            continue
-                    
-                    # Order shipping ophalen
-                    shipping_lines = order.get("shipping_lines", [])
-                    for shipping in shipping_lines:
-                        try:
-                            # Veilige conversie voor shipping_id
-                            shipping_id_raw = shipping.get("id")
-                            if not shipping_id_raw:
-                                logging.warning(f"Order shipping zonder ID gevonden in order {order_id}, skip")
-                                continue
-                            shipping_id = int(shipping_id_raw)
-                            
-                            method_title = (shipping.get("method_title") or "").strip()
-                            method_id = (shipping.get("method_id") or "").strip()
-                            total = to_decimal(shipping.get("total"))
-                            total_tax = to_decimal(shipping.get("total_tax"))
-                            
-                            if shipping_id:
-                                order_shipping_data.append((
-                                    shipping_id, order_id, method_title, total, total_tax
-                                ))
-                        except Exception as e:
-                            logging.warning(f"Fout bij verwerken order shipping {shipping.get('id')}: {e}")
-                            continue
-                            
-            except Exception as e:
-                logging.warning(f"Fout bij verwerken order {order.get('id')}: {e}")
-                continue
-        
-        # Voortgang logging per pagina
-        logging.info(f"Pagina {page_count} voltooid. Orders verwerkt: {orders_processed} (batch items: {len(orders_data)}, order items: {len(order_items_data)}, shipping: {len(order_shipping_data)})")
-        
-        # Check of we een batch moeten verwerken
-        if len(orders_data) >= BATCH_SIZE:
+                # Check of we een batch moeten doorgeven aan de writer
+                if len(orders_data) >= batch_size:
+                    _queue_put(batch_queue, (orders_data, order_items_data, order_shipping_data, start_page + pages_seen - 1), stop, transform_stats)
+                    # Reset de data containers voor de volgende batch
+                    orders_data = []
+                    order_items_data = []
+                    order_shipping_data = []
+            
+            # De laatste batch als er nog data over is
+            if orders_data:
+                _queue_put(batch_queue, (orders_data, order_items_data, order_shipping_data, start_page + pages_seen - 1), stop, transform_stats)
+            _queue_put(batch_queue, _END_OF_STREAM, stop, transform_stats)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            transform_stats.finish()
+    
+    threads = [
+        threading.Thread(target=fetch_stage, name="orders-fetch", daemon=True),
+        threading.Thread(target=transform_stage, name="orders-transform", daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+    
+    # DB writer stage op deze thread
+    try:
+        while True:
+            batch = _queue_get(batch_queue, stop, writer_stats)
+            if batch is _END_OF_STREAM:
+                break
             batch_count += 1
-            process_batch(orders_data, order_items_data, order_shipping_data, batch_count)
-            # Reset de data containers voor de volgende batch
-            orders_data = []
-            order_items_data = []
-            order_shipping_data = []
+            process_batch(batch[0], batch[1], batch[2], batch_count)
+            writer_stats.items += len(batch[0])
+            if checkpoints:
+                # Batches eindigen altijd op een paginagrens; bij een backfill is er geen vaste volgorde
+                checkpoints.update(
+                    "orders", status="in_progress", after=days_ago,
+                    last_page=batch[3] if slices <= 1 else 0,
+                    last_order_id=max(order[0] for order in batch[0]) if slices <= 1 else 0,
+                    batches_committed=int(checkpoint.get("batches_committed", 0)) + batch_count,
+                    orders_saved=int(checkpoint.get("orders_saved", 0)) + total_orders_saved,
+                )
+    except PipelineAborted:
+        pass
+    except BaseException as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        writer_stats.finish()
+        for thread in threads:
+            thread.join()
     
-    # Verwerk de laatste batch als er nog data over is
-    if orders_data:
-        batch_count += 1
-        process_batch(orders_data, order_items_data, order_shipping_data, batch_count)
+    if errors:
+        raise errors[0]
     
     # Samenvatting
     logging.info(f"Orders update voltooid!")
@@ -954,19 +1484,31 @@ def update_orders(conn: pyodbc.Connection, woo_client: WooClient, days_back: int
     logging.info(f"- Totaal orders opgehaald: {orders_processed}")
     logging.info(f"- Totaal batches verwerkt: {batch_count}")
     logging.info(f"- Totaal orders opgeslagen: {total_orders_saved}")
+    for stats in (fetch_stats, transform_stats, writer_stats):
+        stats.log_summary()
 
 
 # ============================================================================
 # MAIN UPDATE FUNCTION
 # ============================================================================
 
-def update_all(skip_tables: Optional[List[str]] = None, orders_days_back: int = 30, stock_days_back: int = 7) -> None:
+def update_all(skip_tables: Optional[List[str]] = None, orders_days_back: int = 30, stock_days_back: int = 7,
+               incremental: bool = False, full_sync_days: int = 7,
+               orders_batch_size: int = 1000, orders_queue_size: int = 4, resume: bool = False,
+               orders_slices: int = 1) -> None:
     """Update alle tabellen vanuit WooCommerce en Monta in logische volgorde
     
     Args:
         skip_tables: Lijst van tabelnamen om over te slaan (bijv. ['customers', 'products', 'stock'])
         orders_days_back: Aantal dagen terug voor orders (standaard 30)
         stock_days_back: Aantal dagen terug voor stock (standaard 7)
+        incremental: Customers, products en subscriptions alleen bijwerken sinds de high-water mark
+        full_sync_days: Bij incremental: interval in dagen voor reconcile van verwijderingen (standaard 7)
+        orders_batch_size: Aantal orders per database batch (standaard 1000)
+        orders_queue_size: Queue grootte tussen de orders pipeline stages (standaard 4)
+        resume: Een onderbroken run hervatten: voltooide tabellen overslaan en orders
+            vanaf de laatst gecommitte pagina verder ophalen
+        orders_slices: Orders ophalen als backfill in zoveel parallelle tijdvakken (standaard 1)
     """
     logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
     
@@ -981,38 +1523,64 @@ def update_all(skip_tables: Optional[List[str]] = None, orders_days_back: int =
         
         # Verbindingen maken
         conn = connect_azuresql(db_config)
-        woo_client = WooClient(woo_url, woo_key, woo_secret)
+        woo_client = WooClient(
+            woo_url, woo_key, woo_secret,
+            max_workers=int(os.environ.get("WOO_MAX_WORKERS", "4")),
+            pool_size=int(os.environ.get("WOO_POOL_SIZE", "10")),
+        )
         monta_client = MontaClient(monta_config) if monta_config else None
         
+        # Checkpoints per tabel, zodat een afgebroken run met --resume verder kan
+        checkpoints = CheckpointStore("update_all")
+        checkpoints.start_run(resume)
+        
         logging.info("Start bijwerken van alle tabellen vanuit WooCommerce en Monta")
         if skip_tables:
             logging.info(f"Overgeslagen tabellen: {', '.join(skip_tables)}")
         
+        # Subscriptions, items en shipping delen één paginering over subscriptions
+        subscription_tables = [t for t in SUBSCRIPTION_TABLES if t not in skip_tables]
+        
         # Alle beschikbare tabellen met hun update functies
+        if incremental:
+            # Het customers endpoint negeert modified_after, dus customers worden altijd volledig bijgewerkt
+            logging.info(f"Incrementele modus voor products en subscriptions (reconcile elke {full_sync_days} dagen); customers volledig")
+            customers_func = update_customers
+            products_func = lambda conn, woo_client: update_products_incremental(conn, woo_client, full_sync_days)
+            subscriptions_func = lambda conn, woo_client: update_subscription_tables_incremental(conn, woo_client, subscription_tables, full_sync_days)
+        else:
+            customers_func = update_customers
+            products_func = update_products
+            subscriptions_func = lambda conn, woo_client: update_subscription_tables(conn, woo_client, subscription_tables)
+        
         table_updates = [
-            ("customers", lambda conn, woo_client: update_customers(conn, woo_client), "1. Customers (basis tabel)"),
-            ("products", lambda conn, woo_client: update_products(conn, woo_client), "2. Products (basis tabel)"),
+            ("customers", customers_func, "1. Customers (basis tabel)"),
+            ("products", products_func, "2. Products (basis tabel)"),
             ("stock", lambda conn, woo_client: update_stock(conn, monta_client, stock_days_back), "3. Stock van Monta (afhankelijk van products)"),
-            ("subscriptions", lambda conn, woo_client: update_subscriptions(conn, woo_client), "4. Subscriptions (afhankelijk van customers)"),
-            ("subscription_items", lambda conn, woo_client: update_subscription_items(conn, woo_client), "5. Subscription Items (afhankelijk van subscriptions)"),
-            ("subscription_shipping", lambda conn, woo_client: update_subscription_shipping(conn, woo_client), "6. Subscription Shipping (afhankelijk van subscriptions)"),
-            ("orders", lambda conn, woo_client: update_orders(conn, woo_client, orders_days_back), "7. Orders, Order Items, Order Shipping (afhankelijk van customers en products)"),
+            ("subscription_tables", subscriptions_func, f"4-6. {', '.join(subscription_tables)} (één fetch, afhankelijk van customers)"),
+            ("orders", lambda conn, woo_client: update_orders(conn, woo_client, orders_days_back, orders_batch_size, orders_queue_size, checkpoints, orders_slices), "7. Orders, Order Items, Order Shipping (afhankelijk van customers en products)"),
         ]
         
         # Voer updates uit voor niet-overgeslagen tabellen
         for table_name, update_func, description in table_updates:
-            if table_name in skip_tables:
+            if table_name in skip_tables or (table_name == "subscription_tables" and not subscription_tables):
                 logging.info(f"Overslaan: {description}")
                 continue
+            if checkpoints.resumed and checkpoints.is_completed(table_name):
+                logging.info(f"Al voltooid in onderbroken run, overslaan: {description}")
+                continue
             
             try:
                 logging.info(f"Start: {description}")
                 update_func(conn, woo_client)
+                checkpoints.mark_completed(table_name)
                 logging.info(f"Voltooid: {description}")
             except Exception as e:
                 logging.error(f"Fout bij bijwerken van {table_name}: {e}")
+                logging.info("Hervat deze run met --resume")
                 raise
         
+        checkpoints.finish_run()
         logging.info("Alle geselecteerde tabellen succesvol bijgewerkt!")
         
     except Exception as e:
@@ -1021,6 +1589,8 @@ def update_all(skip_tables: Optional[List[str]] = None, orders_days_back: int =
     finally:
         if 'conn' in locals():
             conn.close()
+        if 'woo_client' in locals():
+            woo_client.close()
 
 
 if __name__ == "__main__":
@@ -1031,6 +1601,12 @@ if __name__ == "__main__":
     parser.add_argument("--list-tables", action="store_true", help="Toon alle beschikbare tabellen")
     parser.add_argument("--orders-days", type=int, default=30, help="Aantal dagen terug voor orders (standaard: 30)")
     parser.add_argument("--stock-days", type=int, default=7, help="Aantal dagen terug voor stock (standaard: 7)")
+    parser.add_argument("--orders-batch-size", type=int, default=1000, help="Aantal orders per database batch (standaard: 1000)")
+    parser.add_argument("--orders-queue-size", type=int, default=4, help="Queue grootte tussen fetch, transform en database stages (standaard: 4)")
+    parser.add_argument("--resume", action="store_true", help="Onderbroken run hervatten vanaf de laatste checkpoint")
+    parser.add_argument("--orders-slices", type=int, default=1, help="Orders in zoveel tijdvakken parallel ophalen, voor grote backfills (standaard: 1)")
+    parser.add_argument("--incremental", action="store_true", help="Products en subscriptions alleen bijwerken sinds de vorige sync (customers altijd volledig)")
+    parser.add_argument("--full-sync-days", type=int, default=7, help="Bij --incremental: elke X dagen verwijderingen reconciliëren (standaard: 7)")
     
     args = parser.parse_args()
     
@@ -1048,8 +1624,12 @@ if __name__ == "__main__":
         print("Azure SQL: AZURE_SQL_SERVER, AZURE_SQL_DATABASE, AZURE_SQL_USERNAME, AZURE_SQL_PASSWORD")
         print("Monta (optioneel): MONTA_BASE_URL, MONTA_USERNAME, MONTA_PASSWORD")
         print("\nGebruik: python update_all.py --skip customers products --orders-days 60 --stock-days 14")
+        print("Incrementeel: python update_all.py --incremental --full-sync-days 7")
+        print("Hervatten na een fout: python update_all.py --resume")
+        print("Historische backfill: WOO_MAX_WORKERS=8 python update_all.py --skip customers products stock subscriptions subscription_items subscription_shipping --orders-days 1825 --orders-slices 20")
         sys.exit(0)
     
     skip_tables = args.skip or []
-    update_all(skip_tables, args.orders_days, args.stock_days)
+    update_all(skip_tables, args.orders_days, args.stock_days, args.incremental, args.full_sync_days,
+               args.orders_batch_size, args.orders_queue_size, args.resume, args.orders_slices)
  
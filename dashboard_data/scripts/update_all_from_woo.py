@@ -14,6 +14,7 @@ from dotenv import load_dotenv
 from dateutil import parser as date_parser
 
 from _woo_client import WooClient
+from _checkpoint import CheckpointStore
 
 load_dotenv()
 
@@ -108,6 +109,10 @@ def normalize_email(value: Optional[str]) -> Optional[str]:
 # CUSTOMERS UPDATE
 # ============================================================================
 
+# Velden die de builders lezen; via _fields blijven meta_data en _links weg
+CUSTOMER_FIELDS = ["id", "email", "first_name", "last_name", "billing", "date_created"]
+
+
 def update_customers(conn: pyodbc.Connection, woo_client: WooClient) -> None:
     """Update customers tabel - complete replace, inclusief WooCommerce customers en WordPress subscribers"""
     logging.info("Start bijwerken van customers...")
@@ -124,7 +129,7 @@ def update_customers(conn: pyodbc.Connection, woo_client: WooClient) -> None:
     # 1. Alle WooCommerce customers ophalen
     logging.info("Ophalen van WooCommerce customers...")
     woo_customers_count = 0
-    for page in woo_client.paginate("customers", per_page=50):
+    for page in woo_client.paginate("customers", per_page=50, fields=CUSTOMER_FIELDS):
         for customer in page:
             try:
                 customer_id = int(customer.get("id"))
@@ -153,7 +158,7 @@ def update_customers(conn: pyodbc.Connection, woo_client: WooClient) -> None:
     try:
         # WooCommerce customers endpoint met role=subscriber parameter gebruiken
         # Dit werkt met dezelfde API keys als WooCommerce customers
-        for page in woo_client.paginate("customers", params={"role": "subscriber"}, per_page=50):
+        for page in woo_client.paginate("customers", params={"role": "subscriber"}, per_page=50, fields=CUSTOMER_FIELDS):
             for user in page:
                 try:
                     user_id = int(user.get("id"))
@@ -203,6 +208,12 @@ def update_customers(conn: pyodbc.Connection, woo_client: WooClient) -> None:
 # PRODUCTS UPDATE
 # ============================================================================
 
+PRODUCT_FIELDS = [
+    "id", "name", "status", "sku", "regular_price", "sale_price", "tax_class",
+    "date_created", "date_modified", "type",
+]
+
+
 def update_products(conn: pyodbc.Connection, woo_client: WooClient) -> None:
     """Update products tabel - complete replace"""
     logging.info("Start bijwerken van products...")
@@ -215,7 +226,7 @@ def update_products(conn: pyodbc.Connection, woo_client: WooClient) -> None:
     
     # Alle products ophalen vanuit WooCommerce
     products_data = []
-    for page in woo_client.paginate("products", per_page=50):
+    for page in woo_client.paginate("products", per_page=50, fields=PRODUCT_FIELDS):
         for product in page:
             try:
                 product_id = int(product.get("id"))
@@ -257,50 +268,106 @@ def update_products(conn: pyodbc.Connection, woo_client: WooClient) -> None:
 
 
 # ============================================================================
-# SUBSCRIPTIONS UPDATE
+# SUBSCRIPTIONS UPDATE (subscriptions, items en shipping in één fetch)
 # ============================================================================
 
-def update_subscriptions(conn: pyodbc.Connection, woo_client: WooClient) -> None:
-    """Update subscriptions tabel - complete replace"""
-    logging.info("Start bijwerken van subscriptions...")
-    
-    # Tabel legen
-    with conn.cursor() as cursor:
-        cursor.execute("DELETE FROM Subscriptions")
-        conn.commit()
-        logging.info("Subscriptions tabel geleegd")
-    
-    # Alle subscriptions ophalen vanuit WooCommerce
-    subscriptions_data = []
-    for page in woo_client.paginate("subscriptions", per_page=50):
-        for subscription in page:
+SUBSCRIPTION_TABLES = ("subscriptions", "subscription_items", "subscription_shipping")
+
+
+def build_subscription_rows(subscription: dict) -> List[Tuple]:
+    """Bouw de Subscriptions rij voor één WooCommerce subscription"""
+    try:
+        subscription_id = int(subscription.get("id"))
+        status = (subscription.get("status") or "").strip() or "unknown"
+        customer_id = int((subscription.get("customer_id") or 0)) or None
+        billing_email = None
+        try:
+            billing_email = (subscription.get("billing") or {}).get("email") or None
+        except Exception:
+            pass
+        
+        interval = int((subscription.get("billing_interval") or 0)) or 0
+        period = (subscription.get("billing_period") or "").strip() or "month"
+        
+        start_date = parse_dt(subscription.get("date_created_gmt") or subscription.get("start_date_gmt"))
+        next_payment = parse_dt(subscription.get("next_payment_date_gmt") or subscription.get("next_payment_gmt"))
+        end_date = parse_dt(subscription.get("end_date_gmt") or subscription.get("date_completed_gmt"))
+        
+        if subscription_id:
+            return [(
+                subscription_id, status, customer_id, billing_email,
+                interval, period, start_date, next_payment, end_date
+            )]
+    except Exception as e:
+        logging.warning(f"Fout bij verwerken subscription {subscription.get('id')}: {e}")
+    return []
+
+
+def build_subscription_item_rows(subscription: dict) -> List[Tuple]:
+    """Bouw de SubscriptionItems rijen voor één WooCommerce subscription"""
+    rows = []
+    try:
+        subscription_id = int(subscription.get("id"))
+        line_items = subscription.get("line_items", [])
+        
+        for item in line_items:
             try:
-                subscription_id = int(subscription.get("id"))
-                status = (subscription.get("status") or "").strip() or "unknown"
-                customer_id = int((subscription.get("customer_id") or 0)) or None
-                billing_email = None
-                try:
-                    billing_email = (subscription.get("billing") or {}).get("email") or None
-                except Exception:
-                    pass
+                item_id = int(item.get("id"))
+                name = (item.get("name") or "").strip()
+                product_id = int((item.get("product_id") or 0)) or None
+                variation_id = int((item.get("variation_id") or 0)) or None
+                sku = (item.get("sku") or "").strip() or None
+                quantity = int((item.get("quantity") or 1))
+                
+                subtotal = to_decimal(item.get("subtotal"))
+                subtotal_tax = to_decimal(item.get("subtotal_tax"))
+                total = to_decimal(item.get("total"))
+                total_tax = to_decimal(item.get("total_tax"))
+                tax_class = (item.get("tax_class") or "").strip() or None
+                tax_data = str(item.get("taxes", []))
                 
-                interval = int((subscription.get("billing_interval") or 0)) or 0
-                period = (subscription.get("billing_period") or "").strip() or "month"
+                if item_id and subscription_id:
+                    rows.append((
+                        item_id, subscription_id, "line_item", name, product_id, variation_id,
+                        sku, quantity, subtotal, subtotal_tax, total, total_tax, tax_class, tax_data
+                    ))
+            except Exception as e:
+                logging.warning(f"Fout bij verwerken subscription item {item.get('id')}: {e}")
+                continue
                 
-                start_date = parse_dt(subscription.get("date_created_gmt") or subscription.get("start_date_gmt"))
-                next_payment = parse_dt(subscription.get("next_payment_date_gmt") or subscription.get("next_payment_gmt"))
-                end_date = parse_dt(subscription.get("end_date_gmt") or subscription.get("date_completed_gmt"))
+    except Exception as e:
+        logging.warning(f"Fout bij verwerken subscription {subscription.get('id')}: {e}")
+    return rows
+
+
+def build_subscription_shipping_rows(subscription: dict) -> List[Tuple]:
+    """Bouw de SubscriptionShipping rijen voor één WooCommerce subscription"""
+    rows = []
+    try:
+        subscription_id = int(subscription.get("id"))
+        shipping_lines = subscription.get("shipping_lines", [])
+        
+        for shipping in shipping_lines:
+            try:
+                shipping_id = int(shipping.get("id"))
+                method_title = (shipping.get("method_title") or "").strip()
+                total = to_decimal(shipping.get("total"))
+                total_tax = to_decimal(shipping.get("total_tax"))
                 
-                if subscription_id:
-                    subscriptions_data.append((
-                        subscription_id, status, customer_id, billing_email,
-                        interval, period, start_date, next_payment, end_date
+                if shipping_id and subscription_id:
+                    rows.append((
+                        shipping_id, subscription_id, method_title, total, total_tax
                     ))
             except Exception as e:
-                logging.warning(f"Fout bij verwerken subscription {subscription.get('id')}: {e}")
+                logging.warning(f"Fout bij verwerken subscription shipping {shipping.get('id')}: {e}")
                 continue
-    
-    # Subscriptions invoegen
+                
+    except Exception as e:
+        logging.warning(f"Fout bij verwerken subscription {subscription.get('id')}: {e}")
+    return rows
+
+
+def write_subscriptions(conn: pyodbc.Connection, subscriptions_data: List[Tuple]) -> None:
     if subscriptions_data:
         with conn.cursor() as cursor:
             cursor.executemany(
@@ -317,59 +384,7 @@ def update_subscriptions(conn: pyodbc.Connection, woo_client: WooClient) -> None
         logging.warning("Geen subscriptions gevonden")
 
 
-# ============================================================================
-# SUBSCRIPTION ITEMS UPDATE
-# ============================================================================
-
-def update_subscription_items(conn: pyodbc.Connection, woo_client: WooClient) -> None:
-    """Update subscription items tabel - complete replace"""
-    logging.info("Start bijwerken van subscription items...")
-    
-    # Tabel legen
-    with conn.cursor() as cursor:
-        cursor.execute("DELETE FROM SubscriptionItems")
-        conn.commit()
-        logging.info("SubscriptionItems tabel geleegd")
-    
-    # Alle subscriptions ophalen om items op te halen
-    subscription_items_data = []
-    
-    for page in woo_client.paginate("subscriptions", per_page=50):
-        for subscription in page:
-            try:
-                subscription_id = int(subscription.get("id"))
-                line_items = subscription.get("line_items", [])
-                
-                for item in line_items:
-                    try:
-                        item_id = int(item.get("id"))
-                        name = (item.get("name") or "").strip()
-                        product_id = int((item.get("product_id") or 0)) or None
-                        variation_id = int((item.get("variation_id") or 0)) or None
-                        sku = (item.get("sku") or "").strip() or None
-                        quantity = int((item.get("quantity") or 1))
-                        
-                        subtotal = to_decimal(item.get("subtotal"))
-                        subtotal_tax = to_decimal(item.get("subtotal_tax"))
-                        total = to_decimal(item.get("total"))
-                        total_tax = to_decimal(item.get("total_tax"))
-                        tax_class = (item.get("tax_class") or "").strip() or None
-                        tax_data = str(item.get("taxes", []))
-                        
-                        if item_id and subscription_id:
-                            subscription_items_data.append((
-                                item_id, subscription_id, "line_item", name, product_id, variation_id,
-                                sku, quantity, subtotal, subtotal_tax, total, total_tax, tax_class, tax_data
-                            ))
-                    except Exception as e:
-                        logging.warning(f"Fout bij verwerken subscription item {item.get('id')}: {e}")
-                        continue
-                        
-            except Exception as e:
-                logging.warning(f"Fout bij verwerken subscription {subscription.get('id')}: {e}")
-                continue
-    
-    # Subscription items invoegen
+def write_subscription_items(conn: pyodbc.Connection, subscription_items_data: List[Tuple]) -> None:
     if subscription_items_data:
         with conn.cursor() as cursor:
             cursor.executemany(
@@ -388,49 +403,7 @@ def update_subscription_items(conn: pyodbc.Connection, woo_client: WooClient) ->
         logging.warning("Geen subscription items gevonden")
 
 
-# ============================================================================
-# SUBSCRIPTION SHIPPING UPDATE
-# ============================================================================
-
-def update_subscription_shipping(conn: pyodbc.Connection, woo_client: WooClient) -> None:
-    """Update subscription shipping tabel - complete replace"""
-    logging.info("Start bijwerken van subscription shipping...")
-    
-    # Tabel legen
-    with conn.cursor() as cursor:
-        cursor.execute("DELETE FROM SubscriptionShipping")
-        conn.commit()
-        logging.info("SubscriptionShipping tabel geleegd")
-    
-    # Alle subscriptions ophalen om shipping op te halen
-    subscription_shipping_data = []
-    
-    for page in woo_client.paginate("subscriptions", per_page=50):
-        for subscription in page:
-            try:
-                subscription_id = int(subscription.get("id"))
-                shipping_lines = subscription.get("shipping_lines", [])
-                
-                for shipping in shipping_lines:
-                    try:
-                        shipping_id = int(shipping.get("id"))
-                        method_title = (shipping.get("method_title") or "").strip()
-                        total = to_decimal(shipping.get("total"))
-                        total_tax = to_decimal(shipping.get("total_tax"))
-                        
-                        if shipping_id and subscription_id:
-                            subscription_shipping_data.append((
-                                shipping_id, subscription_id, method_title, total, total_tax
-                            ))
-                    except Exception as e:
-                        logging.warning(f"Fout bij verwerken subscription shipping {shipping.get('id')}: {e}")
-                        continue
-                        
-            except Exception as e:
-                logging.warning(f"Fout bij verwerken subscription {subscription.get('id')}: {e}")
-                continue
-    
-    # Subscription shipping invoegen
+def write_subscription_shipping(conn: pyodbc.Connection, subscription_shipping_data: List[Tuple]) -> None:
     if subscription_shipping_data:
         with conn.cursor() as cursor:
             cursor.executemany(
@@ -447,223 +420,351 @@ def update_subscription_shipping(conn: pyodbc.Connection, woo_client: WooClient)
         logging.warning("Geen subscription shipping gevonden")
 
 
-# ============================================================================
-# ORDERS UPDATE (laatste 7 dagen)
-# ============================================================================
+# Per tabel: (SQL tabelnaam, row builder, writer)
+SUBSCRIPTION_FANOUT = {
+    "subscriptions": ("Subscriptions", build_subscription_rows, write_subscriptions),
+    "subscription_items": ("SubscriptionItems", build_subscription_item_rows, write_subscription_items),
+    "subscription_shipping": ("SubscriptionShipping", build_subscription_shipping_rows, write_subscription_shipping),
+}
 
-def update_orders(conn: pyodbc.Connection, woo_client: WooClient, days_back: int = 30) -> None:
-    """Update orders van laatste X dagen (standaard 30 dagen)"""
-    logging.info(f"Start bijwerken van orders (laatste {days_back} dagen)...")
+# Velden per builder; de fetch vraagt de vereniging op van de tabellen die bijgewerkt worden
+SUBSCRIPTION_FIELDS = {
+    "subscriptions": [
+        "id", "status", "customer_id", "billing", "billing_interval", "billing_period",
+        "date_created_gmt", "start_date_gmt", "next_payment_date_gmt", "next_payment_gmt",
+        "end_date_gmt", "date_completed_gmt",
+    ],
+    "subscription_items": ["id", "line_items"],
+    "subscription_shipping": ["id", "shipping_lines"],
+}
+
+
+def subscription_fields(tables: List[str]) -> List[str]:
+    return [field for table in tables for field in SUBSCRIPTION_FIELDS[table]]
+
+
+def update_subscription_tables(conn: pyodbc.Connection, woo_client: WooClient, tables: Optional[List[str]] = None) -> None:
+    """Update subscription tabellen - complete replace, met één paginering over subscriptions
     
-    # Datum X dagen geleden in ISO 8601 formaat
-    days_ago = (datetime.now(timezone.utc) - timedelta(days=days_back)).isoformat()
+    Elke pagina wordt één keer opgehaald en naar de row builders van alle gevraagde
+    tabellen gestuurd, in plaats van een aparte volledige download per tabel.
     
-    # Orders van laatste X dagen ophalen
-    orders_data = []
-    order_items_data = []
-    order_shipping_data = []
+    Args:
+        conn: Database connectie
+        woo_client: WooCommerce client
+        tables: Subset van SUBSCRIPTION_TABLES (standaard alle drie)
+    """
+    tables = [t for t in SUBSCRIPTION_TABLES if tables is None or t in tables]
+    if not tables:
+        logging.info("Geen subscription tabellen om bij te werken")
+        return
+    logging.info(f"Start bijwerken van {', '.join(tables)} (één fetch)...")
     
-    params = {"after": days_ago, "per_page": 50}
+    # Tabellen legen
+    with conn.cursor() as cursor:
+        for table in tables:
+            sql_table = SUBSCRIPTION_FANOUT[table][0]
+            cursor.execute(f"DELETE FROM {sql_table}")
+            logging.info(f"{sql_table} tabel geleegd")
+        conn.commit()
     
-    for page in woo_client.paginate("orders", params):
-        for order in page:
-            try:
-                order_id = int(order.get("id"))
-                order_date = parse_dt(order.get("date_created"))
-                order_modified = parse_dt(order.get("date_modified"))
-                order_status = (order.get("status") or "").strip() or "unknown"
-                customer_id = int((order.get("customer_id") or 0)) or None
-                order_key = (order.get("order_key") or "").strip() or None
-                order_number = (order.get("number") or "").strip() or None
-                currency = (order.get("currency") or "").strip() or "EUR"
-                payment_method = (order.get("payment_method") or "").strip() or None
-                order_total = to_decimal(order.get("total")) or 0.0
-                order_tax = to_decimal(order.get("total_tax")) or 0.0
-                order_shipping = to_decimal(order.get("shipping_total")) or 0.0
-                order_shipping_tax = to_decimal(order.get("shipping_tax")) or 0.0
-                date_completed = parse_dt(order.get("date_completed"))
-                date_paid = parse_dt(order.get("date_paid"))
-                
-                # Billing informatie
-                billing = order.get("billing", {})
-                billing_first_name = (billing.get("first_name") or "").strip() or None
-                billing_last_name = (billing.get("last_name") or "").strip() or None
-                billing_email = (billing.get("email") or "").strip() or None
-                billing_phone = (billing.get("phone") or "").strip() or None
-                billing_company = (billing.get("company") or "").strip() or None
-                billing_address1 = (billing.get("address_1") or "").strip() or None
-                billing_address2 = (billing.get("address_2") or "").strip() or None
-                billing_city = (billing.get("city") or "").strip() or None
-                billing_postcode = (billing.get("postcode") or "").strip() or None
-                billing_country = (billing.get("country") or "").strip() or None
+    # Alle subscriptions één keer ophalen en naar elke builder sturen
+    rows: Dict[str, List[Tuple]] = {table: [] for table in tables}
+    for page in woo_client.paginate("subscriptions", per_page=50, fields=subscription_fields(tables)):
+        for subscription in page:
+            for table in tables:
+                rows[table].extend(SUBSCRIPTION_FANOUT[table][1](subscription))
+    
+    # Per tabel invoegen
+    for table in tables:
+        SUBSCRIPTION_FANOUT[table][2](conn, rows[table])
+
+
+def update_subscriptions(conn: pyodbc.Connection, woo_client: WooClient) -> None:
+    """Update subscriptions tabel - complete replace"""
+    update_subscription_tables(conn, woo_client, ["subscriptions"])
+
+
+def update_subscription_items(conn: pyodbc.Connection, woo_client: WooClient) -> None:
+    """Update subscription items tabel - complete replace"""
+    update_subscription_tables(conn, woo_client, ["subscription_items"])
+
+
+def update_subscription_shipping(conn: pyodbc.Connection, woo_client: WooClient) -> None:
+    """Update subscription shipping tabel - complete replace"""
+    update_subscription_tables(conn, woo_client, ["subscription_shipping"])
+
+
+# ============================================================================
+# ORDERS UPDATE (laatste 7 dagen)
+# ============================================================================
+
+ORDER_FIELDS = [
+    "id", "date_created", "date_modified", "status", "customer_id", "order_key", "number",
+    "currency", "payment_method", "total", "total_tax", "shipping_total", "shipping_tax",
+    "date_completed", "date_paid", "billing", "shipping", "line_items", "shipping_lines",
+]
+
+
+def _parse_orders(orders: List[dict], orders_data: List[tuple], order_items_data: List[tuple], order_shipping_data: List[tuple]) -> None:
+    """Zet WooCommerce orders om naar rijen voor Orders, OrderItems en OrderShipping"""
+    for order in orders:
+        try:
+            order_id = int(order.get("id"))
+            order_date = parse_dt(order.get("date_created"))
+            order_modified = parse_dt(order.get("date_modified"))
+            order_status = (order.get("status") or "").strip() or "unknown"
+            customer_id = int((order.get("customer_id") or 0)) or None
+            order_key = (order.get("order_key") or "").strip() or None
+            order_number = (order.get("number") or "").strip() or None
+            currency = (order.get("currency") or "").strip() or "EUR"
+            payment_method = (order.get("payment_method") or "").strip() or None
+            order_total = to_decimal(order.get("total")) or 0.0
+            order_tax = to_decimal(order.get("total_tax")) or 0.0
+            order_shipping = to_decimal(order.get("shipping_total")) or 0.0
+            order_shipping_tax = to_decimal(order.get("shipping_tax")) or 0.0
+            date_completed = parse_dt(order.get("date_completed"))
+            date_paid = parse_dt(order.get("date_paid"))
+            
+            # Billing informatie
+            billing = order.get("billing", {})
+            billing_first_name = (billing.get("first_name") or "").strip() or None
+            billing_last_name = (billing.get("last_name") or "").strip() or None
+            billing_email = (billing.get("email") or "").strip() or None
+            billing_phone = (billing.get("phone") or "").strip() or None
+            billing_company = (billing.get("company") or "").strip() or None
+            billing_address1 = (billing.get("address_1") or "").strip() or None
+            billing_address2 = (billing.get("address_2") or "").strip() or None
+            billing_city = (billing.get("city") or "").strip() or None
+            billing_postcode = (billing.get("postcode") or "").strip() or None
+            billing_country = (billing.get("country") or "").strip() or None
+            
+            # Shipping informatie
+            shipping = order.get("shipping", {})
+            shipping_first_name = (shipping.get("first_name") or "").strip() or None
+            shipping_last_name = (shipping.get("last_name") or "").strip() or None
+            shipping_company = (shipping.get("company") or "").strip() or None
+            shipping_address1 = (shipping.get("address_1") or "").strip() or None
+            shipping_address2 = (shipping.get("address_2") or "").strip() or None
+            shipping_city = (shipping.get("city") or "").strip() or None
+            shipping_postcode = (shipping.get("postcode") or "").strip() or None
+            shipping_country = (shipping.get("country") or "").strip() or None
+            
+            if order_id:
+                orders_data.append((
+                    order_id, order_date, order_modified, order_status, customer_id,
+                    order_key, order_number, currency, payment_method, order_total,
+                    order_tax, order_shipping, order_shipping_tax, date_completed,
+                    date_paid, billing_first_name, billing_last_name, billing_email,
+                    billing_phone, billing_company, billing_address1, billing_address2,
+                    billing_city, billing_postcode, billing_country, shipping_first_name,
+                    shipping_last_name, shipping_company, shipping_address1,
+                    shipping_address2, shipping_city, shipping_postcode, shipping_country
+                ))
                 
-                # Shipping informatie
-                shipping = order.get("shipping", {})
-                shipping_first_name = (shipping.get("first_name") or "").strip() or None
-                shipping_last_name = (shipping.get("last_name") or "").strip() or None
-                shipping_company = (shipping.get("company") or "").strip() or None
-                shipping_address1 = (shipping.get("address_1") or "").strip() or None
-                shipping_address2 = (shipping.get("address_2") or "").strip() or None
-                shipping_city = (shipping.get("city") or "").strip() or None
-                shipping_postcode = (shipping.get("postcode") or "").strip() or None
-                shipping_country = (shipping.get("country") or "").strip() or None
+                # Order items ophalen
+                line_items = order.get("line_items", [])
+                for item in line_items:
+                    try:
+                        item_id = int(item.get("id"))
+                        product_id = int((item.get("product_id") or 0)) or None
+                        variation_id = int((item.get("variation_id") or 0)) or None
+                        name = (item.get("name") or "").strip()
+                        quantity = int((item.get("quantity") or 1))
+                        subtotal = to_decimal(item.get("subtotal"))
+                        subtotal_tax = to_decimal(item.get("subtotal_tax"))
+                        total = to_decimal(item.get("total"))
+                        total_tax = to_decimal(item.get("total_tax"))
+                        sku = (item.get("sku") or "").strip() or None
+                        
+                        if item_id:
+                            order_items_data.append((
+                                item_id, order_id, "line_item", name, product_id,
+                                variation_id, sku, quantity, subtotal, subtotal_tax, total, total_tax, None
+                            ))
+                    except Exception as e:
+                        logging.warning(f"Fout bij verwerken order item {item.get('id')}: {e}")
+                        continue
                 
-                if order_id:
-                    orders_data.append((
-                        order_id, order_date, order_modified, order_status, customer_id,
-                        order_key, order_number, currency, payment_method, order_total,
-                        order_tax, order_shipping, order_shipping_tax, date_completed,
-                        date_paid, billing_first_name, billing_last_name, billing_email,
-                        billing_phone, billing_company, billing_address1, billing_address2,
-                        billing_city, billing_postcode, billing_country, shipping_first_name,
-                        shipping_last_name, shipping_company, shipping_address1,
-                        shipping_address2, shipping_city, shipping_postcode, shipping_country
-                    ))
-                    
-                    # Order items ophalen
-                    line_items = order.get("line_items", [])
-                    for item in line_items:
-                        try:
-                            item_id = int(item.get("id"))
-                            product_id = int((item.get("product_id") or 0)) or None
-                            variation_id = int((item.get("variation_id") or 0)) or None
-                            name = (item.get("name") or "").strip()
-                            quantity = int((item.get("quantity") or 1))
-                            subtotal = to_decimal(item.get("subtotal"))
-                            subtotal_tax = to_decimal(item.get("subtotal_tax"))
-                            total = to_decimal(item.get("total"))
-                            total_tax = to_decimal(item.get("total_tax"))
-                            sku = (item.get("sku") or "").strip() or None
-                            
-                            if item_id:
-                                order_items_data.append((
-                                    item_id, order_id, "line_item", name, product_id,
-                                    variation_id, sku, quantity, subtotal, subtotal_tax, total, total_tax, None
-                                ))
-                        except Exception as e:
-                            logging.warning(f"Fout bij verwerken order item {item.get('id')}: {e}")
-                            continue
-                    
-                    # Order shipping ophalen
-                    shipping_lines = order.get("shipping_lines", [])
-                    for shipping in shipping_lines:
-                        try:
-                            shipping_id = int(shipping.get("id"))
-                            method_title = (shipping.get("method_title") or "").strip()
-                            method_id = (shipping.get("method_id") or "").strip()
-                            total = to_decimal(shipping.get("total"))
-                            total_tax = to_decimal(shipping.get("total_tax"))
-                            
-                            if shipping_id:
-                                order_shipping_data.append((
-                                    shipping_id, order_id, method_title, total, total_tax
-                                ))
-                        except Exception as e:
-                            logging.warning(f"Fout bij verwerken order shipping {shipping.get('id')}: {e}")
-                            continue
-                            
-            except Exception as e:
-                logging.warning(f"Fout bij verwerken order {order.get('id')}: {e}")
-                continue
-    
-    # Orders invoegen (truncate op datum en insert)
-    if orders_data:
+                # Order shipping ophalen
+                shipping_lines = order.get("shipping_lines", [])
+                for shipping in shipping_lines:
+                    try:
+                        shipping_id = int(shipping.get("id"))
+                        method_title = (shipping.get("method_title") or "").strip()
+                        method_id = (shipping.get("method_id") or "").strip()
+                        total = to_decimal(shipping.get("total"))
+                        total_tax = to_decimal(shipping.get("total_tax"))
+                        
+                        if shipping_id:
+                            order_shipping_data.append((
+                                shipping_id, order_id, method_title, total, total_tax
+                            ))
+                    except Exception as e:
+                        logging.warning(f"Fout bij verwerken order shipping {shipping.get('id')}: {e}")
+                        continue
+                        
+        except Exception as e:
+            logging.warning(f"Fout bij verwerken order {order.get('id')}: {e}")
+            continue
+
+
+# Orders worden per tijdvak opgehaald en weggeschreven; na elk gecommit tijdvak
+# legt het checkpoint vast tot waar de orders compleet zijn
+ORDER_SLICE_DAYS = 1
+
+
+def _delete_order_rows(cursor: pyodbc.Cursor, table: str, order_ids: List[int], chunk_size: int = 500) -> int:
+    """Verwijder rijen voor de gegeven OrderIDs, in chunks onder de parameterlimiet van SQL Server"""
+    deleted = 0
+    for i in range(0, len(order_ids), chunk_size):
+        chunk = order_ids[i:i + chunk_size]
+        placeholders = ",".join(["?" for _ in chunk])
+        cursor.execute(f"DELETE FROM {table} WHERE OrderID IN ({placeholders})", chunk)
+        deleted += max(cursor.rowcount, 0)
+    return deleted
+
+
+def _write_order_slice(conn: pyodbc.Connection, slice_start: datetime,
+                       orders_data: List[tuple], order_items_data: List[tuple], order_shipping_data: List[tuple]) -> None:
+    """Vervang de opgehaalde orders van één tijdvak in één transactie"""
+    order_ids = [order[0] for order in orders_data]
+    try:
         with conn.cursor() as cursor:
-            # Verwijder orders van laatste X dagen
-            # Converteer ISO timestamp naar datetime voor database vergelijking
-            days_ago_dt = datetime.fromisoformat(days_ago.replace('Z', '+00:00'))
-            cursor.execute("DELETE FROM Orders WHERE OrderDate >= ?", days_ago_dt)
-            deleted_orders = cursor.rowcount
-            logging.info(f"{deleted_orders} bestaande orders verwijderd van laatste {days_back} dagen")
+            # Alleen op de opgehaalde OrderIDs verwijderen: OrderDate is lokale tijd van de
+            # site en valt niet precies binnen de UTC grenzen van het tijdvak
+            deleted_orders = _delete_order_rows(cursor, "Orders", order_ids)
+            deleted_order_items = _delete_order_rows(cursor, "OrderItems", order_ids)
+            deleted_order_shipping = _delete_order_rows(cursor, "OrderShipping", order_ids)
             
-            # Nieuwe orders invoegen - 33 kolommen
-            cursor.executemany(
-                """
-                INSERT INTO Orders (
-                    OrderID, OrderDate, OrderModified, OrderStatus, CustomerID,
-                    OrderKey, OrderNumber, Currency, PaymentMethod, OrderTotal,
-                    OrderTax, OrderShipping, OrderShippingTax, DateCompleted, DatePaid,
-                    BillingFirstName, BillingLastName, BillingEmail, BillingPhone, BillingCompany,
-                    BillingAddress1, BillingAddress2, BillingCity, BillingPostcode, BillingCountry,
-                    ShippingFirstName, ShippingLastName, ShippingCompany, ShippingAddress1,
-                    ShippingAddress2, ShippingCity, ShippingPostcode, ShippingCountry
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                orders_data
-            )
-            conn.commit()
-            logging.info(f"{len(orders_data)} nieuwe orders ingevoegd")
-    else:
-        logging.info("Geen nieuwe orders gevonden")
+            if orders_data:
+                # Nieuwe orders invoegen - 33 kolommen
+                cursor.executemany(
+                    """
+                    INSERT INTO Orders (
+                        OrderID, OrderDate, OrderModified, OrderStatus, CustomerID,
+                        OrderKey, OrderNumber, Currency, PaymentMethod, OrderTotal,
+                        OrderTax, OrderShipping, OrderShippingTax, DateCompleted, DatePaid,
+                        BillingFirstName, BillingLastName, BillingEmail, BillingPhone, BillingCompany,
+                        BillingAddress1, BillingAddress2, BillingCity, BillingPostcode, BillingCountry,
+                        ShippingFirstName, ShippingLastName, ShippingCompany, ShippingAddress1,
+                        ShippingAddress2, ShippingCity, ShippingPostcode, ShippingCountry
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    orders_data
+                )
+            if order_items_data:
+                cursor.executemany(
+                    """
+                    INSERT INTO OrderItems (OrderItemID, OrderID, OrderItemType, OrderItemName, ProductID,
+                                          VariationID, SKU, Quantity, LineSubtotal, LineSubtotalTax, LineTotal, LineTotalTax, TaxClass)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    order_items_data
+                )
+            if order_shipping_data:
+                cursor.executemany(
+                    """
+                    INSERT INTO OrderShipping (ShippingItemID, OrderID, ShippingMethod, ShippingCost, ShippingTax)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    order_shipping_data
+                )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logging.info(f"Tijdvak vanaf {slice_start.isoformat()}: {deleted_orders} orders, {deleted_order_items} order items en "
+                 f"{deleted_order_shipping} shipping records vervangen door {len(orders_data)} orders, "
+                 f"{len(order_items_data)} order items en {len(order_shipping_data)} shipping records")
+
+
+def update_orders(conn: pyodbc.Connection, woo_client: WooClient, days_back: int = 30,
+                  checkpoints: Optional[CheckpointStore] = None) -> None:
+    """Update orders van laatste X dagen (standaard 30 dagen)
     
-    # Order items invoegen (truncate op OrderID en insert)
-    if order_items_data:
-        with conn.cursor() as cursor:
-            # Verwijder order items voor deze orders
-            order_ids = [str(order[0]) for order in orders_data]
-            placeholders = ",".join(["?" for _ in order_ids])
-            cursor.execute(f"DELETE FROM OrderItems WHERE OrderID IN ({placeholders})", order_ids)
-            deleted_order_items = cursor.rowcount
-            logging.info(f"{deleted_order_items} bestaande order items verwijderd voor {len(order_ids)} orders")
-            
-            # Nieuwe order items invoegen
-            cursor.executemany(
-                """
-                INSERT INTO OrderItems (OrderItemID, OrderID, OrderItemType, OrderItemName, ProductID,
-                                      VariationID, SKU, Quantity, LineSubtotal, LineSubtotalTax, LineTotal, LineTotalTax, TaxClass)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                order_items_data
-            )
-            conn.commit()
-            logging.info(f"{len(order_items_data)} nieuwe order items ingevoegd")
+    De orders worden per tijdvak van ``ORDER_SLICE_DAYS`` opgehaald en per tijdvak
+    in één transactie op OrderID vervangen, samen met hun items en shipping. Met ``checkpoints`` wordt na elk tijdvak
+    vastgelegd tot welke datum de orders compleet zijn. Een hervatte run gebruikt
+    hetzelfde venster en gaat verder vanaf die datum; er wordt niet op
+    paginanummer hervat, omdat pagina's verschuiven zolang er orders bijkomen.
+    """
+    logging.info(f"Start bijwerken van orders (laatste {days_back} dagen)...")
     
-    # Order shipping invoegen (truncate op OrderID en insert)
-    if order_shipping_data:
-        with conn.cursor() as cursor:
-            # Verwijder order shipping voor deze orders
-            order_ids = [str(order[0]) for order in orders_data]
-            placeholders = ",".join(["?" for _ in order_ids])
-            cursor.execute(f"DELETE FROM OrderShipping WHERE OrderID IN ({placeholders})", order_ids)
-            deleted_order_shipping = cursor.rowcount
-            logging.info(f"{deleted_order_shipping} bestaande order shipping records verwijderd voor {len(order_ids)} orders")
-            
-            # Nieuwe order shipping invoegen
-            cursor.executemany(
-                """
-                INSERT INTO OrderShipping (ShippingItemID, OrderID, ShippingMethod, ShippingCost, ShippingTax)
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                order_shipping_data
-            )
-            conn.commit()
-            logging.info(f"{len(order_shipping_data)} nieuwe order shipping records ingevoegd")
+    # Datum X dagen geleden in ISO 8601 formaat, op hele seconden zoals de WooCommerce datums
+    days_ago = (datetime.now(timezone.utc) - timedelta(days=days_back)).replace(microsecond=0).isoformat()
+    
+    # Hervatten vanaf checkpoint: zelfde venster, vanaf het laatst gecommitte tijdvak
+    checkpoint = checkpoints.get("orders") if checkpoints else {}
+    done_until = None
+    if checkpoint.get("status") == "in_progress" and checkpoint.get("after"):
+        days_ago = checkpoint["after"]
+        done_until = checkpoint.get("done_until")
+        logging.info(f"Hervatten orders vanaf {done_until or days_ago} ({checkpoint.get('orders_saved', 0)} orders al opgeslagen)")
+    orders_saved = int(checkpoint.get("orders_saved", 0)) if done_until else 0
+    
+    days_ago_dt = datetime.fromisoformat(days_ago.replace('Z', '+00:00'))
+    slice_start = datetime.fromisoformat(done_until.replace('Z', '+00:00')) if done_until else days_ago_dt
+    
+    while True:
+        # Het laatste tijdvak heeft geen einddatum, zodat ook orders van tijdens de sync meekomen
+        slice_end: Optional[datetime] = slice_start + timedelta(days=ORDER_SLICE_DAYS)
+        if slice_end >= datetime.now(timezone.utc):
+            slice_end = None
+        
+        # 'after' en 'before' zijn exclusief; één seconde eerder beginnen zodat een order
+        # precies op de grens in dit tijdvak valt en niet in het vorige
+        params = {"after": (slice_start - timedelta(seconds=1)).isoformat(), "per_page": 50}
+        if slice_end is not None:
+            params["before"] = slice_end.isoformat()
+        
+        orders_data: List[tuple] = []
+        order_items_data: List[tuple] = []
+        order_shipping_data: List[tuple] = []
+        for page in woo_client.paginate("orders", params, fields=ORDER_FIELDS):
+            _parse_orders(page, orders_data, order_items_data, order_shipping_data)
+        
+        _write_order_slice(conn, slice_start, orders_data, order_items_data, order_shipping_data)
+        orders_saved += len(orders_data)
+        
+        if slice_end is None:
+            break
+        if checkpoints:
+            checkpoints.update("orders", after=days_ago, done_until=slice_end.isoformat(), orders_saved=orders_saved)
+        slice_start = slice_end
+    
+    if orders_saved:
+        logging.info(f"{orders_saved} orders bijgewerkt van laatste {days_back} dagen")
+    else:
+        logging.info("Geen nieuwe orders gevonden")
 
 
 # ============================================================================
 # MAIN UPDATE FUNCTION
 # ============================================================================
 
-def update_all_from_woo(skip_tables: Optional[List[str]] = None, orders_days_back: int = 30) -> None:
+def update_all_from_woo(skip_tables: Optional[List[str]] = None, orders_days_back: int = 30, resume: bool = False) -> None:
     """Update alle tabellen vanuit WooCommerce in logische volgorde
     
     Args:
         skip_tables: Lijst van tabelnamen om over te slaan (bijv. ['customers', 'products'])
         orders_days_back: Aantal dagen terug voor orders (standaard 30)
+        resume: Een onderbroken run hervatten en de al voltooide tabellen overslaan
     """
     logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
     
     if skip_tables is None:
         skip_tables = []
     
+    # Subscriptions, items en shipping delen één paginering over subscriptions
+    subscription_tables = [t for t in SUBSCRIPTION_TABLES if t not in skip_tables]
+    
     # Alle beschikbare tabellen met hun update functies
     table_updates = [
         ("customers", update_customers, "1. Customers (basis tabel)"),
         ("products", update_products, "2. Products (basis tabel)"),
-        ("subscriptions", update_subscriptions, "3. Subscriptions (afhankelijk van customers)"),
-        ("subscription_items", update_subscription_items, "4. Subscription Items (afhankelijk van subscriptions)"),
-        ("subscription_shipping", update_subscription_shipping, "5. Subscription Shipping (afhankelijk van subscriptions)"),
-                           ("orders", lambda conn, woo_client: update_orders(conn, woo_client, orders_days_back), "6. Orders, Order Items, Order Shipping (afhankelijk van customers en products)"),
+        ("subscription_tables", lambda conn, woo_client: update_subscription_tables(conn, woo_client, subscription_tables), f"3-5. {', '.join(subscription_tables)} (één fetch, afhankelijk van customers)"),
+        ("orders", lambda conn, woo_client: update_orders(conn, woo_client, orders_days_back, checkpoints), "6. Orders, Order Items, Order Shipping (afhankelijk van customers en products)"),
     ]
     
     try:
@@ -673,7 +774,15 @@ def update_all_from_woo(skip_tables: Optional[List[str]] = None, orders_days_bac
         
         # Verbindingen maken
         conn = connect_azuresql(db_config)
-        woo_client = WooClient(woo_url, woo_key, woo_secret)
+        woo_client = WooClient(
+            woo_url, woo_key, woo_secret,
+            max_workers=int(os.environ.get("WOO_MAX_WORKERS", "4")),
+            pool_size=int(os.environ.get("WOO_POOL_SIZE", "10")),
+        )
+        
+        # Checkpoints per tabel, zodat een afgebroken run met --resume verder kan
+        checkpoints = CheckpointStore("update_all_from_woo")
+        checkpoints.start_run(resume)
         
         logging.info("Start bijwerken van alle tabellen vanuit WooCommerce")
         if skip_tables:
@@ -681,18 +790,24 @@ def update_all_from_woo(skip_tables: Optional[List[str]] = None, orders_days_bac
         
         # Voer updates uit voor niet-overgeslagen tabellen
         for table_name, update_func, description in table_updates:
-            if table_name in skip_tables:
+            if table_name in skip_tables or (table_name == "subscription_tables" and not subscription_tables):
                 logging.info(f"Overslaan: {description}")
                 continue
+            if checkpoints.resumed and checkpoints.is_completed(table_name):
+                logging.info(f"Al voltooid in onderbroken run, overslaan: {description}")
+                continue
             
             try:
                 logging.info(f"Start: {description}")
                 update_func(conn, woo_client)
+                checkpoints.mark_completed(table_name)
                 logging.info(f"Voltooid: {description}")
             except Exception as e:
                 logging.error(f"Fout bij bijwerken van {table_name}: {e}")
+                logging.info("Hervat deze run met --resume")
                 raise
         
+        checkpoints.finish_run()
         logging.info("Alle geselecteerde tabellen succesvol bijgewerkt!")
         
     except Exception as e:
@@ -701,6 +816,8 @@ def update_all_from_woo(skip_tables: Optional[List[str]] = None, orders_days_bac
     finally:
         if 'conn' in locals():
             conn.close()
+        if 'woo_client' in locals():
+            woo_client.close()
 
 
 if __name__ == "__main__":
@@ -710,6 +827,7 @@ if __name__ == "__main__":
     parser.add_argument("--skip", nargs="+", help="Tabellen om over te slaan (bijv. --skip customers products)")
     parser.add_argument("--list-tables", action="store_true", help="Toon alle beschikbare tabellen")
     parser.add_argument("--orders-days", type=int, default=30, help="Aantal dagen terug voor orders (standaard: 30)")
+    parser.add_argument("--resume", action="store_true", help="Onderbroken run hervatten; voltooide tabellen worden overgeslagen")
     
     args = parser.parse_args()
     
@@ -725,4 +843,4 @@ if __name__ == "__main__":
         sys.exit(0)
     
     skip_tables = args.skip or []
-    update_all_from_woo(skip_tables, args.orders_days)
+    update_all_from_woo(skip_tables, args.orders_days, args.resume)
@@ -12,6 +12,7 @@ from dotenv import load_dotenv
 from dateutil import parser as date_parser
 
 from _woo_client import WooClient
+from _bulk_upsert import UpsertResult, bulk_upsert
 
 load_dotenv()
 
@@ -66,29 +67,13 @@ def normalize_email(value: Optional[str]) -> Optional[str]:
     return v or None
 
 
-def upsert(cursor: pyodbc.Cursor, rows: List[Tuple]) -> int:
-    affected = 0
-    for r in rows:
-        cursor.execute(
-            """
-            UPDATE [dbo].[Customers]
-               SET [CustomerID]=?,[FirstName]=?,[LastName]=?,[Phone]=?,[Company]=?,[DateRegistered]=?
-             WHERE [Email]=?
-            """,
-            r[0], r[2], r[3], r[4], r[5], r[6], r[1]
-        )
-        if cursor.rowcount and cursor.rowcount > 0:
-            affected += cursor.rowcount
-            continue
-        cursor.execute(
-            """
-            INSERT INTO [dbo].[Customers] ([CustomerID],[Email],[FirstName],[LastName],[Phone],[Company],[DateRegistered])
-            VALUES (?,?,?,?,?,?,?)
-            """,
-            r[0], r[1], r[2], r[3], r[4], r[5], r[6]
-        )
-        affected += 1
-    return affected
+CUSTOMER_COLUMNS = [
+    "CustomerID", "Email", "FirstName", "LastName", "Phone", "Company", "DateRegistered",
+]
+
+
+def upsert(cursor: pyodbc.Cursor, rows: List[Tuple]) -> UpsertResult:
+    return bulk_upsert(cursor, "[dbo].[Customers]", CUSTOMER_COLUMNS, ["Email"], rows)
 
 
 def main() -> None:
@@ -107,7 +92,7 @@ def main() -> None:
     conn = connect_azuresql(cfg)
     conn.autocommit = False
 
-    total = 0
+    total = UpsertResult()
     fetched_total = 0
     mapped_total = 0
     pages = 0
@@ -140,7 +125,7 @@ def main() -> None:
                         upserted = upsert(cur, rows)
                         total += upserted
                         conn.commit()
-                        logging.info("Customers page %d: upserted=%d (running=%d)", pages, upserted, total)
+                        logging.info("Customers page %d: upsert %s (running: %s)", pages, upserted, total)
                         mapped_total += len(rows)
             except Exception:
                 logging.warning("Customers endpoint niet beschikbaar; val terug op orders → billing emails.")
@@ -173,7 +158,7 @@ def main() -> None:
                         upserted = upsert(cur, rows)
                         total += upserted
                         conn.commit()
-                        logging.info("Orders→customers page %d: upserted=%d (running=%d)", pages, upserted, total)
+                        logging.info("Orders→customers page %d: upsert %s (running: %s)", pages, upserted, total)
                         mapped_total += len(rows)
         if pages == 0 or fetched_total == 0:
             logging.warning("Customers: geen data opgehaald.")
@@ -182,7 +167,7 @@ def main() -> None:
         raise
     finally:
         conn.close()
-    logging.info("Customers klaar; pages=%d fetched=%d mapped=%d upserted=%d", pages, fetched_total, mapped_total, total)
+    logging.info("Customers klaar; pages=%d fetched=%d mapped=%d %s", pages, fetched_total, mapped_total, total)
 
 
 if __name__ == "__main__":
@@ -13,6 +13,7 @@ from dotenv import load_dotenv
 from datetime import datetime, timezone, timedelta
 
 from _woo_client import WooClient
+from _bulk_upsert import UpsertResult, bulk_upsert
 
 load_dotenv()
 
@@ -63,30 +64,14 @@ def to_decimal(value: Optional[str | float | int]) -> float:
             return 0.0
 
 
-def upsert(cursor: pyodbc.Cursor, rows: List[Tuple]) -> int:
-    affected = 0
-    for r in rows:
-        cursor.execute(
-            """
-            UPDATE [dbo].[OrderItems]
-               SET [OrderItemType]=?,[OrderItemName]=?,[ProductID]=?,[VariationID]=?,[SKU]=?,[Quantity]=?,[LineSubtotal]=?,[LineSubtotalTax]=?,[LineTotal]=?,[LineTotalTax]=?,[TaxClass]=?
-             WHERE [OrderItemID]=? AND [OrderID]=?
-            """,
-            r[2], r[3], r[4], r[5], r[6], r[7], float(r[8]), float(r[9]), float(r[10]), float(r[11]), r[12], r[0], r[1]
-        )
-        if cursor.rowcount and cursor.rowcount > 0:
-            affected += cursor.rowcount
-            continue
-        cursor.execute(
-            """
-            INSERT INTO [dbo].[OrderItems] (
-                [OrderItemID],[OrderID],[OrderItemType],[OrderItemName],[ProductID],[VariationID],[SKU],[Quantity],[LineSubtotal],[LineSubtotalTax],[LineTotal],[LineTotalTax],[TaxClass]
-            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
-            """,
-            r[0], r[1], r[2], r[3], r[4], r[5], r[6], r[7], float(r[8]), float(r[9]), float(r[10]), float(r[11]), r[12]
-        )
-        affected += 1
-    return affected
+ORDER_ITEM_COLUMNS = [
+    "OrderItemID", "OrderID", "OrderItemType", "OrderItemName", "ProductID", "VariationID", "SKU",
+    "Quantity", "LineSubtotal", "LineSubtotalTax", "LineTotal", "LineTotalTax", "TaxClass",
+]
+
+
+def upsert(cursor: pyodbc.Cursor, rows: List[Tuple]) -> UpsertResult:
+    return bulk_upsert(cursor, "[dbo].[OrderItems]", ORDER_ITEM_COLUMNS, ["OrderItemID", "OrderID"], rows)
 
 
 def main() -> None:
@@ -105,7 +90,7 @@ def main() -> None:
     conn = connect_azuresql(cfg)
     conn.autocommit = False
 
-    total = 0
+    total = UpsertResult()
     fetched_total = 0
     mapped_total = 0
     pages = 0
@@ -146,7 +131,7 @@ def main() -> None:
                     upserted = upsert(cur, rows)
                     total += upserted
                     conn.commit()
-                    logging.info("Order items page %d: upserted=%d (running=%d)", pages, upserted, total)
+                    logging.info("Order items page %d: upsert %s (running: %s)", pages, upserted, total)
                     mapped_total += len(rows)
         if pages == 0 or fetched_total == 0:
             logging.warning("Order items: geen data opgehaald in de lookback-periode.")
@@ -155,7 +140,7 @@ def main() -> None:
         raise
     finally:
         conn.close()
-    logging.info("Order items klaar; pages=%d fetched_orders=%d mapped_items=%d upserted=%d", pages, fetched_total, mapped_total, total)
+    logging.info("Order items klaar; pages=%d fetched_orders=%d mapped_items=%d %s", pages, fetched_total, mapped_total, total)
 
 
 if __name__ == "__main__":
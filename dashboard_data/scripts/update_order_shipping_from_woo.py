@@ -13,6 +13,7 @@ from dotenv import load_dotenv
 from datetime import datetime, timezone, timedelta
 
 from _woo_client import WooClient
+from _bulk_upsert import UpsertResult, bulk_upsert
 
 load_dotenv()
 
@@ -63,29 +64,13 @@ def to_decimal(value: Optional[str | float | int]) -> float:
             return 0.0
 
 
-def upsert(cursor: pyodbc.Cursor, rows: List[Tuple]) -> int:
-    affected = 0
-    for r in rows:
-        cursor.execute(
-            """
-            UPDATE [dbo].[OrderShipping]
-               SET [ShippingMethod]=?,[ShippingCost]=?,[ShippingTax]=?
-             WHERE [ShippingItemID]=? AND [OrderID]=?
-            """,
-            r[2], float(r[3]), float(r[4]), r[0], r[1]
-        )
-        if cursor.rowcount and cursor.rowcount > 0:
-            affected += cursor.rowcount
-            continue
-        cursor.execute(
-            """
-            INSERT INTO [dbo].[OrderShipping] ([ShippingItemID],[OrderID],[ShippingMethod],[ShippingCost],[ShippingTax])
-            VALUES (?,?,?,?,?)
-            """,
-            r[0], r[1], r[2], float(r[3]), float(r[4])
-        )
-        affected += 1
-    return affected
+ORDER_SHIPPING_COLUMNS = [
+    "ShippingItemID", "OrderID", "ShippingMethod", "ShippingCost", "ShippingTax",
+]
+
+
+def upsert(cursor: pyodbc.Cursor, rows: List[Tuple]) -> UpsertResult:
+    return bulk_upsert(cursor, "[dbo].[OrderShipping]", ORDER_SHIPPING_COLUMNS, ["ShippingItemID", "OrderID"], rows)
 
 
 def main() -> None:
@@ -104,7 +89,7 @@ def main() -> None:
     conn = connect_azuresql(cfg)
     conn.autocommit = False
 
-    total = 0
+    total = UpsertResult()
     fetched_total = 0
     mapped_total = 0
     pages = 0
@@ -132,7 +117,7 @@ def main() -> None:
                     upserted = upsert(cur, rows)
                     total += upserted
                     conn.commit()
-                    logging.info("Order shipping page %d: upserted=%d (running=%d)", pages, upserted, total)
+                    logging.info("Order shipping page %d: upsert %s (running: %s)", pages, upserted, total)
                     mapped_total += len(rows)
         if pages == 0 or fetched_total == 0:
             logging.warning("Order shipping: geen data opgehaald in de lookback-periode.")
@@ -141,7 +126,7 @@ def main() -> None:
         raise
     finally:
         conn.close()
-    logging.info("Order shipping klaar; pages=%d fetched_orders=%d mapped_rows=%d upserted=%d", pages, fetched_total, mapped_total, total)
+    logging.info("Order shipping klaar; pages=%d fetched_orders=%d mapped_rows=%d %s", pages, fetched_total, mapped_total, total)
 
 
 if __name__ == "__main__":
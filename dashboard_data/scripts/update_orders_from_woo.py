@@ -14,6 +14,7 @@ from dateutil import parser as date_parser
 from datetime import datetime, timezone, timedelta
 
 from _woo_client import WooClient
+from _bulk_upsert import UpsertResult, bulk_upsert
 
 load_dotenv()
 
@@ -143,40 +144,19 @@ def map_woo_order_to_row(o: dict) -> Optional[Tuple]:
     return row
 
 
-def upsert(cursor: pyodbc.Cursor, rows: List[Tuple]) -> int:
-    affected = 0
-    for r in rows:
-        cursor.execute(
-            """
-            UPDATE [dbo].[Orders]
-               SET [OrderDate]=?,[OrderModified]=?,[OrderStatus]=?,[CustomerID]=?,[OrderKey]=?,[OrderNumber]=?,[Currency]=?,[PaymentMethod]=?,[CreatedVia]=?,
-                   [OrderTotal]=?,[OrderTax]=?,[OrderShipping]=?,[OrderShippingTax]=?,[DateCompleted]=?,[DatePaid]=?,
-                   [BillingFirstName]=?,[BillingLastName]=?,[BillingEmail]=?,[BillingPhone]=?,[BillingCompany]=?,[BillingAddress1]=?,[BillingAddress2]=?,[BillingCity]=?,[BillingPostcode]=?,[BillingCountry]=?,
-                   [ShippingFirstName]=?,[ShippingLastName]=?,[ShippingCompany]=?,[ShippingAddress1]=?,[ShippingAddress2]=?,[ShippingCity]=?,[ShippingPostcode]=?,[ShippingCountry]=?
-             WHERE [OrderID]=?
-            """,
-            r[1], r[2], r[3], r[4], r[5], r[6], r[7], r[8], r[9], float(r[10]), float(r[11]), float(r[12]), float(r[13]), r[14], r[15],
-            r[16], r[17], r[18], r[19], r[20], r[21], r[22], r[23], r[24], r[25],
-            r[26], r[27], r[28], r[29], r[30], r[31], r[32], r[33], r[0]
-        )
-        if cursor.rowcount and cursor.rowcount > 0:
-            affected += cursor.rowcount
-            continue
-        cursor.execute(
-            """
-            INSERT INTO [dbo].[Orders] (
-                [OrderID],[OrderDate],[OrderModified],[OrderStatus],[CustomerID],[OrderKey],[OrderNumber],[Currency],[PaymentMethod],[CreatedVia],
-                [OrderTotal],[OrderTax],[OrderShipping],[OrderShippingTax],[DateCompleted],[DatePaid],
-                [BillingFirstName],[BillingLastName],[BillingEmail],[BillingPhone],[BillingCompany],[BillingAddress1],[BillingAddress2],[BillingCity],[BillingPostcode],[BillingCountry],
-                [ShippingFirstName],[ShippingLastName],[ShippingCompany],[ShippingAddress1],[ShippingAddress2],[ShippingCity],[ShippingPostcode],[ShippingCountry]
-            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-            """,
-            r[0], r[1], r[2], r[3], r[4], r[5], r[6], r[7], r[8], r[9], float(r[10]), float(r[11]), float(r[12]), float(r[13]), r[14], r[15],
-            r[16], r[17], r[18], r[19], r[20], r[21], r[22], r[23], r[24], r[25],
-            r[26], r[27], r[28], r[29], r[30], r[31], r[32], r[33]
-        )
-        affected += 1
-    return affected
+ORDER_COLUMNS = [
+    "OrderID", "OrderDate", "OrderModified", "OrderStatus", "CustomerID", "OrderKey",
+    "OrderNumber", "Currency", "PaymentMethod", "CreatedVia", "OrderTotal", "OrderTax",
+    "OrderShipping", "OrderShippingTax", "DateCompleted", "DatePaid", "BillingFirstName",
+    "BillingLastName", "BillingEmail", "BillingPhone", "BillingCompany", "BillingAddress1",
+    "BillingAddress2", "BillingCity", "BillingPostcode", "BillingCountry", "ShippingFirstName",
+    "ShippingLastName", "ShippingCompany", "ShippingAddress1", "ShippingAddress2", "ShippingCity",
+    "ShippingPostcode", "ShippingCountry",
+]
+
+
+def upsert(cursor: pyodbc.Cursor, rows: List[Tuple]) -> UpsertResult:
+    return bulk_upsert(cursor, "[dbo].[Orders]", ORDER_COLUMNS, ["OrderID"], rows)
 
 
 def main() -> None:
@@ -195,7 +175,7 @@ def main() -> None:
     conn = connect_azuresql(cfg)
     conn.autocommit = False
 
-    total = 0
+    total = UpsertResult()
     fetched_total = 0
     mapped_total = 0
     pages = 0
@@ -228,7 +208,7 @@ def main() -> None:
                 upserted = upsert(cur, rows)
                 total += upserted
                 conn.commit()
-                logging.info("Orders page %d: upserted=%d (running=%d)", pages, upserted, total)
+                logging.info("Orders page %d: upsert %s (running: %s)", pages, upserted, total)
         if pages == 0 or fetched_total == 0:
             logging.warning("Orders: geen data opgehaald in de lookback-periode.")
     except Exception:
@@ -236,7 +216,7 @@ def main() -> None:
         raise
     finally:
         conn.close()
-    logging.info("Orders klaar; pages=%d fetched=%d mapped=%d upserted=%d", pages, fetched_total, mapped_total, total)
+    logging.info("Orders klaar; pages=%d fetched=%d mapped=%d %s", pages, fetched_total, mapped_total, total)
 
 
 if __name__ == "__main__":
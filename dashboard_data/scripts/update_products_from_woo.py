@@ -12,6 +12,7 @@ from dotenv import load_dotenv
 from dateutil import parser as date_parser
 
 from _woo_client import WooClient
+from _bulk_upsert import UpsertResult, bulk_upsert
 
 load_dotenv()
 
@@ -93,30 +94,14 @@ def map_woo_product_to_row(p: dict) -> Optional[Tuple]:
     )
 
 
-def upsert(cursor: pyodbc.Cursor, rows: List[Tuple]) -> int:
-    affected = 0
-    for r in rows:
-        cursor.execute(
-            """
-            UPDATE [dbo].[Products]
-               SET [Name]=?,[Status]=?,[ProductTypeTaxonomyID]=?,[SKU]=?,[RegularPrice]=?,[SalePrice]=?,[TaxClass]=?,[CreatedDate]=?,[ModifiedDate]=?,[ProductType]=?
-             WHERE [ProductID]=?
-            """,
-            r[1], r[2], r[3], r[4], float(r[5]), float(r[6]) if r[6] is not None else None, r[7], r[8], r[9], r[10], r[0]
-        )
-        if cursor.rowcount and cursor.rowcount > 0:
-            affected += cursor.rowcount
-            continue
-        cursor.execute(
-            """
-            INSERT INTO [dbo].[Products] (
-                [ProductID],[Name],[Status],[ProductTypeTaxonomyID],[SKU],[RegularPrice],[SalePrice],[TaxClass],[CreatedDate],[ModifiedDate],[ProductType]
-            ) VALUES (?,?,?,?,?,?,?,?,?,?,?)
-            """,
-            r[0], r[1], r[2], r[3], r[4], float(r[5]), float(r[6]) if r[6] is not None else None, r[7], r[8], r[9], r[10]
-        )
-        affected += 1
-    return affected
+PRODUCT_COLUMNS = [
+    "ProductID", "Name", "Status", "ProductTypeTaxonomyID", "SKU", "RegularPrice", "SalePrice",
+    "TaxClass", "CreatedDate", "ModifiedDate", "ProductType",
+]
+
+
+def upsert(cursor: pyodbc.Cursor, rows: List[Tuple]) -> UpsertResult:
+    return bulk_upsert(cursor, "[dbo].[Products]", PRODUCT_COLUMNS, ["ProductID"], rows)
 
 
 def main() -> None:
@@ -135,7 +120,7 @@ def main() -> None:
     conn = connect_azuresql(cfg)
     conn.autocommit = False
 
-    total = 0
+    total = UpsertResult()
     fetched_total = 0
     mapped_total = 0
     pages = 0
@@ -154,7 +139,7 @@ def main() -> None:
                 upserted = upsert(cur, rows)
                 total += upserted
                 conn.commit()
-                logging.info("Products page %d: upserted=%d (running=%d)", pages, upserted, total)
+                logging.info("Products page %d: upsert %s (running: %s)", pages, upserted, total)
         if pages == 0 or fetched_total == 0:
             logging.warning("Products: geen data opgehaald.")
     except Exception:
@@ -162,7 +147,7 @@ def main() -> None:
         raise
     finally:
         conn.close()
-    logging.info("Products klaar; pages=%d fetched=%d mapped=%d upserted=%d", pages, fetched_total, mapped_total, total)
+    logging.info("Products klaar; pages=%d fetched=%d mapped=%d %s", pages, fetched_total, mapped_total, total)
 
 
 if __name__ == "__main__":
@@ -11,6 +11,7 @@ import pyodbc
 from dotenv import load_dotenv
 
 from _woo_client import WooClient
+from _bulk_upsert import UpsertResult, bulk_upsert
 
 load_dotenv()
 
@@ -104,8 +105,8 @@ def get_existing_subscription_items(conn: pyodbc.Connection) -> Dict[int, Dict[s
 def get_subscription_items_from_woo(woo_client: WooClient, subscription_id: int) -> List[Dict[str, Any]]:
     """Haal subscription items op voor een specifieke subscription vanuit WooCommerce"""
     try:
-        # Haal subscription op
-        subscription = woo_client.get(f"subscriptions/{subscription_id}")
+        # Haal subscription op, alleen de line items
+        subscription = woo_client.parse_json(woo_client.get(f"subscriptions/{subscription_id}", fields=["id", "line_items"]))
         if not subscription:
             return []
         
@@ -139,56 +140,21 @@ def get_subscription_items_from_woo(woo_client: WooClient, subscription_id: int)
         return []
 
 
-def update_subscription_item(conn: pyodbc.Connection, item: Dict[str, Any]) -> bool:
-    """Update een bestaande subscription_item of voeg deze toe als deze niet bestaat"""
-    upsert_sql = """
-    MERGE subscription_items AS target
-    USING (SELECT ? AS SubscriptionItemID) AS source
-    ON target.SubscriptionItemID = source.SubscriptionItemID
-    WHEN MATCHED THEN
-        UPDATE SET
-            SubscriptionID = ?,
-            SubscriptionItemType = ?,
-            SubscriptionItemName = ?,
-            ProductID = ?,
-            VariationID = ?,
-            ProductSKU = ?,
-            Quantity = ?,
-            LineSubtotal = ?,
-            LineSubtotalTax = ?,
-            LineTotal = ?,
-            LineTotalTax = ?,
-            TaxClass = ?,
-            LineTaxData = ?
-    WHEN NOT MATCHED THEN
-        INSERT (
-            SubscriptionItemID, SubscriptionID, SubscriptionItemType, SubscriptionItemName,
-            ProductID, VariationID, ProductSKU, Quantity, LineSubtotal, LineSubtotalTax,
-            LineTotal, LineTotalTax, TaxClass, LineTaxData
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """
-    
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(upsert_sql, (
-                # Voor de MATCHED clause
-                item['SubscriptionItemID'], item['SubscriptionID'], item['SubscriptionItemType'],
-                item['SubscriptionItemName'], item['ProductID'], item['VariationID'],
-                item['ProductSKU'], item['Quantity'], item['LineSubtotal'],
-                item['LineSubtotalTax'], item['LineTotal'], item['LineTotalTax'],
-                item['TaxClass'], item['LineTaxData'],
-                # Voor de NOT MATCHED clause
-                item['SubscriptionItemID'], item['SubscriptionID'], item['SubscriptionItemType'],
-                item['SubscriptionItemName'], item['ProductID'], item['VariationID'],
-                item['ProductSKU'], item['Quantity'], item['LineSubtotal'],
-                item['LineSubtotalTax'], item['LineTotal'], item['LineTotalTax'],
-                item['TaxClass'], item['LineTaxData']
-            ))
-            return True
-    except Exception as e:
-        logging.error(f"Fout bij updaten subscription item {item['SubscriptionItemID']}: {e}")
-        return False
+SUBSCRIPTION_ITEM_COLUMNS = [
+    "SubscriptionItemID", "SubscriptionID", "SubscriptionItemType", "SubscriptionItemName",
+    "ProductID", "VariationID", "ProductSKU", "Quantity", "LineSubtotal", "LineSubtotalTax",
+    "LineTotal", "LineTotalTax", "TaxClass", "LineTaxData",
+]
+
+# Aantal subscriptions waarvan de items samen in één MERGE gaan
+SUBSCRIPTIONS_PER_BATCH = 50
+
+
+def upsert_subscription_items(conn: pyodbc.Connection, items: List[Dict[str, Any]]) -> UpsertResult:
+    """Upsert subscription_items in één set-based MERGE"""
+    rows = [tuple(item[column] for column in SUBSCRIPTION_ITEM_COLUMNS) for item in items]
+    with conn.cursor() as cursor:
+        return bulk_upsert(cursor, "subscription_items", SUBSCRIPTION_ITEM_COLUMNS, ["SubscriptionItemID"], rows)
 
 
 def get_subscription_ids_from_db(conn: pyodbc.Connection) -> List[int]:
@@ -225,10 +191,26 @@ def main() -> None:
         subscription_ids = get_subscription_ids_from_db(conn)
         logging.info(f"Gevonden {len(subscription_ids)} subscriptions om bij te werken")
         
-        updated_count = 0
+        total = UpsertResult()
         error_count = 0
+        pending_items: List[Dict[str, Any]] = []
         
-        for subscription_id in subscription_ids:
+        def flush_pending() -> None:
+            nonlocal total, error_count
+            if not pending_items:
+                return
+            try:
+                result = upsert_subscription_items(conn, pending_items)
+                conn.commit()
+                total += result
+                logging.info(f"Batch van {len(pending_items)} items: {result}")
+            except Exception as e:
+                conn.rollback()
+                logging.error(f"Fout bij upserten van batch met {len(pending_items)} subscription items: {e}")
+                error_count += len(pending_items)
+            pending_items.clear()
+        
+        for index, subscription_id in enumerate(subscription_ids, start=1):
             try:
                 logging.info(f"Bijwerken van subscription {subscription_id}")
                 
@@ -237,24 +219,20 @@ def main() -> None:
                 
                 if not woo_items:
                     logging.warning(f"Geen items gevonden voor subscription {subscription_id}")
-                    continue
-                
-                # Update elk item
-                for item in woo_items:
-                    if update_subscription_item(conn, item):
-                        updated_count += 1
-                    else:
-                        error_count += 1
-                
-                # Commit na elke subscription
-                conn.commit()
+                else:
+                    pending_items.extend(woo_items)
                 
             except Exception as e:
                 logging.error(f"Fout bij bijwerken van subscription {subscription_id}: {e}")
                 error_count += 1
-                continue
+            
+            # Items van meerdere subscriptions samen wegschrijven
+            if index % SUBSCRIPTIONS_PER_BATCH == 0:
+                flush_pending()
+        
+        flush_pending()
         
-        logging.info(f"Bijwerken voltooid. {updated_count} items bijgewerkt, {error_count} fouten")
+        logging.info(f"Bijwerken voltooid. {total}, {error_count} fouten")
         
     except Exception as e:
         logging.error(f"Fout: {e}")
@@ -12,6 +12,7 @@ from dotenv import load_dotenv
 from dateutil import parser as date_parser
 
 from _woo_client import WooClient
+from _bulk_upsert import UpsertResult, bulk_upsert
 
 load_dotenv()
 
@@ -114,29 +115,14 @@ def map_subscription(s: dict) -> Optional[Tuple]:
     )
 
 
-def upsert(cursor: pyodbc.Cursor, rows: List[Tuple]) -> int:
-    affected = 0
-    for r in rows:
-        cursor.execute(
-            """
-            UPDATE [dbo].[Subscriptions]
-               SET [Status]=?,[CustomerID]=?,[BillingEmail]=?,[BillingInterval]=?,[BillingPeriod]=?,[StartDate]=?,[NextPaymentDate]=?,[EndDate]=?
-             WHERE [SubscriptionID]=?
-            """,
-            r[1], r[2], r[3], r[4], r[5], r[6], r[7], r[8], r[0]
-        )
-        if cursor.rowcount and cursor.rowcount > 0:
-            affected += cursor.rowcount
-            continue
-        cursor.execute(
-            """
-            INSERT INTO [dbo].[Subscriptions] ([SubscriptionID],[Status],[CustomerID],[BillingEmail],[BillingInterval],[BillingPeriod],[StartDate],[NextPaymentDate],[EndDate])
-            VALUES (?,?,?,?,?,?,?,?,?)
-            """,
-            r[0], r[1], r[2], r[3], r[4], r[5], r[6], r[7], r[8]
-        )
-        affected += 1
-    return affected
+SUBSCRIPTION_COLUMNS = [
+    "SubscriptionID", "Status", "CustomerID", "BillingEmail", "BillingInterval", "BillingPeriod",
+    "StartDate", "NextPaymentDate", "EndDate",
+]
+
+
+def upsert(cursor: pyodbc.Cursor, rows: List[Tuple]) -> UpsertResult:
+    return bulk_upsert(cursor, "[dbo].[Subscriptions]", SUBSCRIPTION_COLUMNS, ["SubscriptionID"], rows)
 
 
 def main() -> None:
@@ -158,7 +144,7 @@ def main() -> None:
     conn = connect_azuresql(cfg)
     conn.autocommit = False
 
-    total = 0
+    total = UpsertResult()
     fetched_total = 0
     mapped_total = 0
     pages = 0
@@ -177,7 +163,7 @@ def main() -> None:
                 upserted = upsert(cur, rows)
                 total += upserted
                 conn.commit()
-                logging.info("Subscriptions page %d: upserted=%d (running=%d)", pages, upserted, total)
+                logging.info("Subscriptions page %d: upsert %s (running: %s)", pages, upserted, total)
         if pages == 0 or fetched_total == 0:
             logging.warning("Subscriptions: geen data opgehaald.")
     except Exception:
@@ -185,7 +171,7 @@ def main() -> None:
         raise
     finally:
         conn.close()
-    logging.info("Subscriptions klaar; api=%s pages=%d fetched=%d mapped=%d upserted=%d", api_version, pages, fetched_total, mapped_total, total)
+    logging.info("Subscriptions klaar; api=%s pages=%d fetched=%d mapped=%d %s", api_version, pages, fetched_total, mapped_total, total)
 
 
 if __name__ == "__main__":
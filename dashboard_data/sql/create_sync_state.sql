@@ -0,0 +1,9 @@
+IF OBJECT_ID(N'[dbo].[SyncState]', N'U') IS NULL
+BEGIN
+    CREATE TABLE [dbo].[SyncState] (
+        [TableName] NVARCHAR(100) NOT NULL PRIMARY KEY,
+        [HighWaterMark] DATETIME2(0) NULL,
+        [LastFullSync] DATETIME2(0) NULL,
+        [UpdatedAt] DATETIME2(0) NOT NULL DEFAULT SYSUTCDATETIME()
+    );
+END;
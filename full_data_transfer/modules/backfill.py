@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import threading
+import queue
+
+def date_slices(begin, eind, aantal):
+    # Verdeel [begin, eind) in even lange, aansluitende tijdvakken
+    aantal = max(1, int(aantal))
+    stap = (eind - begin) / aantal
+    grenzen = [begin + stap * i for i in range(aantal)] + [eind]
+    return list(zip(grenzen[:-1], grenzen[1:]))
+
+def _format_gmt(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%S")
+
+def fetch_sliced(wcapi, resource, begin, eind, tijdvakken, max_workers=4, per_page=100, params=None):
+    """Haal een resource op in tijdvakken die parallel gepagineerd worden.
+
+    Maximaal max_workers tijdvakken lopen tegelijk; elk tijdvak pagineert zelf
+    sequentieel. WooCommerce filtert exclusief op after/before, daarom begint elk
+    tijdvak een seconde eerder en worden dubbele records op ID overgeslagen.
+    Yield ("records", lijst) per pagina en ("fout", melding) als een tijdvak faalt.
+    """
+    vakken = date_slices(begin, eind, tijdvakken)
+    resultaten = queue.Queue(maxsize=max_workers * 2)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                resultaten.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def haal_tijdvak(after, before):
+        page = 1
+        try:
+            while not stop.is_set():
+                response = wcapi.get(resource, params={
+                    **(params or {}),
+                    "after": _format_gmt(after - timedelta(seconds=1)),
+                    "before": _format_gmt(before),
+                    "dates_are_gmt": "true",
+                    "orderby": "id",
+                    "order": "asc",
+                    "per_page": per_page,
+                    "page": page
+                })
+                if response.status_code != 200:
+                    put(("fout", f"API response {response.status_code} voor tijdvak {_format_gmt(after)} - {_format_gmt(before)}, pagina {page}"))
+                    break
+                records = response.json()
+                if not records:
+                    break
+                if not put(("records", records)):
+                    return
+                page += 1
+        except Exception as e:
+            put(("fout", f"Tijdvak {_format_gmt(after)} - {_format_gmt(before)} mislukt: {e}"))
+        put(("klaar", None))
+
+    gezien = set()
+    klaar = 0
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for after, before in vakken:
+            executor.submit(haal_tijdvak, after, before)
+        while klaar < len(vakken):
+            soort, inhoud = resultaten.get()
+            if soort == "klaar":
+                klaar += 1
+            elif soort == "fout":
+                yield soort, inhoud
+            else:
+                # Records op een tijdvakgrens komen twee keer binnen
+                uniek = [record for record in inhoud if record["id"] not in gezien]
+                gezien.update(record["id"] for record in uniek)
+                if uniek:
+                    yield soort, uniek
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -2,7 +2,9 @@ from modules.bigquery_transfer import insert_order_into_bigquery
 from modules.config import set_script_id
 from modules.env_tool import env_check
 from modules.log import log, end_log
+from modules.backfill import fetch_sliced
 from woocommerce import API
+from datetime import datetime
 import os
 
 def main():
@@ -46,59 +48,38 @@ def main():
     start_time, script_id = set_script_id(greit_connection_string, klant, bron, "Script ID bepalen", script)
     print("Script ID:", script_id)
     
-    # Jaar loop vanaf 2019
-    for jaar in range(2020, 2025):
-        
-        # Periode bepalen
-        periode_begin = f"{jaar}-01-01T00:00:00Z"
-        periode_eind = f"{jaar}-12-31T23:59:59Z"
-        page = 1  # Start met de eerste pagina
-        total_orders = 0  # Row count voor dit jaar
-        
-        print(f"Script gestart voor jaar {jaar}")
-        
-        while True:
-            # Orders ophalen met paginering
-            response = wcapi.get("orders", params={
-                "after": periode_begin,
-                "before": periode_eind,
-                "per_page": 100, # Maximaal 100 resultaten per pagina
-                "page": page # Huidige pagina
-            })
-            
-            print(f"Eerste {page * 100} orders opgehaald")
-            
-            if response.status_code != 200:
-                log(greit_connection_string, klant, bron, f"FOUTMELDING: API response {response.status_code}", script, script_id, tabel=None)
-                break
-            orders = response.json()
-            
-            # Stop als er geen orders meer zijn
-            if not orders:
-                print(f"Geen orders meer gevonden voor jaar {jaar}")
-                break
-
-            # Data verwerken
-            for order in orders:
-                try:
-                    insert_order_into_bigquery(
-                        greit_connection_string,
-                        klant,
-                        script_id,
-                        script,
-                        order  
-                    )
-                    total_orders += 1  # Verhoog de row count bij succesvolle verwerking
-                    print("Totaal aantal verwerkte orders:", total_orders)
-                except Exception as e:
-                    log(greit_connection_string, klant, bron, f"FOUTMELDING: {e}", script, script_id, tabel=None)
-                    continue
+    # Backfill 2020 t/m 2024 in tijdvakken die parallel worden opgehaald
+    periode_begin = datetime(2020, 1, 1)
+    periode_eind = datetime(2025, 1, 1)
+    tijdvakken = int(os.getenv('BACKFILL_TIJDVAKKEN', '20'))
+    workers = int(os.getenv('BACKFILL_WORKERS', '4'))
+    total_orders = 0  # Row count voor de hele periode
+    
+    print(f"Script gestart voor {periode_begin:%Y-%m-%d} tot {periode_eind:%Y-%m-%d} in {tijdvakken} tijdvakken ({workers} tegelijk)")
+    
+    for soort, inhoud in fetch_sliced(wcapi, "orders", periode_begin, periode_eind, tijdvakken, max_workers=workers):
+        if soort == "fout":
+            log(greit_connection_string, klant, bron, f"FOUTMELDING: {inhoud}", script, script_id, tabel=None)
+            continue
 
-            # Naar de volgende pagina
-            page += 1
+        # Data verwerken
+        for order in inhoud:
+            try:
+                insert_order_into_bigquery(
+                    greit_connection_string,
+                    klant,
+                    script_id,
+                    script,
+                    order  
+                )
+                total_orders += 1  # Verhoog de row count bij succesvolle verwerking
+                print("Totaal aantal verwerkte orders:", total_orders)
+            except Exception as e:
+                log(greit_connection_string, klant, bron, f"FOUTMELDING: {e}", script, script_id, tabel=None)
+                continue
 
-        # Print het totaal aantal orders voor dit jaar
-        print(f"Totaal aantal verwerkte orders voor {jaar}: {total_orders}")
+    # Print het totaal aantal orders voor de periode
+    print(f"Totaal aantal verwerkte orders: {total_orders}")
 
     # Script beëindigen
     end_log(start_time, greit_connection_string, klant, bron, script, script_id)
@@ -1,3 +1,4 @@
+from i_modules.log_sink import log_sink, target_name
 from datetime import timedelta, datetime
 import logging
 import pyodbc
@@ -11,12 +12,15 @@ class DatabaseHandler(logging.Handler):
         self.source = source
         self.script = script
         self.script_id = script_id
+        self.target = target_name("logboek", conn_str)
+        log_sink.register(self.target, conn_str, "Logboek",
+                          ["Niveau", "Bericht", "Datumtijd", "Klant", "Bron", "Script", "Script_ID"])
         try:
             # Maak verbinding met de Azure Database
-            self.conn = pyodbc.connect(self.conn_str)
-            self.cursor = self.conn.cursor()
+            conn = pyodbc.connect(self.conn_str)
+            cursor = conn.cursor()
             # Zorg ervoor dat de table bestaat
-            self.cursor.execute('''
+            cursor.execute('''
                 IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='Logboek' AND xtype='U')
                 CREATE TABLE Logboek (
                     ID INT IDENTITY PRIMARY KEY,
@@ -29,7 +33,8 @@ class DatabaseHandler(logging.Handler):
                     Script_ID INT
                 )
             ''')
-            self.conn.commit()
+            conn.commit()
+            conn.close()
         except Exception as e:
             # Fout bij het verbinden met de database of het maken van de tabel
             logging.error(f"Fout bij het verbinden met de database of het maken van de tabel: {e}")
@@ -43,20 +48,18 @@ class DatabaseHandler(logging.Handler):
             # Converteer de tijd naar een string in het juiste formaat
             created_at = datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S')
             
-            # Voer de SQL-query uit om het logbericht in de database in te voegen
-            self.cursor.execute("INSERT INTO Logboek (Niveau, Bericht, Datumtijd, Klant, Bron, Script, Script_ID) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                                (record.levelname, log_message, created_at, self.customer, self.source, self.script, self.script_id))
-            self.conn.commit()
+            # Zet het logbericht in de log sink; die schrijft in batches over één connectie
+            log_sink.write(self.target, (record.levelname, log_message, created_at, self.customer, self.source, self.script, self.script_id))
         except Exception as e:
             # Fout bij het invoegen van het logbericht in de database
             logging.error(f"Fout bij het invoegen van het logbericht in de database: {e}")
 
     def close(self):
         try:
-            self.cursor.close()
-            self.conn.close()
+            # Schrijf gebufferde logberichten weg voordat het script stopt
+            log_sink.flush()
         except Exception as e:
-            logging.error(f"Fout bij het sluiten van de databaseverbinding: {e}")
+            logging.error(f"Fout bij het wegschrijven van de logberichten: {e}")
         super().close()
 
 
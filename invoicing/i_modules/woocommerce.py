@@ -60,9 +60,13 @@ def get_batch_data(order_id, api_url, username, password):
 
     return batch_sku_dict
 
+# Fields used for the invoice; _fields keeps meta_data, _links and refunds out of the response
+ORDER_FIELDS = ["id", "date_created", "billing", "shipping_total", "total", "line_items"]
+
 # Function to extract and print order details
-def extract_order_details(order_id, wcapi):
-    order_data = wcapi.get(f"orders/{order_id}").json()
+def extract_order_details(order_id, wcapi, fields=ORDER_FIELDS):
+    params = {"_fields": ",".join(fields)} if fields else None
+    order_data = wcapi.get(f"orders/{order_id}", params=params).json()
     order_id = order_data.get('id', '')
     date_created_iso = order_data.get('date_created', '')
     if date_created_iso:
@@ -119,7 +123,8 @@ def get_order_ids(customer_email, start_date, end_date, wcapi):
     # Define params if email is linked to a customer
     params_customer = {
         f"role": "customer",
-        "email": {customer_email}
+        "email": {customer_email},
+        "_fields": "id"
     }
 
     # Get customer response
@@ -131,7 +136,8 @@ def get_order_ids(customer_email, start_date, end_date, wcapi):
         # Define params if email is linked to a subscriber
         params_subscriber = {
         f"role": "subscriber",
-        "email": {customer_email}
+        "email": {customer_email},
+        "_fields": "id"
         }   
 
         # Get subscriber response
@@ -154,7 +160,8 @@ def get_order_ids(customer_email, start_date, end_date, wcapi):
         "customer": {customer_id},
         "after": f"{start_date}T00:00:00",
         "before": f"{end_date}T23:59:59",
-        "per_page": 100
+        "per_page": 100,
+        "_fields": "id"
     }
 
     # Get orders using pagination
@@ -5,7 +5,7 @@ from utils.woocommerce import get_subscription_statistics as wc_get_subscription
 from utils.sqlite_db import search_subscriptions_by_id as db_search_by_id
 from utils.sqlite_db import search_subscriptions_by_email, get_all_subscriptions, get_orders_by_email, search_subscriptions_by_name
 from utils.sqlite_db import get_order_by_id as db_get_order_by_id, search_orders_by_name, get_subscription_statistics
-from utils.sqlite_db import init_db
+from utils.sqlite_db import init_db, fetch_keyset_page, get_table_counts, attach_order_items, get_orders_by_product
 from utils.bigquery_import import get_order_margin
 import os
 import sqlite3
@@ -152,45 +152,14 @@ def get_recent_orders(limit=5):
         cursor.execute("""
             SELECT o.*, 
                    o.billing_first_name || ' ' || o.billing_last_name as customer_name,
-                   o.line_items as product_list
+                   o.items_summary as product_list
             FROM orders o
             ORDER BY o.created_date DESC 
             LIMIT ?
         """, (limit,))
         
-        orders = []
-        for row in cursor.fetchall():
-            order_dict = dict(row)
-            
-            # Parse line_items JSON
-            if order_dict.get('line_items'):
-                try:
-                    line_items = json.loads(order_dict['line_items'])
-                    order_dict['line_items'] = []
-                    for item in line_items:
-                        if isinstance(item['name'], list):
-                            name = item['name'][0]
-                        else:
-                            name = item['name']
-                            
-                        if isinstance(item['quantity'], list):
-                            quantity = item['quantity'][0]
-                        else:
-                            quantity = item['quantity']
-                            
-                        order_dict['line_items'].append({
-                            'quantity': quantity,
-                            'name': name
-                        })
-                except Exception as e:
-                    logger.error(f"Fout bij parsen line_items JSON: {str(e)}")
-                    order_dict['line_items'] = []
-            else:
-                order_dict['line_items'] = []
-            
-            orders.append(order_dict)
-            
-        return orders
+        # Orderregels komen uit order_items, zonder JSON te parsen
+        return attach_order_items(cursor, [dict(row) for row in cursor.fetchall()])
     except Exception as e:
         logger.error(f"Fout bij ophalen recente orders: {str(e)}")
         return []
@@ -213,16 +182,17 @@ def get_monthly_order_stats():
     
     try:
         cursor = conn.cursor()
-        first_day = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-        last_day = (datetime.now().replace(day=1) + timedelta(days=32)).replace(day=1).strftime('%Y-%m-%d')
         
+        # Voorberekend bij de synchronisatie, één rij per maand
         cursor.execute("""
-            SELECT COUNT(*) as count, SUM(total) as total
-            FROM orders 
-            WHERE created_date >= ? AND created_date < ?
-        """, (first_day, last_day))
+            SELECT count, total
+            FROM order_monthly_stats
+            WHERE month = ?
+        """, (datetime.now().strftime('%Y-%m'),))
         
         result = cursor.fetchone()
+        if not result:
+            return {"count": 0, "total": 0}
         return {
             "count": result['count'] if result['count'] else 0,
             "total": result['total'] if result['total'] else 0
@@ -581,34 +551,24 @@ def order_details(order_id):
 
 @app.route('/all')
 def all_subscriptions():
-    """Toon alle abonnementen met paginering"""
-    page = request.args.get('page', 1, type=int)
+    """Toon alle abonnementen met keyset paginering (cursor in de URL)"""
     limit = 20
-    offset = (page - 1) * limit
     
-    result = get_all_subscriptions(limit=limit, offset=offset)
+    result = get_all_subscriptions(limit=limit, page_cursor=request.args.get('cursor'))
     
     if 'error' in result:
         return render_template('index.html', error=result['error'])
     
-    subscriptions = result.get('data', [])
-    total = result.get('total', 0)
-    total_pages = (total + limit - 1) // limit
-    
     return render_template('all_subscriptions.html',
-                         subscriptions=subscriptions,
-                         page=page,
-                         total_pages=total_pages,
-                         total=total,
-                         max=max,
-                         min=min)
+                         subscriptions=result.get('data', []),
+                         total=result.get('total', 0),
+                         next_cursor=result.get('next_cursor'),
+                         prev_cursor=result.get('prev_cursor'))
 
 @app.route('/all_orders')
 def all_orders():
-    """Toon alle orders met paginering"""
-    page = request.args.get('page', 1, type=int)
+    """Toon alle orders met keyset paginering op (created_date, id)"""
     limit = 20
-    offset = (page - 1) * limit
     
     # Haal orderstatistieken op
     order_stats = get_monthly_order_stats()
@@ -621,48 +581,23 @@ def all_orders():
                             order_stats=order_stats)
     
     try:
-        # Haal totaal aantal orders op
+        # Totaal aantal orders, bijgehouden per synchronisatie
         cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) as total FROM orders")
-        total = cursor.fetchone()['total']
+        total = get_table_counts(conn)['orders']
         
-        # Haal orders op met paginering
-        cursor.execute("""
+        # Haal orders op vanaf de cursor; elke pagina kost evenveel. Orders zonder
+        # datum sorteren als '' en staan dus achteraan, net als voorheen.
+        rows, next_cursor, prev_cursor = fetch_keyset_page(cursor, """
             SELECT o.*, 
                    o.billing_first_name || ' ' || o.billing_last_name as customer_name,
-                   o.line_items as product_list
+                   o.items_summary as product_list,
+                   COALESCE(o.created_date, '') as sort_created_date
             FROM orders o
-            ORDER BY o.created_date DESC 
-            LIMIT ? OFFSET ?
-        """, (limit, offset))
+        """, [("COALESCE(o.created_date, '')", 'sort_created_date'), ('o.id', 'id')], limit, request.args.get('cursor'))
         
+        # Orderregels komen uit order_items, zonder JSON te parsen
         orders = []
-        for row in cursor.fetchall():
-            order_dict = dict(row)
-            order_dict['line_items'] = []
-            
-            # Parse line_items JSON
-            if order_dict['product_list']:
-                try:
-                    line_items = json.loads(order_dict['product_list'])
-                    for item in line_items:
-                        if isinstance(item['name'], list):
-                            name = item['name'][0]
-                        else:
-                            name = item['name']
-                            
-                        if isinstance(item['quantity'], list):
-                            quantity = item['quantity'][0]
-                        else:
-                            quantity = item['quantity']
-                            
-                        order_dict['line_items'].append({
-                            'quantity': quantity,
-                            'name': name
-                        })
-                except Exception as e:
-                    logger.error(f"Fout bij parsen line_items JSON: {str(e)}")
-            
+        for order_dict in attach_order_items(cursor, [dict(row) for row in rows]):
             # Voeg leesbare status toe
             order_dict['status_display'] = {
                 'completed': 'Voltooid',
@@ -676,13 +611,11 @@ def all_orders():
             
             orders.append(order_dict)
         
-        total_pages = (total + limit - 1) // limit
-        
         return render_template('index.html',
                              orders=orders,
-                             page=page,
-                             total_pages=total_pages,
                              total=total,
+                             next_cursor=next_cursor,
+                             prev_cursor=prev_cursor,
                              view_type='orders',
                              order_stats=order_stats)
                              
@@ -714,11 +647,11 @@ def email_suggestions():
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
-        # Zoek naar e-mailadressen die beginnen met de query
+        # Zoek naar e-mailadressen die beginnen met de query (via de NOCASE index)
         cursor.execute("""
-            SELECT DISTINCT billing_email FROM subscriptions 
-            WHERE LOWER(billing_email) LIKE ? 
-            ORDER BY billing_email
+            SELECT DISTINCT billing_email COLLATE NOCASE AS billing_email FROM subscriptions 
+            WHERE billing_email LIKE ? 
+            ORDER BY 1
             LIMIT 10
         """, (f"{query}%",))
         
@@ -1107,6 +1040,20 @@ def api_search_products():
         
     return jsonify(result['data'])
 
+@app.route('/api/product-orders')
+@login_required
+def api_product_orders():
+    """API endpoint: orders en klanten die een product kochten, op SKU of productnaam"""
+    product = request.args.get('product', '').strip()
+    if not product or not USE_SQLITE:
+        return jsonify([])
+    
+    result = get_orders_by_product(product)
+    if 'error' in result:
+        return jsonify({"error": result['error']}), 500
+    
+    return jsonify(result['data'])
+
 @app.route('/subscription/<int:subscription_id>/orders')
 @cache.memoize(timeout=300)  # Cache voor 5 minuten
 def get_subscription_orders(subscription_id):
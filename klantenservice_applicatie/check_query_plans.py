@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Controleer met EXPLAIN QUERY PLAN dat de veelgebruikte queries een index gebruiken.
+
+Zonder argumenten wordt een lege database in het geheugen met de migraties
+opgebouwd; met --db wordt een bestaande database gecontroleerd. Het script
+stopt met exit code 1 als een query een hele tabel of index afloopt (SCAN) of
+voor ORDER BY een tijdelijke B-tree nodig heeft, tenzij die stap voor de query
+expliciet is toegestaan.
+"""
+
+import argparse
+import sqlite3
+import sys
+import logging
+from utils.migrations import migrate
+
+# Configureer logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# (naam, query, parameters[, toegestane scans]) zoals ze in de applicatie gebruikt worden
+HOT_QUERIES = [
+    ("orders per e-mail", """
+        SELECT o.* FROM orders o
+        WHERE LOWER(o.billing_email) = LOWER(?)
+        ORDER BY o.created_date DESC
+        LIMIT 50
+    """, ('klant@example.nl',)),
+    ("laatste order datum per e-mail", """
+        SELECT created_date FROM orders
+        WHERE LOWER(billing_email) = LOWER(?)
+        ORDER BY created_date DESC
+        LIMIT 1
+    """, ('klant@example.nl',)),
+    # Loopt de index op created_date van achteren af en stopt bij LIMIT
+    ("recente orders", """
+        SELECT o.* FROM orders o
+        ORDER BY o.created_date DESC
+        LIMIT ?
+    """, (5,), {"SCAN o USING INDEX idx_orders_created_date"}),
+    ("alle orders, volgende pagina", """
+        SELECT o.* FROM orders o
+        WHERE COALESCE(o.created_date, '') <= ? AND (COALESCE(o.created_date, ''), o.id) < (?, ?)
+        ORDER BY COALESCE(o.created_date, '') DESC, o.id DESC
+        LIMIT ?
+    """, ('2024-03-01T12:00:00', '2024-03-01T12:00:00', 1000, 21)),
+    ("alle orders, vorige pagina", """
+        SELECT o.* FROM orders o
+        WHERE COALESCE(o.created_date, '') >= ? AND (COALESCE(o.created_date, ''), o.id) > (?, ?)
+        ORDER BY COALESCE(o.created_date, '') ASC, o.id ASC
+        LIMIT ?
+    """, ('2024-03-01T12:00:00', '2024-03-01T12:00:00', 1000, 21)),
+    ("totalen per synchronisatie", "SELECT subscriptions_count, orders_count FROM sync_state WHERE id = 1", ()),
+    ("orderregels per order", """
+        SELECT order_id, name, quantity, sku FROM order_items
+        WHERE order_id IN (?, ?, ?)
+        ORDER BY order_id, position
+    """, (1, 2, 3)),
+    # Eén rij per gevonden order; de GROUP BY heeft daarvoor een tijdelijke B-tree nodig
+    ("orders per product", """
+        SELECT o.id, SUM(i.quantity) FROM order_items i
+        JOIN orders o ON o.id = i.order_id
+        WHERE i.sku = ? OR i.name = ? COLLATE NOCASE
+        GROUP BY o.id
+        ORDER BY o.created_date DESC
+        LIMIT 100
+    """, ('KOF-500', 'Koffie 500g'), {"USE TEMP B-TREE FOR GROUP BY", "USE TEMP B-TREE FOR ORDER BY"}),
+    ("maandstatistieken orders", "SELECT count, total FROM order_monthly_stats WHERE month = ?", ('2024-03',)),
+    ("order per ID", "SELECT * FROM orders WHERE id = ?", (1,)),
+    ("orders per klant", "SELECT * FROM orders WHERE customer_id = ?", (1,)),
+    ("orders per status", "SELECT COUNT(*) FROM orders WHERE status = ?", ('processing',)),
+    ("abonnement per ID", "SELECT * FROM subscriptions WHERE id = ?", (1,)),
+    # Loopt de primary key van achteren af en stopt bij LIMIT
+    ("alle abonnementen", "SELECT s.* FROM subscriptions s WHERE s.id <= ? AND (s.id) < (?) ORDER BY s.id DESC LIMIT ?", (1000, 1000, 21)),
+    # Een paar rijen, één per status
+    ("abonnementsstatistieken", "SELECT status, count, total_value FROM subscription_status_stats ORDER BY status", (),
+     {"SCAN subscription_status_stats USING INDEX sqlite_autoindex_subscription_status_stats_1"}),
+    ("abonnementen per klant", "SELECT * FROM subscriptions WHERE customer_id = ?", (1,)),
+    ("abonnementen per volgende betaling", """
+        SELECT id FROM subscriptions
+        WHERE next_payment_date >= ? AND next_payment_date < ?
+    """, ('2024-03-01', '2024-04-01')),
+    ("e-mail suggesties", """
+        SELECT DISTINCT billing_email COLLATE NOCASE AS billing_email FROM subscriptions
+        WHERE billing_email LIKE ?
+        ORDER BY 1
+        LIMIT 10
+    """, ('klant%',)),
+]
+
+
+def plan_problems(conn, query, params, allowed=()):
+    """Geef de stappen uit het query plan terug die op een volledige scan wijzen."""
+    problems = []
+    for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params):
+        detail = row[3]
+        if detail in allowed:
+            continue
+        # Ook SCAN ... USING [COVERING] INDEX: dat loopt de hele index af
+        if detail.startswith('SCAN '):
+            problems.append(detail)
+        elif 'TEMP B-TREE' in detail:
+            problems.append(detail)
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Controleer de query plans van de veelgebruikte queries")
+    parser.add_argument('--db', type=str, help="Pad naar een bestaande database (standaard: lege database in het geheugen)")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db or ':memory:')
+    if not args.db:
+        migrate(conn)
+
+    failed = 0
+    for name, query, params, *allowed in HOT_QUERIES:
+        problems = plan_problems(conn, query, params, *allowed)
+        if problems:
+            failed += 1
+            logger.error(f"{name}: {'; '.join(problems)}")
+        else:
+            logger.info(f"{name}: OK")
+    conn.close()
+
+    if failed:
+        logger.error(f"{failed} van {len(HOT_QUERIES)} queries gebruiken geen index")
+        sys.exit(1)
+    logger.info(f"Alle {len(HOT_QUERIES)} queries gebruiken een index")
+
+
+if __name__ == "__main__":
+    main()
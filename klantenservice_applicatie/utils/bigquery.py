@@ -3,6 +3,8 @@ import os
 import sqlite3
 import pandas as pd
 from dotenv import load_dotenv
+from utils.sqlite_db import rebuild_search_index, refresh_statistics, rebuild_order_items
+from utils.migrations import migrate
 import json
 import logging
 
@@ -227,66 +229,9 @@ def create_sqlite_db():
     
     try:
         conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Maak tabellen aan
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS subscriptions (
-            id INTEGER PRIMARY KEY,
-            status TEXT,
-            status_display TEXT,
-            customer_id INTEGER,
-            billing_first_name TEXT,
-            billing_last_name TEXT,
-            billing_email TEXT,
-            billing_phone TEXT,
-            billing_address_1 TEXT,
-            billing_address_2 TEXT,
-            billing_postcode TEXT,
-            billing_city TEXT,
-            billing_country TEXT,
-            date_created TEXT,
-            date_modified TEXT,
-            next_payment_date TEXT,
-            total REAL,
-            payment_method TEXT,
-            payment_method_title TEXT,
-            billing_period TEXT,
-            billing_interval INTEGER,
-            frequency TEXT,
-            start_date TEXT,
-            trial_end_date TEXT,
-            end_date TEXT,
-            meta_data TEXT
-        )
-        ''')
-        
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY,
-            status TEXT,
-            status_display TEXT,
-            customer_id INTEGER,
-            billing_first_name TEXT,
-            billing_last_name TEXT,
-            billing_email TEXT,
-            billing_phone TEXT,
-            billing_address_1 TEXT,
-            billing_address_2 TEXT,
-            billing_postcode TEXT,
-            billing_city TEXT,
-            billing_country TEXT,
-            created_date TEXT,
-            completed_date TEXT,
-            date_modified TEXT,
-            total REAL,
-            payment_method TEXT,
-            payment_method_title TEXT,
-            line_items TEXT
-        )
-        ''')
         
-        conn.commit()
+        # Tabellen en indexen worden door de migraties beheerd
+        migrate(conn)
         logger.info("SQLite database en tabellen succesvol aangemaakt")
         return conn
     
@@ -297,6 +242,11 @@ def create_sqlite_db():
 def save_to_sqlite(df, table_name, conn=None):
     """
     Sla een DataFrame op in de SQLite database.
+    
+    De data gaat eerst naar een tijdelijke tabel en wordt daarna in één
+    transactie in de bestaande tabel gezet (upsert op id, verdwenen rijen
+    verwijderd). De tabel zelf, met indexen en lokale kolommen zoals de Monta
+    status, blijft zo bestaan.
     """
     if df is None or df.empty:
         logger.warning(f"Geen data om op te slaan in tabel {table_name}")
@@ -314,8 +264,28 @@ def save_to_sqlite(df, table_name, conn=None):
         if 'meta_data' in df.columns:
             df['meta_data'] = df['meta_data'].apply(lambda x: json.dumps(x) if x else None)
         
-        # Sla op in SQLite
-        df.to_sql(table_name, conn, if_exists='replace', index=False)
+        # Sla op in een tijdelijke tabel en voeg samen met de bestaande tabel
+        staging_table = f"_sync_{table_name}"
+        df.to_sql(staging_table, conn, if_exists='replace', index=False)
+        
+        cursor = conn.cursor()
+        cursor.execute(f"PRAGMA table_info({table_name})")
+        table_columns = [row[1] for row in cursor.fetchall()]
+        columns = [column for column in df.columns if column in table_columns]
+        skipped = [column for column in df.columns if column not in table_columns]
+        if skipped:
+            logger.warning(f"Kolommen niet in tabel {table_name}, overgeslagen: {', '.join(skipped)}")
+        
+        column_sql = ', '.join(columns)
+        update_sql = ', '.join(f"{column} = excluded.{column}" for column in columns if column != 'id')
+        cursor.execute(f"DELETE FROM {table_name} WHERE id NOT IN (SELECT id FROM {staging_table} WHERE id IS NOT NULL)")
+        cursor.execute(f"""
+            INSERT INTO {table_name} ({column_sql})
+            SELECT {column_sql} FROM {staging_table} WHERE id IS NOT NULL
+            ON CONFLICT(id) DO UPDATE SET {update_sql}
+        """)
+        cursor.execute(f"DROP TABLE {staging_table}")
+        conn.commit()
         
         logger.info(f"{len(df)} rijen opgeslagen in tabel {table_name}")
         return True
@@ -347,6 +317,12 @@ def sync_data_from_bigquery():
         orders_df = fetch_orders()
         save_to_sqlite(orders_df, 'orders', conn)
         
+        # Orderregels, zoekindex en statistieken opnieuw opbouwen, en statistieken voor de query planner bijwerken
+        rebuild_order_items(conn)
+        rebuild_search_index(conn)
+        refresh_statistics(conn)
+        conn.execute("PRAGMA optimize")
+        
         logger.info("Synchronisatie voltooid")
         return True
     
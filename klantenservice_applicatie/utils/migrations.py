@@ -0,0 +1,267 @@
+import sqlite3
+import logging
+
+# Configureer logging
+logger = logging.getLogger(__name__)
+
+# Tabeldefinities; de migraties hieronder zijn de enige plek waar deze worden aangemaakt
+SUBSCRIPTIONS_COLUMNS = [
+    "id INTEGER PRIMARY KEY",
+    "status TEXT",
+    "status_display TEXT",
+    "customer_id INTEGER",
+    "billing_first_name TEXT",
+    "billing_last_name TEXT",
+    "billing_email TEXT",
+    "billing_phone TEXT",
+    "billing_address_1 TEXT",
+    "billing_address_2 TEXT",
+    "billing_postcode TEXT",
+    "billing_city TEXT",
+    "billing_country TEXT",
+    "date_created TEXT",
+    "date_modified TEXT",
+    "next_payment_date TEXT",
+    "total REAL",
+    "payment_method TEXT",
+    "payment_method_title TEXT",
+    "billing_period TEXT",
+    "billing_interval INTEGER",
+    "frequency TEXT",
+    "start_date TEXT",
+    "trial_end_date TEXT",
+    "end_date TEXT",
+    "meta_data TEXT"
+]
+
+ORDERS_COLUMNS = [
+    "id INTEGER PRIMARY KEY",
+    "status TEXT",
+    "status_display TEXT",
+    "customer_id INTEGER",
+    "billing_first_name TEXT",
+    "billing_last_name TEXT",
+    "billing_email TEXT",
+    "billing_phone TEXT",
+    "billing_address_1 TEXT",
+    "billing_address_2 TEXT",
+    "billing_postcode TEXT",
+    "billing_city TEXT",
+    "billing_country TEXT",
+    "created_date TEXT",
+    "completed_date TEXT",
+    "date_modified TEXT",
+    "total REAL",
+    "payment_method TEXT",
+    "payment_method_title TEXT",
+    "line_items TEXT"
+]
+
+# Lokale kolommen op orders; worden niet door de synchronisatie overschreven
+ORDERS_LOCAL_COLUMNS = [
+    "shipping_first_name TEXT",
+    "shipping_last_name TEXT",
+    "shipping_address_1 TEXT",
+    "shipping_address_2 TEXT",
+    "shipping_postcode TEXT",
+    "shipping_city TEXT",
+    "shipping_country TEXT",
+    "shipping_company TEXT",
+    "monta_order_id TEXT",
+    "monta_order_status TEXT",
+    "monta_order_created_at TIMESTAMP",
+    "monta_shipment_date DATE"
+]
+
+TABLE_COLUMNS = {
+    'subscriptions': SUBSCRIPTIONS_COLUMNS,
+    'orders': ORDERS_COLUMNS + ORDERS_LOCAL_COLUMNS
+}
+
+# Indexen voor de veelgebruikte queries. E-mail wordt altijd met LOWER()
+# vergeleken, dus de index staat op die expressie.
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_orders_created_date ON orders(created_date, total)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_email_created ON orders(LOWER(billing_email), created_date)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_customer_id ON orders(customer_id)",
+    "CREATE INDEX IF NOT EXISTS idx_subscriptions_status ON subscriptions(status, total)",
+    "CREATE INDEX IF NOT EXISTS idx_subscriptions_email ON subscriptions(billing_email COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS idx_subscriptions_customer_id ON subscriptions(customer_id)",
+    "CREATE INDEX IF NOT EXISTS idx_subscriptions_next_payment ON subscriptions(next_payment_date)",
+    "CREATE INDEX IF NOT EXISTS idx_subscriptions_created ON subscriptions(date_created)"
+]
+
+
+def _table_columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1]: row for row in cursor.fetchall()}
+
+
+def _create_base_tables(cursor):
+    for table, columns in TABLE_COLUMNS.items():
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})")
+
+
+def _add_order_columns(cursor):
+    # Databases van voor deze migraties missen mogelijk de shipping en Monta kolommen
+    existing = _table_columns(cursor, 'orders')
+    for column in ORDERS_LOCAL_COLUMNS:
+        if column.split()[0] not in existing:
+            cursor.execute(f"ALTER TABLE orders ADD COLUMN {column}")
+
+
+def _add_primary_keys(cursor):
+    """
+    Bouw tabellen zonder primary key (aangemaakt door to_sql) opnieuw op met
+    id als INTEGER PRIMARY KEY. Bij dubbele IDs blijft de laatste rij staan.
+    """
+    for table, columns in TABLE_COLUMNS.items():
+        existing = _table_columns(cursor, table)
+        if existing.get('id') and existing['id'][5]:
+            continue
+        logger.info(f"Tabel {table} opnieuw opbouwen met primary key op id")
+        # Oude indexen verdwijnen met de tabel; migratie 5 maakt ze opnieuw
+        cursor.execute(f"CREATE TABLE {table}_new ({', '.join(columns)})")
+        shared = [column.split()[0] for column in columns if column.split()[0] in existing]
+        column_sql = ', '.join(shared)
+        cursor.execute(f"""
+            INSERT OR REPLACE INTO {table}_new ({column_sql})
+            SELECT {column_sql} FROM {table} WHERE id IS NOT NULL ORDER BY rowid
+        """)
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+
+def _create_order_margin_table(cursor):
+    # init_db maakte eerder een andere (nooit gevulde) order_margin_data tabel aan
+    existing = _table_columns(cursor, 'order_margin_data')
+    if existing and 'cost' not in existing:
+        cursor.execute("DROP TABLE order_margin_data")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS order_margin_data (
+            order_id INTEGER PRIMARY KEY,
+            cost REAL,
+            revenue REAL,
+            margin REAL,
+            margin_percentage REAL,
+            created_at TEXT,
+            updated_at TEXT
+        )
+    """)
+
+
+def _create_statistics_tables(cursor):
+    # Voorberekende statistieken; worden bij elke synchronisatie ververst
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS subscription_status_stats (
+            status TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            total_value REAL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS order_monthly_stats (
+            month TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            total REAL
+        )
+    """)
+
+
+def _create_sync_state(cursor):
+    # Eén rij: synchronisatie generatie en de aantallen rijen van die generatie
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL,
+            synced_at TEXT,
+            subscriptions_count INTEGER NOT NULL,
+            orders_count INTEGER NOT NULL
+        )
+    """)
+    # Keyset paginering op (created_date, id) voor het overzicht van alle orders
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_created_id ON orders(created_date, id)")
+
+
+def _create_order_items(cursor):
+    # Uitgesplitste orderregels uit orders.line_items; worden bij elke synchronisatie opnieuw gevuld
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS order_items (
+            order_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT,
+            quantity INTEGER,
+            sku TEXT,
+            PRIMARY KEY (order_id, position)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_items_sku ON order_items(sku)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_items_name ON order_items(name COLLATE NOCASE)")
+    # Voorberekende productomschrijving voor de overzichtspagina's, bijv. "2x Koffie, 1x Thee"
+    if 'items_summary' not in _table_columns(cursor, 'orders'):
+        cursor.execute("ALTER TABLE orders ADD COLUMN items_summary TEXT")
+
+
+def _index_orders_created_coalesce(cursor):
+    # Keyset paginering sorteert op COALESCE(created_date, ''), zodat orders zonder datum bereikbaar blijven
+    cursor.execute("DROP INDEX IF EXISTS idx_orders_created_id")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_created_id ON orders(COALESCE(created_date, ''), id)")
+
+
+def _create_indexes(cursor):
+    # Stond in get_orders_by_email en werd bij elke aanroep uitgevoerd
+    cursor.execute("DROP INDEX IF EXISTS idx_orders_email")
+    for statement in INDEXES:
+        cursor.execute(statement)
+
+
+# (versie, omschrijving, functie); nieuwe migraties alleen achteraan toevoegen
+MIGRATIONS = [
+    (1, "Basis tabellen subscriptions en orders", _create_base_tables),
+    (2, "Shipping en Monta kolommen op orders", _add_order_columns),
+    (3, "Primary key op id", _add_primary_keys),
+    (4, "Tabel order_margin_data", _create_order_margin_table),
+    (5, "Indexen voor de veelgebruikte queries", _create_indexes),
+    (6, "Tabellen voor voorberekende statistieken", _create_statistics_tables),
+    (7, "Synchronisatie status en index voor keyset paginering", _create_sync_state),
+    (8, "Tabel order_items en productomschrijving op orders", _create_order_items),
+    (9, "Index voor keyset paginering op orders zonder datum", _index_orders_created_coalesce)
+]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Voer alle migraties uit die nog niet op deze database zijn toegepast.
+
+    De schemaversie staat in PRAGMA user_version. Elke migratie draait in een
+    eigen transactie, samen met het ophogen van de versie.
+    """
+    version = get_schema_version(conn)
+    pending = [migration for migration in MIGRATIONS if migration[0] > version]
+    if not pending:
+        return version
+
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    cursor = conn.cursor()
+    try:
+        for migration_version, description, apply in pending:
+            logger.info(f"Database migratie {migration_version}: {description}")
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                apply(cursor)
+                cursor.execute(f"PRAGMA user_version = {int(migration_version)}")
+                cursor.execute("COMMIT")
+            except sqlite3.Error:
+                cursor.execute("ROLLBACK")
+                raise
+            version = migration_version
+    finally:
+        conn.isolation_level = isolation_level
+    logger.info(f"Database schema op versie {version}")
+    return version
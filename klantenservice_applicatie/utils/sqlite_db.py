@@ -1,9 +1,11 @@
 import sqlite3
+import base64
 import os
 import json
 import logging
 import traceback
 from dotenv import load_dotenv
+from utils.migrations import migrate
 
 # Configureer logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -40,6 +42,241 @@ def get_db_connection():
         logger.error(f"Fout bij verbinden met database: {str(e)}")
         return None
 
+# FTS5 zoekindex per tabel. De trigram tokenizer zoekt op deelstrings (net als
+# LIKE '%...%'), maar via de index in plaats van een scan over de hele tabel.
+SEARCH_INDEXES = {
+    'subscriptions': 'subscriptions_search',
+    'orders': 'orders_search'
+}
+
+# Trigram kan alleen zoektermen van minimaal 3 tekens in de index opzoeken
+MIN_SEARCH_TERM_LENGTH = 3
+
+def rebuild_search_index(conn):
+    """
+    Bouw de FTS5 zoekindex over naam, e-mail, telefoon en postcode opnieuw op.
+
+    Wordt na elke synchronisatie aangeroepen; een volledige herbouw is bij een
+    sync waarin (bijna) alle rijen geraakt worden sneller dan triggers per rij.
+    De rowid in de index is het abonnement- of order ID. De herbouw is één
+    transactie, zodat andere connecties tot de commit de oude index zien.
+    """
+    # Zonder expliciete BEGIN commit sqlite3 de DROP en CREATE direct
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        for table, index in SEARCH_INDEXES.items():
+            cursor.execute(f"DROP TABLE IF EXISTS {index}")
+            cursor.execute(f"""
+                CREATE VIRTUAL TABLE {index} USING fts5(
+                    name, email, phone, postcode,
+                    tokenize = 'trigram'
+                )
+            """)
+            cursor.execute(f"""
+                INSERT OR REPLACE INTO {index} (rowid, name, email, phone, postcode)
+                SELECT id,
+                       COALESCE(billing_first_name, '') || ' ' || COALESCE(billing_last_name, ''),
+                       COALESCE(billing_email, ''),
+                       COALESCE(billing_phone, ''),
+                       REPLACE(COALESCE(billing_postcode, ''), ' ', '')
+                FROM {table}
+                WHERE id IS NOT NULL
+            """)
+            logger.info(f"Zoekindex {index} opgebouwd")
+        cursor.execute("COMMIT")
+        return True
+    except sqlite3.OperationalError as e:
+        # Bijv. een SQLite versie zonder FTS5 of trigram; zoeken valt terug op LIKE
+        logger.error(f"Fout bij opbouwen zoekindex: {str(e)}")
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
+        return False
+    finally:
+        conn.isolation_level = isolation_level
+
+def rebuild_order_items(conn):
+    """
+    Splits orders.line_items uit in order_items en vul orders.items_summary.
+
+    Wordt na elke synchronisatie aangeroepen, zodat de pagina's geen JSON meer
+    hoeven te parsen. BigQuery levert naam en aantal soms als lijst; daarvan
+    wordt het eerste element gebruikt.
+    """
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM order_items")
+    cursor.execute("""
+        INSERT INTO order_items (order_id, position, name, quantity, sku)
+        SELECT o.id,
+               item.key,
+               CASE json_type(item.value, '$.name') WHEN 'array' THEN json_extract(item.value, '$.name[0]') ELSE json_extract(item.value, '$.name') END,
+               CAST(CASE json_type(item.value, '$.quantity') WHEN 'array' THEN json_extract(item.value, '$.quantity[0]') ELSE json_extract(item.value, '$.quantity') END AS INTEGER),
+               NULLIF(CASE json_type(item.value, '$.sku') WHEN 'array' THEN json_extract(item.value, '$.sku[0]') ELSE json_extract(item.value, '$.sku') END, '')
+        FROM orders o, json_each(o.line_items) item
+        WHERE o.line_items IS NOT NULL AND json_valid(o.line_items) AND json_type(o.line_items) = 'array'
+    """)
+    items = cursor.rowcount
+    cursor.execute("""
+        UPDATE orders SET items_summary = (
+            SELECT group_concat(line, ', ') FROM (
+                SELECT COALESCE(quantity, 1) || 'x ' || COALESCE(name, '') AS line
+                FROM order_items
+                WHERE order_id = orders.id
+                ORDER BY position
+            )
+        )
+    """)
+    conn.commit()
+    logger.info(f"{items} orderregels opgeslagen in order_items")
+
+def get_order_items(cursor, order_ids):
+    """Orderregels per order ID ({'name', 'quantity', 'sku'}), met één query voor alle orders."""
+    items = {order_id: [] for order_id in order_ids}
+    ids = list(items)
+    # Blijf ruim onder de limiet voor het aantal SQL parameters
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        cursor.execute(f"""
+            SELECT order_id, name, quantity, sku FROM order_items
+            WHERE order_id IN ({', '.join('?' for _ in chunk)})
+            ORDER BY order_id, position
+        """, chunk)
+        for row in cursor.fetchall():
+            items[row[0]].append({'name': row[1], 'quantity': row[2], 'sku': row[3]})
+    return items
+
+def attach_order_items(cursor, orders):
+    """Zet ``line_items`` op elke order dict vanuit order_items."""
+    items = get_order_items(cursor, [order['id'] for order in orders])
+    for order in orders:
+        order['line_items'] = items.get(order['id'], [])
+    return orders
+
+def get_orders_by_product(product, limit=100):
+    """
+    Orders en klanten die een product kochten, op SKU of (exacte) productnaam.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return {"error": "Kan geen verbinding maken met de database"}
+    
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT o.id, o.customer_id, o.billing_first_name, o.billing_last_name, o.billing_email,
+                   o.created_date, o.status, SUM(i.quantity) AS quantity
+            FROM order_items i
+            JOIN orders o ON o.id = i.order_id
+            WHERE i.sku = ? OR i.name = ? COLLATE NOCASE
+            GROUP BY o.id
+            ORDER BY o.created_date DESC
+            LIMIT ?
+        """, (product, product, limit))
+        orders = [dict(row) for row in cursor.fetchall()]
+        return {"success": True, "data": orders}
+    
+    except Exception as e:
+        logger.error(f"Fout bij zoeken naar orders op product: {str(e)}")
+        return {"error": f"Fout bij zoeken naar orders op product: {str(e)}"}
+    
+    finally:
+        conn.close()
+
+def _search_match(cursor, table, column, term):
+    """
+    FTS5 MATCH expressie voor een zoekterm op een kolom van de zoekindex.
+
+    Alle woorden moeten voorkomen. Geeft None terug als de index er niet is of
+    een woord korter is dan 3 tekens (zoals "Ed" of "de"); de trigram index kan
+    die niet zoeken en weglaten maakt de zoekopdracht breder, dus de aanroeper
+    gebruikt dan LIKE.
+    """
+    parts = term.strip().lower().split()
+    if not parts or any(len(part) < MIN_SEARCH_TERM_LENGTH for part in parts):
+        return None
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_INDEXES[table],))
+    if not cursor.fetchone():
+        return None
+    phrases = ' AND '.join('"' + part.replace('"', '""') + '"' for part in parts)
+    return f"{column} : ({phrases})"
+
+def encode_page_cursor(values, direction):
+    """Ondoorzichtige cursor voor keyset paginering: richting en sorteerwaarden."""
+    payload = json.dumps([direction, values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_page_cursor(token):
+    try:
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, values = json.loads(payload)
+        if direction not in ('next', 'prev') or not isinstance(values, list) or not values:
+            raise ValueError
+        return direction, values
+    except Exception:
+        raise ValueError("Ongeldige pagina cursor")
+
+def fetch_keyset_page(cursor, select_sql, sort_columns, limit, token=None):
+    """
+    Haal één pagina op, aflopend gesorteerd op ``sort_columns``, zonder OFFSET.
+
+    Een volgende pagina begint direct na de sorteerwaarden van de laatste rij,
+    dus elke pagina kost evenveel (via de index op de sorteerkolommen).
+    ``sort_columns`` bevat (SQL expressie, kolom in het resultaat) paren; een
+    expressie mag geen NULL opleveren, anders valt die rij buiten elke pagina.
+
+    Returns:
+        (rijen, next_cursor, prev_cursor); een cursor is None als er geen pagina is
+    """
+    direction, values = decode_page_cursor(token) if token else ('next', None)
+    if values is not None and len(values) != len(sort_columns):
+        raise ValueError("Ongeldige pagina cursor")
+    expressions = [expression for expression, _ in sort_columns]
+    
+    # Terugbladeren: oplopend vanaf de eerste rij van de huidige pagina, daarna omdraaien
+    order = 'DESC' if direction == 'next' else 'ASC'
+    query = select_sql
+    params = []
+    if values:
+        operator = '<' if direction == 'next' else '>'
+        # De losse voorwaarde op de eerste expressie is overbodig, maar zonder
+        # kan SQLite bij een expressie index niet zoeken en scant het de index
+        query += f" WHERE {expressions[0]} {operator}= ? AND ({', '.join(expressions)}) {operator} ({', '.join('?' for _ in expressions)})"
+        params.append(values[0])
+        params.extend(values)
+    query += f" ORDER BY {', '.join(f'{expression} {order}' for expression in expressions)} LIMIT ?"
+    params.append(limit + 1)
+    
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == 'prev':
+        rows.reverse()
+    
+    has_next = has_more if direction == 'next' else True
+    has_prev = values is not None if direction == 'next' else has_more
+    
+    def key(row):
+        return [row[column] for _, column in sort_columns]
+    
+    next_cursor = encode_page_cursor(key(rows[-1]), 'next') if rows and has_next else None
+    prev_cursor = encode_page_cursor(key(rows[0]), 'prev') if rows and has_prev else None
+    return rows, next_cursor, prev_cursor
+
+def get_table_counts(conn):
+    """Aantal abonnementen en orders van de laatste synchronisatie."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT subscriptions_count, orders_count FROM sync_state WHERE id = 1")
+    row = cursor.fetchone()
+    if row:
+        return {'subscriptions': row[0], 'orders': row[1]}
+    # Nog niet gesynchroniseerd sinds de sync_state tabel er is
+    cursor.execute("SELECT (SELECT COUNT(*) FROM subscriptions), (SELECT COUNT(*) FROM orders)")
+    row = cursor.fetchone()
+    return {'subscriptions': row[0], 'orders': row[1]}
+
 def search_subscriptions_by_id(subscription_id):
     """
     Zoek een abonnement op basis van ID.
@@ -128,14 +365,25 @@ def search_subscriptions_by_email(email):
     try:
         logger.info(f"Zoeken naar abonnementen voor e-mail: {email}")
         
-        # Haal abonnementen op
+        # Haal abonnementen op, via de zoekindex als dat kan (beste match eerst)
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT s.*, 
-                   s.billing_first_name || ' ' || s.billing_last_name as customer_name
-            FROM subscriptions s
-            WHERE s.billing_email LIKE ?
-        """, (f"%{email}%",))
+        match = _search_match(cursor, 'subscriptions', 'email', email)
+        if match:
+            cursor.execute("""
+                SELECT s.*, 
+                       s.billing_first_name || ' ' || s.billing_last_name as customer_name
+                FROM subscriptions_search f
+                JOIN subscriptions s ON s.id = f.rowid
+                WHERE f.subscriptions_search MATCH ?
+                ORDER BY f.rank
+            """, (match,))
+        else:
+            cursor.execute("""
+                SELECT s.*, 
+                       s.billing_first_name || ' ' || s.billing_last_name as customer_name
+                FROM subscriptions s
+                WHERE s.billing_email LIKE ?
+            """, (f"%{email}%",))
         
         subscriptions = []
         for row in cursor.fetchall():
@@ -208,8 +456,17 @@ def search_subscriptions_by_name(name):
         
         # Controleer of de naam mogelijk een volledige naam is (voornaam + achternaam)
         name_parts = name.strip().split()
+        cursor = conn.cursor()
+        match = _search_match(cursor, 'subscriptions', 'name', name)
         
-        if len(name_parts) > 1:
+        if match:
+            # Zoekindex: alle naamdelen moeten in voor- + achternaam voorkomen, beste match eerst
+            cursor.execute("""
+                SELECT rowid AS id FROM subscriptions_search
+                WHERE subscriptions_search MATCH ?
+                ORDER BY rank
+            """, (match,))
+        elif len(name_parts) > 1:
             # Als er meerdere delen zijn, probeer te zoeken op voornaam + achternaam
             first_name = name_parts[0]
             # Combineer de rest als achternaam (voor namen met tussenvoegsel zoals "van der")
@@ -266,7 +523,18 @@ def get_customer_id_by_email(email):
     
     try:
         cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT customer_id FROM subscriptions WHERE billing_email LIKE ?", (f"%{email}%",))
+        match = _search_match(cursor, 'subscriptions', 'email', email)
+        if match:
+            cursor.execute("""
+                SELECT s.customer_id
+                FROM subscriptions_search f
+                JOIN subscriptions s ON s.id = f.rowid
+                WHERE f.subscriptions_search MATCH ?
+                ORDER BY f.rank
+                LIMIT 1
+            """, (match,))
+        else:
+            cursor.execute("SELECT DISTINCT customer_id FROM subscriptions WHERE billing_email LIKE ?", (f"%{email}%",))
         row = cursor.fetchone()
         
         if row:
@@ -281,9 +549,12 @@ def get_customer_id_by_email(email):
     finally:
         conn.close()
 
-def get_all_subscriptions(limit=None, offset=None):
+def get_all_subscriptions(limit=None, offset=None, page_cursor=None):
     """
     Haal alle abonnementen op met optionele paginering.
+    
+    Met ``page_cursor`` (of zonder offset) wordt keyset paginering op id
+    gebruikt; het resultaat bevat dan next_cursor en prev_cursor.
     """
     conn = get_db_connection()
     if not conn:
@@ -298,24 +569,23 @@ def get_all_subscriptions(limit=None, offset=None):
                    s.billing_first_name || ' ' || s.billing_last_name as customer_name
             FROM subscriptions s
         """
+        next_cursor = prev_cursor = None
         
-        # Voeg ORDER BY en LIMIT/OFFSET toe als ze zijn opgegeven
-        query += " ORDER BY s.id DESC"
-        if limit is not None:
-            query += " LIMIT ?"
-            if offset is not None:
-                query += " OFFSET ?"
-        
-        # Voer de query uit
-        if limit is not None and offset is not None:
-            cursor.execute(query, (limit, offset))
-        elif limit is not None:
-            cursor.execute(query, (limit,))
+        if limit is not None and offset is None:
+            # Keyset paginering: elke pagina even snel, ongeacht hoe ver je bladert
+            rows, next_cursor, prev_cursor = fetch_keyset_page(cursor, query, [('s.id', 'id')], limit, page_cursor)
         else:
-            cursor.execute(query)
+            # Voeg ORDER BY en LIMIT/OFFSET toe als ze zijn opgegeven
+            query += " ORDER BY s.id DESC"
+            if limit is not None:
+                query += " LIMIT ? OFFSET ?"
+                cursor.execute(query, (limit, offset))
+            else:
+                cursor.execute(query)
+            rows = cursor.fetchall()
         
         subscriptions = []
-        for row in cursor.fetchall():
+        for row in rows:
             subscription = dict(row)
             
             # Haal de laatste order datum op voor het e-mailadres
@@ -327,16 +597,19 @@ def get_all_subscriptions(limit=None, offset=None):
             
             subscriptions.append(subscription)
         
-        # Haal totaal aantal abonnementen op
-        cursor.execute("SELECT COUNT(*) as total FROM subscriptions")
-        total = cursor.fetchone()['total']
+        # Totaal aantal abonnementen, bijgehouden per synchronisatie
+        total = get_table_counts(conn)['subscriptions']
         
         return {
             "success": True,
             "data": subscriptions,
-            "total": total
+            "total": total,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor
         }
         
+    except ValueError as e:
+        return {"error": str(e)}
     except Exception as e:
         logger.error(f"Fout bij ophalen abonnementen: {str(e)}")
         return {"error": str(e)}
@@ -352,17 +625,11 @@ def get_orders_by_email(email):
             
         cursor = conn.cursor()
         
-        # Voeg index toe voor snellere zoekacties
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_orders_email 
-            ON orders(billing_email)
-        """)
-        
         # Zoek orders op basis van het e-mailadres met LIMIT
         cursor.execute("""
             SELECT o.*, 
                    o.billing_first_name || ' ' || o.billing_last_name as customer_name,
-                   o.line_items as product_list,
+                   o.items_summary as product_list,
                    o.created_date as date_created
             FROM orders o
             WHERE LOWER(o.billing_email) = LOWER(?)
@@ -370,33 +637,9 @@ def get_orders_by_email(email):
             LIMIT 50  -- Beperk het aantal orders voor betere performance
         """, (email,))
         
+        # Orderregels komen uit order_items, zonder JSON te parsen
         orders = []
-        for row in cursor.fetchall():
-            order_dict = dict(row)
-            order_dict['line_items'] = []
-            
-            # Parse line_items JSON
-            if order_dict['product_list']:
-                try:
-                    line_items = json.loads(order_dict['product_list'])
-                    for item in line_items:
-                        if isinstance(item['name'], list):
-                            name = item['name'][0]
-                        else:
-                            name = item['name']
-                            
-                        if isinstance(item['quantity'], list):
-                            quantity = item['quantity'][0]
-                        else:
-                            quantity = item['quantity']
-                            
-                        order_dict['line_items'].append({
-                            'quantity': quantity,
-                            'name': name
-                        })
-                except Exception as e:
-                    logger.error(f"Fout bij parsen line_items JSON: {str(e)}")
-            
+        for order_dict in attach_order_items(cursor, [dict(row) for row in cursor.fetchall()]):
             # Voeg leesbare status toe
             order_dict['status_display'] = {
                 'completed': 'Voltooid',
@@ -491,14 +734,8 @@ def get_order_by_id(order_id):
             'refunded': 'Terugbetaald'
         }.get(order.get('status', ''), order.get('status', ''))
         
-        # Parse line_items JSON als het bestaat
-        if order.get('line_items'):
-            try:
-                order['line_items'] = json.loads(order['line_items'])
-            except:
-                order['line_items'] = []
-        else:
-            order['line_items'] = []
+        # Orderregels uit order_items
+        attach_order_items(cursor, [order])
         
         logger.info(f"Order gevonden: {order_id}")
         return {"success": True, "data": order}
@@ -528,14 +765,25 @@ def search_orders_by_name(name):
         search_term = name.strip().lower()
         
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT * FROM orders 
-            WHERE LOWER(billing_first_name || ' ' || billing_last_name) LIKE ?
-            OR LOWER(billing_first_name) LIKE ?
-            OR LOWER(billing_last_name) LIKE ?
-            ORDER BY created_date DESC
-            LIMIT 50
-        """, (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"))
+        match = _search_match(cursor, 'orders', 'name', search_term)
+        if match:
+            # Zoekindex: beste match eerst, daarbinnen de nieuwste orders
+            cursor.execute("""
+                SELECT o.* FROM orders_search f
+                JOIN orders o ON o.id = f.rowid
+                WHERE f.orders_search MATCH ?
+                ORDER BY f.rank, o.created_date DESC
+                LIMIT 50
+            """, (match,))
+        else:
+            cursor.execute("""
+                SELECT * FROM orders 
+                WHERE LOWER(billing_first_name || ' ' || billing_last_name) LIKE ?
+                OR LOWER(billing_first_name) LIKE ?
+                OR LOWER(billing_last_name) LIKE ?
+                ORDER BY created_date DESC
+                LIMIT 50
+            """, (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"))
         
         orders_rows = cursor.fetchall()
         
@@ -543,10 +791,9 @@ def search_orders_by_name(name):
             logger.warning(f"Geen orders gevonden voor naam: {name}")
             return {"error": f"Geen orders gevonden voor naam: {name}", "status": 404}
         
-        # Converteer naar dictionaries
+        # Converteer naar dictionaries, met de orderregels uit order_items
         orders = []
-        for row in orders_rows:
-            order = dict(row)
+        for order in attach_order_items(cursor, [dict(row) for row in orders_rows]):
             
             # Verwerk meta_data
             if order.get('meta_data'):
@@ -555,13 +802,6 @@ def search_orders_by_name(name):
                 except:
                     order['meta_data'] = []
             
-            # Parse line_items JSON als het bestaat
-            if order.get('line_items'):
-                try:
-                    order['line_items'] = json.loads(order['line_items'])
-                except:
-                    order['line_items'] = []
-            
             # Voeg billing object toe voor consistentie
             order['billing'] = {
                 'first_name': order.get('billing_first_name', ''),
@@ -603,25 +843,58 @@ def search_orders_by_name(name):
     finally:
         conn.close()
 
+def refresh_statistics(conn):
+    """
+    Bereken de abonnements- en orderstatistieken opnieuw, elk in één pass.
+
+    Wordt aangeroepen na de synchronisatie; de pagina's lezen daarna alleen de
+    voorberekende rijen uit subscription_status_stats en order_monthly_stats.
+    """
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM subscription_status_stats")
+    cursor.execute("""
+        INSERT INTO subscription_status_stats (status, count, total_value)
+        SELECT status, COUNT(*), SUM(total)
+        FROM subscriptions
+        GROUP BY status
+    """)
+    cursor.execute("DELETE FROM order_monthly_stats")
+    cursor.execute("""
+        INSERT INTO order_monthly_stats (month, count, total)
+        SELECT substr(created_date, 1, 7), COUNT(*), SUM(total)
+        FROM orders
+        WHERE created_date IS NOT NULL
+        GROUP BY substr(created_date, 1, 7)
+    """)
+    # Totalen voor de overzichtspagina's, met een nieuwe synchronisatie generatie
+    cursor.execute("""
+        INSERT OR REPLACE INTO sync_state (id, generation, synced_at, subscriptions_count, orders_count)
+        SELECT 1,
+               COALESCE((SELECT generation FROM sync_state WHERE id = 1), 0) + 1,
+               datetime('now'),
+               (SELECT COUNT(*) FROM subscriptions),
+               (SELECT COUNT(*) FROM orders)
+    """)
+    conn.commit()
+    logger.info("Statistieken ververst")
+
 def get_subscription_statistics():
-    """Haal statistieken op over abonnementen"""
+    """Haal statistieken op over abonnementen (voorberekend bij de synchronisatie)"""
     logger.info("Ophalen van abonnementsstatistieken")
     
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Basisquery voor status counts
         cursor.execute("""
-            SELECT status,
-                   COUNT(*) as count,
-                   SUM(total) as total_value
-            FROM subscriptions
-            GROUP BY status
+            SELECT status, count, total_value
+            FROM subscription_status_stats
+            ORDER BY status
         """)
         
         status_counts = []
         total_count = 0
+        active_count = 0
         total_value = 0
         total_value_on_hold = 0
         
@@ -634,34 +907,11 @@ def get_subscription_statistics():
             })
             total_count += count
             if status == 'active':
+                active_count = count
                 total_value = value if value is not None else 0
             elif status == 'on-hold':
                 total_value_on_hold = value if value is not None else 0
         
-        # Haal actieve abonnementen op
-        cursor.execute("""
-            SELECT COUNT(*) as count,
-                   SUM(total) as total_value
-            FROM subscriptions
-            WHERE status = 'active'
-        """)
-        
-        active_row = cursor.fetchone()
-        active_count = active_row[0] if active_row[0] is not None else 0
-        total_value_excl = active_row[1] if active_row[1] is not None else 0
-        
-        # Haal gepauzeerde abonnementen op
-        cursor.execute("""
-            SELECT COUNT(*) as count,
-                   SUM(total) as total_value
-            FROM subscriptions
-            WHERE status = 'on-hold'
-        """)
-        
-        on_hold_row = cursor.fetchone()
-        on_hold_count = on_hold_row[0] if on_hold_row[0] is not None else 0
-        total_value_on_hold = on_hold_row[1] if on_hold_row[1] is not None else 0
-        
         conn.close()
         
         return {
@@ -671,7 +921,7 @@ def get_subscription_statistics():
                 'total_count': total_count,
                 'active_count': active_count,
                 'total_value': total_value,
-                'total_value_excl': total_value_excl,
+                'total_value_excl': total_value,
                 'total_value_on_hold': total_value_on_hold
             }
         }
@@ -689,54 +939,26 @@ def init_db():
         return False
         
     try:
+        # Tabellen, kolommen en indexen worden door de migraties beheerd
+        migrate(conn)
         cursor = conn.cursor()
         
-        # Maak order_margin_data tabel
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS order_margin_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER NOT NULL,
-                margin DECIMAL(10,2),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (order_id) REFERENCES orders(id)
-            )
-        """)
+        # Zoekindex opbouwen als de database gesynchroniseerd is van voor de index
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('subscriptions', 'orders', 'subscriptions_search', 'orders_search')")
+        existing = {row['name'] for row in cursor.fetchall()}
+        if {'subscriptions', 'orders'} <= existing and not set(SEARCH_INDEXES.values()) <= existing:
+            rebuild_search_index(conn)
         
-        # Voeg shipping kolommen toe aan orders tabel
-        shipping_columns = [
-            "shipping_first_name TEXT",
-            "shipping_last_name TEXT",
-            "shipping_address_1 TEXT",
-            "shipping_address_2 TEXT",
-            "shipping_postcode TEXT",
-            "shipping_city TEXT",
-            "shipping_country TEXT",
-            "shipping_company TEXT"
-        ]
-        
-        for column in shipping_columns:
-            try:
-                cursor.execute(f"ALTER TABLE orders ADD COLUMN {column};")
-            except sqlite3.OperationalError:
-                # Kolom bestaat mogelijk al
-                continue
-        
-        # Voeg Monta order tracking toe aan orders tabel
-        monta_columns = [
-            "monta_order_id TEXT",
-            "monta_order_status TEXT",
-            "monta_order_created_at TIMESTAMP",
-            "monta_shipment_date DATE"
-        ]
-        
-        for column in monta_columns:
-            try:
-                cursor.execute(f"ALTER TABLE orders ADD COLUMN {column};")
-            except sqlite3.OperationalError:
-                # Kolom bestaat mogelijk al
-                continue
+        # Statistieken berekenen als de database van voor deze tabellen is
+        cursor.execute("SELECT NOT EXISTS (SELECT 1 FROM subscription_status_stats) OR NOT EXISTS (SELECT 1 FROM sync_state)")
+        if cursor.fetchone()[0]:
+            refresh_statistics(conn)
+        
+        # Orderregels uitsplitsen als de database gesynchroniseerd is van voor order_items
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM orders WHERE line_items IS NOT NULL) AND NOT EXISTS (SELECT 1 FROM order_items)")
+        if cursor.fetchone()[0]:
+            rebuild_order_items(conn)
         
-        conn.commit()
         return True
     except Exception as e:
         logger.error(f"Fout bij initialiseren database: {str(e)}")
@@ -2,15 +2,15 @@ from c_modules.database import connect_to_database
 import logging
 import time
 
-def fetch_current_script_id(cursor):
-    # Voer de query uit om het hoogste ScriptID op te halen
-    query = 'SELECT MAX(Script_ID) FROM Logboek'
+def fetch_next_script_id(cursor):
+    # Haal het volgende ScriptID uit de gedeelde sequence (geen MAX scan of lock op Logboek)
+    query = 'SELECT NEXT VALUE FOR dbo.Script_ID_Seq'
     cursor.execute(query)
     
     # Verkrijg het resultaat
-    highest_script_id = cursor.fetchone()[0]
+    next_script_id = cursor.fetchone()[0]
 
-    return highest_script_id
+    return next_script_id
 
 def determine_script_id(greit_connection_string):
     try:
@@ -20,14 +20,9 @@ def determine_script_id(greit_connection_string):
     if database_conn:
         logging.info(f"Verbinding met database geslaagd")
         cursor = database_conn.cursor()
-        latest_script_id = fetch_current_script_id(cursor)
-        logging.info(f"ScriptID: {latest_script_id}")
+        script_id = fetch_next_script_id(cursor)
+        database_conn.commit()
         database_conn.close()
-
-    if latest_script_id:
-        script_id = latest_script_id + 1
-    else:
-        script_id = 1
         
     logging.info(f"ScriptID: {script_id}")
     
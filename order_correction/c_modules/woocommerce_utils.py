@@ -1,8 +1,32 @@
 
-def get_woocommerce_order_data(order_id, wcapi):
-    response = wcapi.get(f"orders/{order_id}")
+
+# Velden die de BigQuery verwerking leest; met _fields blijven meta_data, _links en refunds weg
+ORDER_FIELDS = [
+    "id", "status", "currency", "total", "billing", "shipping", "number", "date_created",
+    "date_modified", "discount_total", "customer_id", "order_key", "payment_method",
+    "payment_method_title", "customer_ip_address", "customer_user_agent", "created_via",
+    "customer_note", "date_completed", "date_paid", "line_items", "coupon_lines",
+    "payment_url", "currency_symbol", "shipping_total",
+]
+
+SUBSCRIPTION_FIELDS = [
+    "id", "parent_id", "status", "number", "currency", "date_created", "date_modified",
+    "customer_id", "discount_total", "total", "billing", "shipping", "payment_method",
+    "payment_method_title", "customer_ip_address", "customer_user_agent", "created_via",
+    "customer_note", "date_completed", "date_paid", "line_items", "billing_period",
+    "billing_interval", "start_date_gmt", "next_payment_date_gmt", "end_date_gmt",
+    "shipping_total",
+]
+
+def fields_param(fields):
+    return ",".join(fields)
+
+def get_woocommerce_order_data(order_id, wcapi, fields=ORDER_FIELDS):
+    params = {"_fields": fields_param(fields)} if fields else None
+    response = wcapi.get(f"orders/{order_id}", params=params)
     return response.json()
 
-def get_woocommerce_subscription_data(subscription_id, wcapi):
-    response = wcapi.get(f"subscriptions/{subscription_id}")
-    return response.json()
\ No newline at end of file
+def get_woocommerce_subscription_data(subscription_id, wcapi, fields=SUBSCRIPTION_FIELDS):
+    params = {"_fields": fields_param(fields)} if fields else None
+    response = wcapi.get(f"subscriptions/{subscription_id}", params=params)
+    return response.json()
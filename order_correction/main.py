@@ -61,7 +61,8 @@ def main():
             response = wcapi.get("orders", params={
                 "after": seven_days_ago,
                 "per_page": 100,
-                "page": page
+                "page": page,
+                "_fields": "id"  # Alleen IDs nodig; de volledige order wordt per ID opgehaald
             }).json()
 
             if not response:  # Stop als er geen resultaten meer zijn
@@ -42,12 +42,18 @@ def filter_subscriptions_with_price_mismatch(subscriptions):
 
     return data
 
-def get_active_subscriptions(wcapi):
+# Velden die de prijs filters lezen; met _fields blijven meta_data en _links weg
+SUBSCRIPTION_FIELDS = ["id", "billing", "line_items", "shipping_total", "total"]
+
+def get_active_subscriptions(wcapi, fields=SUBSCRIPTION_FIELDS):
     subscriptions = []
     page = 1
 
     while True:
-        response = wcapi.get(f"subscriptions?status=active&page={page}&per_page=100").json()
+        params = {"status": "active", "page": page, "per_page": 100}
+        if fields:
+            params["_fields"] = ",".join(fields)
+        response = wcapi.get("subscriptions", params=params).json()
         if not response:
             break
         subscriptions.extend(response)
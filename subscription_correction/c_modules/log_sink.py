@@ -0,0 +1,250 @@
+import hashlib
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+import pyodbc
+
+# Naast app.log, in de map waar het script gedraaid wordt
+DEFAULT_SPILL_PATH = "log_spill.jsonl"
+
+# SQL Server staat maximaal 2100 parameters per statement toe
+MAX_PARAMS = 2000
+
+_FLUSH = object()
+_STOP = object()
+
+
+def target_name(prefix, conn_str):
+    """Naam voor een doel zonder de connection string (met wachtwoord) op schijf te zetten."""
+    return f"{prefix}-{hashlib.sha1(conn_str.encode('utf-8')).hexdigest()[:10]}"
+
+
+class LogSink:
+    """
+    Schrijft logregels vanuit een achtergrond thread in batches naar de database.
+
+    Handlers zetten rijen alleen in een (onbegrensde) queue, zodat de request
+    thread niet op de database wacht en er bij pieken niets wegvalt. De thread
+    houdt per doel één connectie open en schrijft elke ``batch_size`` rijen of
+    na ``flush_interval_ms`` met één multi-row INSERT. Als de database niet
+    bereikbaar is gaan de rijen naar een lokaal JSONL bestand, dat na
+    ``retry_interval`` seconden opnieuw aangeboden wordt. Bij het afsluiten van
+    het proces wordt de queue leeggeschreven.
+    """
+
+    def __init__(self, spill_path, batch_size=50, flush_interval_ms=500, retry_interval=60):
+        self.spill_path = spill_path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000
+        self.retry_interval = retry_interval
+        self._targets = {}
+        self._connections = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._down_until = 0.0
+        self._last_replay = 0.0
+
+    def register(self, target, conn_str, table, columns):
+        """Registreer een doeltabel; ``target`` is de naam waaronder rijen geschreven worden."""
+        self._targets[target] = (conn_str, table, tuple(columns))
+
+    def write(self, target, row):
+        if self._closed:
+            # Na het afsluiten (bijv. logging tijdens atexit) direct wegschrijven
+            self._write_batch([(target, tuple(row))])
+            return
+        self._ensure_started()
+        self._queue.put((target, tuple(row)))
+
+    def flush(self, timeout=30):
+        """Wacht tot alles wat nu in de queue staat is weggeschreven (of gespilld)."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait(timeout)
+
+    def close(self, timeout=30):
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._closed = True
+        if thread is None:
+            return
+        self._queue.put((_STOP, None))
+        thread.join(timeout)
+        for conn in self._connections.values():
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._connections = {}
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = []
+            waiters = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    target, item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if target is _STOP:
+                    stop = True
+                    break
+                if target is _FLUSH:
+                    waiters.append(item)
+                    break
+                batch.append((target, item))
+
+            if stop:
+                # Alles wat nog in de queue staat meenemen voor het afsluiten
+                while True:
+                    try:
+                        target, item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if target is _FLUSH:
+                        waiters.append(item)
+                    elif target is not _STOP:
+                        batch.append((target, item))
+
+            # Fouten afvangen per ronde: stopt deze thread, dan loopt de queue vol
+            # zonder dat er nog iets geschreven wordt en wacht flush() tevergeefs
+            try:
+                if batch:
+                    self._write_batch(batch)
+            except Exception as e:
+                print(f"Fout bij wegschrijven van {len(batch)} logregels: {e}")
+            for done in waiters:
+                done.set()
+            try:
+                self._replay_spill()
+            except Exception as e:
+                print(f"Fout bij opnieuw aanbieden van lokaal bewaarde logregels: {e}")
+
+    def _write_batch(self, batch):
+        rows_per_target = {}
+        for target, row in batch:
+            rows_per_target.setdefault(target, []).append(row)
+        for target, rows in rows_per_target.items():
+            if target not in self._targets or time.time() < self._down_until:
+                self._spill(target, rows)
+                continue
+            try:
+                self._insert(target, rows)
+            except Exception as e:
+                # Database niet bereikbaar: rijen naar schijf en even niet meer proberen
+                print(f"Fout bij schrijven van {len(rows)} logregels naar database, lokaal bewaard: {e}")
+                self._down_until = time.time() + self.retry_interval
+                self._spill(target, rows)
+
+    def _insert(self, target, rows):
+        conn_str, table, columns = self._targets[target]
+        per_statement = max(1, min(len(rows), MAX_PARAMS // len(columns)))
+        for attempt in range(2):
+            conn = self._connections.get(target)
+            try:
+                if conn is None:
+                    conn = pyodbc.connect(conn_str)
+                    self._connections[target] = conn
+                cursor = conn.cursor()
+                column_sql = ", ".join(f"[{c}]" for c in columns)
+                placeholders = "(" + ", ".join("?" for _ in columns) + ")"
+                for i in range(0, len(rows), per_statement):
+                    chunk = rows[i:i + per_statement]
+                    cursor.execute(
+                        f"INSERT INTO {table} ({column_sql}) VALUES {', '.join(placeholders for _ in chunk)}",
+                        [value for row in chunk for value in row]
+                    )
+                conn.commit()
+                cursor.close()
+                return
+            except Exception:
+                # Een open connectie kan verlopen zijn; één keer opnieuw met een verse connectie
+                self._connections.pop(target, None)
+                try:
+                    if conn is not None:
+                        conn.close()
+                except Exception:
+                    pass
+                if attempt == 1:
+                    raise
+
+    def _spill(self, target, rows):
+        with self._spill_lock:
+            os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({"target": target, "row": list(row)}, default=str) + "\n")
+
+    def _replay_spill(self):
+        now = time.time()
+        if now < self._down_until or now - self._last_replay < self.retry_interval:
+            return
+        self._last_replay = now
+        replay_path = self.spill_path + ".replay"
+        with self._spill_lock:
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path):
+                    return
+                os.replace(self.spill_path, replay_path)
+
+        rows_per_target = {}
+        bad_lines = []
+        with open(replay_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                    rows_per_target.setdefault(entry["target"], []).append(tuple(entry["row"]))
+                except (ValueError, KeyError, TypeError):
+                    # Bijv. een half geschreven laatste regel na een crash tijdens het spillen
+                    bad_lines.append(line if line.endswith("\n") else line + "\n")
+        if bad_lines:
+            # Apart zetten in plaats van afbreken, anders blijft het .replay bestand bij elke poging hangen
+            with open(self.spill_path + ".bad", "a", encoding="utf-8") as f:
+                f.writelines(bad_lines)
+            print(f"{len(bad_lines)} onleesbare logregels apart gezet in {self.spill_path}.bad")
+
+        for target, rows in rows_per_target.items():
+            if target not in self._targets:
+                # Doel nog niet geregistreerd in dit proces; later opnieuw
+                self._spill(target, rows)
+                continue
+            try:
+                for i in range(0, len(rows), self.batch_size * 10):
+                    self._insert(target, rows[i:i + self.batch_size * 10])
+            except Exception as e:
+                print(f"Lokaal bewaarde logregels nog niet weggeschreven: {e}")
+                self._down_until = time.time() + self.retry_interval
+                self._spill(target, rows[i:])
+        os.remove(replay_path)
+
+
+log_sink = LogSink(
+    spill_path=os.getenv('LOG_SPILL_PATH', DEFAULT_SPILL_PATH),
+    batch_size=int(os.getenv('LOG_SINK_BATCH_SIZE', '50')),
+    flush_interval_ms=int(os.getenv('LOG_SINK_FLUSH_MS', '500')),
+)
@@ -60,7 +60,8 @@ def main():
             try:
                 response = wcapi.get("subscriptions", params={
                     "per_page": 100,
-                    "page": page
+                    "page": page,
+                    "_fields": "id"  # Alleen IDs nodig; details worden per batch opgehaald
                 }).json()
 
                 if not response:  # Stop als er geen resultaten meer zijn
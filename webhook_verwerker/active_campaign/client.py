@@ -0,0 +1,252 @@
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict
+import threading
+import requests
+import logging
+import json
+import time
+import os
+
+# Connect en read timeout; de oude 120 seconden hield een worker te lang vast
+TIMEOUT = (10, 60)
+SUCCESS_CODES = [200, 201]
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache met een maximale leeftijd per entry.
+
+    Houdt hits en misses bij, zodat zichtbaar is hoeveel API requests bespaard worden.
+    """
+    def __init__(self, max_size=5000, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        with self._lock:
+            for key in [k for k, (value, _) in self._data.items() if predicate(k, value)]:
+                del self._data[key]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0
+            }
+
+
+class ActiveCampaignClient:
+    """
+    Active Campaign API client met een keep-alive sessie en caches.
+
+    - email -> contact ID (de duurste lookup, bij elke webhook nodig)
+    - tag naam -> tag ID
+    - (contact, tag) paren die net toegevoegd zijn, alleen een paar seconden, zodat een burst
+      van webhooks voor hetzelfde contact één POST doet. Langer cachen kan niet: een AC
+      automation kan de tag intussen verwijderd hebben (bijv. opzeggen en opnieuw abonneren)
+
+    Bij een schrijfactie worden de betreffende entries bijgewerkt of verwijderd;
+    een 404 op een contact verwijdert de email -> contact mapping.
+    """
+    def __init__(self, api_url, api_token, timeout=TIMEOUT, pool_size=10, contact_ttl=3600, tag_ttl=86400, contact_tag_ttl=5):
+        self.api_url = api_url if api_url.endswith('/') else api_url + '/'
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({"accept": "application/json", "Api-Token": api_token})
+        self.contacts = TTLCache(max_size=10000, ttl=contact_ttl)
+        self.tags = TTLCache(max_size=1000, ttl=tag_ttl)
+        self.contact_tags = TTLCache(max_size=20000, ttl=contact_tag_ttl)
+        self.requests_made = 0
+        self._stats_lock = threading.Lock()
+
+    def _send(self, method, path, payload=None, params=None):
+        with self._stats_lock:
+            self.requests_made += 1
+        return self.session.request(method, self.api_url + path, json=payload, params=params, timeout=self.timeout)
+
+    def request(self, method, path, payload=None, params=None):
+        """Voer een request uit en geef de JSON response terug."""
+        if method not in ('GET', 'POST', 'PUT', 'DELETE'):
+            raise ValueError(f"Ongeldige HTTP methode: {method}")
+        try:
+            response = self._send(method, path, payload, params)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Request fout: {str(e)}")
+        except json.JSONDecodeError:
+            raise Exception("Ongeldige JSON response")
+
+    def get_contact_data(self, email):
+        """Haal contact data op (zelfde vorm als GET contacts?email=)."""
+        logging.info(f"Getting AC contact data for email: {email}")
+        result = self.request('GET', 'contacts', params={'email': email})
+        contacts = result.get('contacts', [])
+        logging.info(f"Found {len(contacts)} contacts for {email}")
+        if contacts:
+            self.contacts.set(email.strip().lower(), contacts[0]['id'])
+        return result
+
+    def get_contact_id(self, email):
+        """Contact ID voor een email, uit de cache als het kan. None als er geen contact is."""
+        contact_id = self.contacts.get(email.strip().lower())
+        if contact_id is not None:
+            return contact_id
+        contacts = self.get_contact_data(email).get('contacts', [])
+        # Geen negatieve caching: een contact kan vlak na de webhook aangemaakt worden
+        return contacts[0]['id'] if contacts else None
+
+    def invalidate_contact(self, contact_id):
+        """Vergeet alles wat over een contact gecachet is."""
+        contact_id = str(contact_id)
+        self.contacts.invalidate_where(lambda email, value: str(value) == contact_id)
+        self.contact_tags.invalidate_where(lambda key, value: str(key[0]) == contact_id)
+
+    def get_field_values(self, contact_id):
+        """Haal velden op voor een contact. Handelt 404 errors af voor contacten zonder custom fields."""
+        logging.info(f"Getting AC field values for contact {contact_id}")
+        try:
+            response = self._send('GET', f"contacts/{contact_id}/fieldValues")
+
+            # Als contact geen custom fields heeft, geeft AC vaak 404 terug
+            if response.status_code == 404:
+                logging.info(f"No field values found for contact {contact_id} (404) - contact probably has no custom fields yet")
+                return {"fieldValues": []}
+
+            response.raise_for_status()
+            result = response.json()
+            logging.info(f"Found {len(result.get('fieldValues', []))} field values for contact {contact_id}")
+            return result
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Request fout: {str(e)}")
+        except json.JSONDecodeError:
+            raise Exception("Ongeldige JSON response")
+
+    def write_field_value(self, contact_id, field, value, field_value_id=None):
+        """Update (PUT) of maak (POST) één veldwaarde voor een contact."""
+        payload = {
+            "fieldValue": {
+                "contact": contact_id,
+                "field": field,
+                "value": str(value)
+            },
+            "useDefaults": False
+        }
+        path = f"fieldValues/{field_value_id}" if field_value_id else "fieldValues"
+        try:
+            return self.request('PUT' if field_value_id else 'POST', path, payload)
+        except Exception:
+            # Mogelijk verwijderd of samengevoegd contact: volgende keer opnieuw opzoeken
+            self.invalidate_contact(contact_id)
+            raise
+
+    def get_tag_data(self, search_key=None):
+        params = {'search': search_key} if search_key else None
+        result = self.request('GET', 'tags', params=params)
+        for tag in result.get('tags', []):
+            self.tags.set(tag['tag'], tag['id'])
+        return result
+
+    def get_tag_id(self, name):
+        tag_id = self.tags.get(name)
+        if tag_id is None:
+            for tag in self.get_tag_data(name).get('tags', []):
+                if tag['tag'] == name:
+                    return tag['id']
+        return tag_id
+
+    def add_tag(self, contact_id, tag_id):
+        """Voeg een tag toe aan een contact; slaat de POST over als dat net al gebeurd is."""
+        key = (str(contact_id), str(tag_id))
+        if self.contact_tags.get(key):
+            logging.info(f"Tag {tag_id} staat al op contact {contact_id} (cache)")
+            return
+        payload = {
+            "contactTag": {
+                "contact": int(contact_id),
+                "tag": int(tag_id)
+            }
+        }
+        try:
+            self.request('POST', 'contactTags', payload)
+        except Exception:
+            self.invalidate_contact(contact_id)
+            raise
+        self.contact_tags.set(key, True)
+
+    def cache_stats(self):
+        """Cache statistieken; elke hit is een bespaarde API request."""
+        caches = {
+            'contacts': self.contacts.stats(),
+            'tags': self.tags.stats(),
+            'contact_tags': self.contact_tags.stats()
+        }
+        return {
+            'caches': caches,
+            'requests_made': self.requests_made,
+            'requests_saved': sum(stats['hits'] for stats in caches.values())
+        }
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_url=None, api_token=None):
+    """Gedeelde client per API url en token, zodat sessie en caches hergebruikt worden."""
+    api_url = api_url or os.getenv('ACTIVE_CAMPAIGN_API_URL')
+    api_token = api_token or os.getenv('ACTIVE_CAMPAIGN_API_TOKEN')
+    if not all([api_url, api_token]):
+        raise ValueError("Ontbrekende Active Campaign configuratie")
+    with _clients_lock:
+        client = _clients.get((api_url, api_token))
+        if client is None:
+            client = ActiveCampaignClient(
+                api_url,
+                api_token,
+                contact_ttl=int(os.getenv('AC_CONTACT_CACHE_TTL', '3600')),
+                tag_ttl=int(os.getenv('AC_TAG_CACHE_TTL', '86400')),
+                contact_tag_ttl=int(os.getenv('AC_CONTACT_TAG_CACHE_TTL', '5'))
+            )
+            _clients[(api_url, api_token)] = client
+        return client
+
+
+def get_cache_stats():
+    with _clients_lock:
+        clients = list(_clients.values())
+    return [client.cache_stats() for client in clients]
@@ -0,0 +1,188 @@
+from active_campaign.client import get_client
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+import threading
+import logging
+import os
+
+# Hoe lang wijzigingen voor hetzelfde contact verzameld worden voordat ze geschreven worden
+DEFAULT_WINDOW = float(os.getenv('AC_COALESCE_WINDOW', '1.0'))
+# Maximale wachttijd van een webhook op het wegschrijven van zijn wijzigingen
+RESULT_TIMEOUT = 300
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return 0
+
+
+@dataclass
+class _PendingWrite:
+    # veld -> opeenvolgende (delta, ondergrens) operaties, in volgorde van binnenkomst
+    deltas: Dict[str, List[Tuple[int, Optional[int]]]] = field(default_factory=dict)
+    # veld -> vaste waarde; de laatste wint
+    values: Dict[str, str] = field(default_factory=dict)
+    tags: Set[str] = field(default_factory=set)
+    futures: List[Future] = field(default_factory=list)
+
+
+class ContactWriteCoalescer:
+    """
+    Voegt Active Campaign veld- en tagwijzigingen per contact samen.
+
+    Een webhook geeft zijn wijzigingen op (delta's zoals +1 op het abo veld,
+    vaste waarden zoals het laatst bestelde product, en tags) en krijgt een
+    Future; de job worker wacht daar niet op, maar rondt de job af zodra de
+    Future klaar is. Alles wat binnen ``window`` seconden voor hetzelfde contact
+    binnenkomt wordt met één keer lezen van de fieldValues en alleen de
+    gewijzigde velden geschreven. Per contact loopt steeds maar één flush, dus
+    gelijktijdige workers kunnen elkaars updates niet overschrijven.
+    """
+    def __init__(self, client, window=DEFAULT_WINDOW):
+        self.client = client
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending: Dict[str, _PendingWrite] = {}
+        self._contact_locks: Dict[str, threading.Lock] = {}
+        self.submitted = 0
+        self.flushes = 0
+
+    def submit(self, contact_id, deltas=None, values=None, tags=None, floor=None) -> Future:
+        """
+        Geef wijzigingen op voor een contact.
+
+        Args:
+            contact_id: Active Campaign contact ID
+            deltas: veld ID -> op te tellen waarde
+            values: veld ID -> nieuwe waarde
+            tags: tag IDs om toe te voegen
+            floor: ondergrens voor de velden in deltas (bijv. 0 bij verlagen)
+
+        Returns:
+            Future met een dict: fields (eindwaarden), updated, created, tags, failed_tags
+        """
+        contact_id = str(contact_id)
+        future = Future()
+        with self._lock:
+            pending = self._pending.get(contact_id)
+            if pending is None:
+                pending = self._pending[contact_id] = _PendingWrite()
+                timer = threading.Timer(self.window, self._flush, args=(contact_id,))
+                timer.daemon = True
+                timer.start()
+            for field_id, delta in (deltas or {}).items():
+                pending.deltas.setdefault(str(field_id), []).append((int(delta), floor))
+            for field_id, value in (values or {}).items():
+                pending.values[str(field_id)] = value
+            pending.tags.update(str(tag) for tag in (tags or []))
+            pending.futures.append(future)
+            self.submitted += 1
+        return future
+
+    def apply(self, contact_id, deltas=None, values=None, tags=None, floor=None):
+        """Zoals submit, maar wacht op het resultaat (of de fout) van de flush."""
+        return self.submit(contact_id, deltas, values, tags, floor).result(timeout=self.window + RESULT_TIMEOUT)
+
+    def _contact_lock(self, contact_id):
+        with self._lock:
+            return self._contact_locks.setdefault(contact_id, threading.Lock())
+
+    def _flush(self, contact_id):
+        # Eén flush per contact tegelijk; nieuwe wijzigingen wachten op de volgende
+        contact_lock = self._contact_lock(contact_id)
+        with contact_lock:
+            with self._lock:
+                pending = self._pending.pop(contact_id, None)
+            if pending is None:
+                return
+            try:
+                result = self._write(contact_id, pending)
+            except Exception as e:
+                for future in pending.futures:
+                    future.set_exception(e)
+            else:
+                for future in pending.futures:
+                    future.set_result(result)
+            finally:
+                with self._lock:
+                    self.flushes += 1
+                    if contact_id not in self._pending:
+                        self._contact_locks.pop(contact_id, None)
+
+    def _write(self, contact_id, pending: _PendingWrite):
+        logging.info(f"AC wijzigingen voor contact {contact_id}: {len(pending.futures)} webhook(s) samengevoegd")
+        updated = created = 0
+        final_values = {}
+
+        if pending.deltas or pending.values:
+            field_values = self.client.get_field_values(contact_id).get('fieldValues', [])
+            current = {str(item['field']): item for item in field_values}
+
+            changes = {}
+            for field_id, operations in pending.deltas.items():
+                value = _to_int(current[field_id]['value']) if field_id in current else 0
+                for delta, floor in operations:
+                    value += delta
+                    if floor is not None:
+                        value = max(floor, value)
+                changes[field_id] = value
+            changes.update(pending.values)
+
+            for field_id, value in changes.items():
+                final_values[field_id] = value
+                existing = current.get(field_id)
+                if existing is None:
+                    self.client.write_field_value(contact_id, field_id, value)
+                    created += 1
+                elif str(existing['value']) != str(value):
+                    self.client.write_field_value(contact_id, field_id, value, field_value_id=existing['id'])
+                    updated += 1
+
+        added_tags, failed_tags = [], {}
+        for tag in sorted(pending.tags):
+            try:
+                self.client.add_tag(contact_id, tag)
+                added_tags.append(tag)
+            except Exception as e:
+                logging.error(f"Fout bij toevoegen tag {tag} aan contact {contact_id}: {str(e)}")
+                failed_tags[tag] = str(e)
+
+        logging.info(f"AC contact {contact_id}: {updated} velden bijgewerkt, {created} aangemaakt, {len(added_tags)} tags")
+        return {
+            'fields': final_values,
+            'updated': updated,
+            'created': created,
+            'tags': added_tags,
+            'failed_tags': failed_tags
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'flushes': self.flushes,
+                'pending_contacts': len(self._pending)
+            }
+
+
+_coalescers = {}
+_coalescers_lock = threading.Lock()
+
+
+def get_coalescer(api_url=None, api_token=None) -> ContactWriteCoalescer:
+    """Gedeelde coalescer per Active Campaign client."""
+    client = get_client(api_url, api_token)
+    with _coalescers_lock:
+        coalescer = _coalescers.get(id(client))
+        if coalescer is None:
+            coalescer = _coalescers[id(client)] = ContactWriteCoalescer(client)
+        return coalescer
+
+
+def get_coalescer_stats():
+    with _coalescers_lock:
+        coalescers = list(_coalescers.values())
+    return [coalescer.stats() for coalescer in coalescers]
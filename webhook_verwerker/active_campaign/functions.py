@@ -1,20 +1,13 @@
-from active_campaign.utils import get_active_campaign_data, get_active_campaign_fields, update_active_campaign_fields, PRODUCT_TO_FIELD, CATEGORY_TO_FIELD, add_tag_to_contact
-from utils.products import get_discount_dict, get_category_one_dict, get_base_unit_values, get_sku_dict, get_key_from_product_id, BASE_UNIT_VALUES
-from active_campaign.utils import update_field_values, add_or_update_last_ordered_item
+from active_campaign.utils import get_active_campaign_contact_id, PRODUCT_TO_FIELD, CATEGORY_TO_FIELD
+from active_campaign.coalescer import get_coalescer
+from utils.job_worker import Deferred, current_job_id, get_job_queue
+from utils.products import get_product_info
 from woocommerce import API
 from flask import request
 import logging
 import os
 
-def _get_required_dicts():
-    """Haalt alle benodigde dictionaries op in één keer."""
-    return {
-        'sku_dict': get_sku_dict(),
-        'discount_dict': get_discount_dict(),
-        'base_unit_values_dict': get_base_unit_values()
-    }
-
-def _process_line_items(line_items, dicts):
+def _process_line_items(line_items):
     """Verwerkt line items en genereert de benodigde velden."""
     product_line_fields = []
     discount_line_fields = []
@@ -26,20 +19,13 @@ def _process_line_items(line_items, dicts):
         product_id = item['product_id']
         quantity = float(item['quantity'])
         
-        # Eerst SKU ophalen voor het product
-        sku = get_key_from_product_id(product_id, dicts['sku_dict'])
+        # SKU categorie, korting en base value in één lookup uit de product index
+        product_info = get_product_info(product_id)
+        sku = product_info.sku_category
         
         # Base value berekening op basis van SKU
-        base_value = 0.0
-        if sku:
-            for base_unit, skus in BASE_UNIT_VALUES.items():
-                if sku in skus:
-                    try:
-                        base_value = float(base_unit)
-                        break
-                    except (ValueError, TypeError):
-                        logging.warning(f"Kon base_unit '{base_unit}' niet naar float converteren. Gebruik default 0.0.")
-        else:
+        base_value = product_info.base_value
+        if not sku:
             logging.info(f"Geen SKU gevonden voor product ID {product_id} in sku_dict. Base value blijft 0.0.")
         
         total_value = int(base_value * quantity)
@@ -54,7 +40,7 @@ def _process_line_items(line_items, dicts):
             logging.info(f"Product ID {product_id} niet gevonden in sku_dict, product field overgeslagen.")
 
         # Discount velden
-        key_for_discount = get_key_from_product_id(product_id, dicts['discount_dict'])
+        key_for_discount = product_info.discount
         if key_for_discount and key_for_discount in CATEGORY_TO_FIELD:
             discount_line_fields.append({
                 "field": CATEGORY_TO_FIELD[key_for_discount],
@@ -91,6 +77,42 @@ def _process_line_items(line_items, dicts):
         'last_ordered': ','.join(last_ordered_items)
     }
 
+def _after_write(future, on_result, name):
+    """
+    Zet het resultaat van de coalescer om naar het antwoord van de webhook.
+
+    De job worker wacht niet op het samenvoegvenster; de job wordt afgerond
+    zodra de coalescer voor dit contact geschreven heeft.
+    """
+    def then(done):
+        try:
+            return on_result(done.result())
+        except Exception as e:
+            logging.error(f"Fout in {name}: {str(e)}")
+            return {'status': 'error', 'message': str(e)}
+    return Deferred(future, then)
+
+def _already_applied(marker):
+    """True als deze job de stap ``marker`` bij een eerdere poging al uitgevoerd heeft."""
+    job_id = current_job_id()
+    return job_id is not None and get_job_queue().has_marker(job_id, marker)
+
+def _mark_when_written(future, marker):
+    """
+    Markeer de stap voor deze job zodra de coalescer geschreven heeft.
+
+    Voor niet-idempotente wijzigingen zoals het ophogen van een teller: een
+    retry of een herstart na het schrijven telt dan niet nog een keer.
+    """
+    job_id = current_job_id()
+    if job_id is None:
+        return
+    def mark(done):
+        if done.exception() is None:
+            get_job_queue().mark(job_id, marker)
+    # Voor de callback van de job worker geregistreerd, dus vóór het afronden van de job
+    future.add_done_callback(mark)
+
 def update_active_campaign_product_fields(data):
     """
     Verwerkt de webhook data voor het updaten van Active Campaign product velden.
@@ -104,11 +126,8 @@ def update_active_campaign_product_fields(data):
         if not all([active_campaign_api_url, active_campaign_api_token, email]):
             raise ValueError("Ontbrekende configuratie of email")
         
-        # Haal alle benodigde dictionaries op
-        dicts = _get_required_dicts()
-        
         # Verwerk line items
-        processed_data = _process_line_items(data['line_items'], dicts)
+        processed_data = _process_line_items(data['line_items'])
         
         # Controleer of er daadwerkelijk velden zijn om bij te werken
         all_new_fields = (
@@ -125,48 +144,41 @@ def update_active_campaign_product_fields(data):
             }
         
         # Haal Active Campaign data op
-        ac_data = get_active_campaign_data(email, active_campaign_api_url, active_campaign_api_token)
-        if not ac_data.get('contacts'):
+        ac_id = get_active_campaign_contact_id(email, active_campaign_api_url, active_campaign_api_token)
+        if ac_id is None:
             logging.warning(f"Geen contact gevonden voor email: {email}")
             return {'status': 'error', 'message': 'Geen contact gevonden'}
             
-        ac_id = ac_data['contacts'][0]['id']
-        field_values = get_active_campaign_fields(ac_id, active_campaign_api_url, active_campaign_api_token)['fieldValues']
-        
-        # Bereid huidige velden voor
-        current_fields = [
-            {"field": item['field'], "value": item['value'], "id": item['id']}
-            for item in field_values
-        ]
-        current_fields = sorted(current_fields, key=lambda x: int(x['field']))
-        
-        # Update velden - deze functie retourneert nu alleen daadwerkelijk gewijzigde velden
-        updated_fields, new_fields, changed_fields = update_field_values(current_fields, all_new_fields)
-        updated_fields, new_fields, last_ordered_changed = add_or_update_last_ordered_item(
-            updated_fields, 
-            new_fields, 
-            processed_data['last_ordered']
+        # Tel de waarden per veld op; de coalescer leest de huidige waarden en
+        # voegt wijzigingen van andere webhooks voor dit contact samen
+        deltas = {}
+        for update in all_new_fields:
+            deltas[update['field']] = deltas.get(update['field'], 0) + int(update['value'])
+
+        future = get_coalescer(active_campaign_api_url, active_campaign_api_token).submit(
+            ac_id,
+            deltas=deltas,
+            values={'13': processed_data['last_ordered']}
         )
         
-        # Log wat er gaat gebeuren
-        logging.info(f"Summary: {len(updated_fields)} existing fields to update, {len(new_fields)} new fields to create")
-        
-        # Alleen updaten als er daadwerkelijk iets is veranderd
-        if len(updated_fields) > 0 or len(new_fields) > 0:
-            # Push updates naar Active Campaign
-            update_active_campaign_fields(ac_id, active_campaign_api_url, active_campaign_api_token, updated_fields, new_fields)
+        def on_result(result):
+            # Log wat er gebeurd is
+            logging.info(f"Summary: {result['updated']} existing fields updated, {result['created']} new fields created")
             
-            return {
-                'status': 'success',
-                'message': f"Product velden bijgewerkt voor {email}",
-                'existing_fields_updated': len(updated_fields),
-                'new_fields_created': len(new_fields)
-            }
-        else:
-            return {
-                'status': 'info',
-                'message': f"Geen wijzigingen nodig voor {email} - alle waarden zijn al correct"
-            }
+            if result['updated'] > 0 or result['created'] > 0:
+                return {
+                    'status': 'success',
+                    'message': f"Product velden bijgewerkt voor {email}",
+                    'existing_fields_updated': result['updated'],
+                    'new_fields_created': result['created']
+                }
+            else:
+                return {
+                    'status': 'info',
+                    'message': f"Geen wijzigingen nodig voor {email} - alle waarden zijn al correct"
+                }
+        
+        return _after_write(future, on_result, 'update_active_campaign_product_fields')
     except Exception as e:
         logging.error(f"Fout in update_active_campaign_product_fields: {str(e)}")
         return {'status': 'error', 'message': str(e)}
@@ -235,15 +247,12 @@ def add_product_tag_ac(data):
             raise ValueError("Ontbrekende configuratie of email")
         
         # Haal Active Campaign ID op
-        ac_data = get_active_campaign_data(email, active_campaign_api_url, active_campaign_api_token)
-        if not ac_data.get('contacts'):
+        ac_id = get_active_campaign_contact_id(email, active_campaign_api_url, active_campaign_api_token)
+        if ac_id is None:
             logging.warning(f"Geen contact gevonden voor email: {email}")
             return {'status': 'error', 'message': 'Geen contact gevonden'}
             
-        ac_id = ac_data['contacts'][0]['id']
-        
         # Verwerk categorieën
-        categories = get_category_one_dict()
         category_list = []
         
         for item in data.get('line_items', []):
@@ -252,7 +261,7 @@ def add_product_tag_ac(data):
                 logging.warning("Product ID ontbreekt in line item")
                 continue
                 
-            category = get_key_from_product_id(product_id, categories)
+            category = get_product_info(product_id).category
             if category is not None:
                 category_list.append(category)
             else:
@@ -261,28 +270,27 @@ def add_product_tag_ac(data):
         # Verwerk categorieën
         processed_categories = _process_categories(category_list)
         
-        # Voeg tags toe
+        # Voeg tags toe, samen met andere wijzigingen voor dit contact
         desired_tags = _get_desired_tags()
-        added_tags = []
-        
-        for category in processed_categories:
-            if category in desired_tags:
-                tag_id = desired_tags[category]
-                try:
-                    add_tag_to_contact(
-                        [{"contact": ac_id, "tag": tag_id}],
-                        active_campaign_api_url,
-                        active_campaign_api_token
-                    )
-                    added_tags.append(category)
-                except Exception as e:
-                    logging.error(f"Fout bij toevoegen tag {category}: {str(e)}")
-        
-        return {
-            'status': 'success',
-            'message': f"Tags bijgewerkt voor {email}",
-            'added_tags': added_tags
-        }
+        tag_ids = {str(desired_tags[category]): category for category in processed_categories if category in desired_tags}
+        
+        if not tag_ids:
+            return {
+                'status': 'success',
+                'message': f"Tags bijgewerkt voor {email}",
+                'added_tags': []
+            }
+        
+        future = get_coalescer(active_campaign_api_url, active_campaign_api_token).submit(ac_id, tags=list(tag_ids))
+        
+        def on_result(result):
+            return {
+                'status': 'success',
+                'message': f"Tags bijgewerkt voor {email}",
+                'added_tags': [tag_ids[tag] for tag in result['tags'] if tag in tag_ids]
+            }
+        
+        return _after_write(future, on_result, 'add_product_tag_ac')
     except Exception as e:
         logging.error(f"Fout in add_product_tag_ac: {str(e)}")
         return {'status': 'error', 'message': str(e)}
@@ -312,61 +320,28 @@ def increase_ac_abo_field(data):
             raise ValueError("Geen email gevonden in data")
 
         # Active Campaign data ophalen
-        ac_data = get_active_campaign_data(email, ac_api_url, ac_api_token)
-        if not ac_data.get('contacts'):
+        ac_id = get_active_campaign_contact_id(email, ac_api_url, ac_api_token)
+        if ac_id is None:
             logging.warning(f"Geen contact gevonden voor email: {email}")
             return {'status': 'error', 'message': 'Geen contact gevonden'}
-            
-        ac_id = ac_data['contacts'][0]['id']
-
-        # Veld waarden ophalen
-        field_values = get_active_campaign_fields(ac_id, ac_api_url, ac_api_token)
-
-        # Huidige waarden ophalen
-        desired_field = 21
-        contact_id = None
-        current_abo_value = None
-        specific_abo_field_id = None
 
-        for item in field_values.get('fieldValues', []):
-            if int(item.get('field', 0)) == desired_field:
-                contact_id = item.get('contact')
-                current_abo_value = item.get('value')
-                specific_abo_field_id = item.get('id')
-                break
-
-        # Veilige conversie van current_abo_value
-        try:
-            current_abo_value = int(current_abo_value) if current_abo_value and current_abo_value.isdigit() else 0
-        except (ValueError, TypeError):
-            logging.warning(f"Ongeldige abo waarde gevonden: {current_abo_value}, reset naar 0")
-            current_abo_value = 0
-
-        new_abo_value = current_abo_value + 1
-
-        # Controleren of veld bestaat
-        if specific_abo_field_id:
-            # Veld bestaat al, update het
-            updated_field = {
-                "id": specific_abo_field_id,
-                "field": str(desired_field),
-                "value": str(new_abo_value)
-            }
-            update_active_campaign_fields(contact_id, ac_api_url, ac_api_token, updated_fields=[updated_field])
-        else:
-            # Veld bestaat niet, voeg het toe
-            new_field = {
-                "contact": ac_id,
-                "field": str(desired_field),
-                "value": '1'
+        # Abo veld ophogen; de coalescer leest de huidige waarde en schrijft
+        # samen met andere wijzigingen voor dit contact, zonder verloren updates
+        desired_field = '21'
+        if _already_applied('ac_abo_field'):
+            logging.info(f"Abo veld voor {email} is bij een eerdere poging van deze job al aangepast")
+            return {'status': 'success', 'message': f"Abonnements veld bijgewerkt voor {email} (al eerder verwerkt)"}
+        future = get_coalescer(ac_api_url, ac_api_token).submit(ac_id, deltas={desired_field: 1})
+        _mark_when_written(future, 'ac_abo_field')
+        
+        def on_result(result):
+            return {
+                'status': 'success',
+                'message': f"Abonnements veld bijgewerkt voor {email}",
+                'new_value': result['fields'][desired_field]
             }
-            update_active_campaign_fields(ac_id, ac_api_url, ac_api_token, new_fields=[new_field])
         
-        return {
-            'status': 'success',
-            'message': f"Abonnements veld bijgewerkt voor {email}",
-            'new_value': new_abo_value
-        }
+        return _after_write(future, on_result, 'update_ac_abo_field')
     except Exception as e:
         logging.error(f"Fout in update_ac_abo_field: {str(e)}")
         return {'status': 'error', 'message': str(e)}
@@ -396,61 +371,27 @@ def decrease_ac_abo_field(data):
             raise ValueError("Geen email gevonden in data")
 
         # Active Campaign data ophalen
-        ac_data = get_active_campaign_data(email, ac_api_url, ac_api_token)
-        if not ac_data.get('contacts'):
+        ac_id = get_active_campaign_contact_id(email, ac_api_url, ac_api_token)
+        if ac_id is None:
             logging.warning(f"Geen contact gevonden voor email: {email}")
             return {'status': 'error', 'message': 'Geen contact gevonden'}
-            
-        ac_id = ac_data['contacts'][0]['id']
-
-        # Veld waarden ophalen
-        field_values = get_active_campaign_fields(ac_id, ac_api_url, ac_api_token)
-
-        # Huidige waarden ophalen
-        desired_field = 21
-        contact_id = None
-        current_abo_value = None
-        specific_abo_field_id = None
 
-        for item in field_values.get('fieldValues', []):
-            if int(item.get('field', 0)) == desired_field:
-                contact_id = item.get('contact')
-                current_abo_value = item.get('value')
-                specific_abo_field_id = item.get('id')
-                break
-
-        # Veilige conversie van current_abo_value
-        try:
-            current_abo_value = int(current_abo_value) if current_abo_value and current_abo_value.isdigit() else 0
-        except (ValueError, TypeError):
-            logging.warning(f"Ongeldige abo waarde gevonden: {current_abo_value}, reset naar 0")
-            current_abo_value = 0
-
-        new_abo_value = max(0, current_abo_value - 1) # Verlaag met 1, maar niet lager dan 0
-
-        # Controleren of veld bestaat
-        if specific_abo_field_id:
-            # Veld bestaat al, update het
-            updated_field = {
-                "id": specific_abo_field_id,
-                "field": str(desired_field),
-                "value": str(new_abo_value)
-            }
-            update_active_campaign_fields(contact_id, ac_api_url, ac_api_token, updated_fields=[updated_field])
-        else:
-            # Veld bestaat niet, voeg het toe met waarde 0 (omdat we verlagen en het niet bestond)
-            new_field = {
-                "contact": ac_id,
-                "field": str(desired_field),
-                "value": '0' 
+        # Abo veld verlagen met 1, maar niet lager dan 0
+        desired_field = '21'
+        if _already_applied('ac_abo_field'):
+            logging.info(f"Abo veld voor {email} is bij een eerdere poging van deze job al aangepast")
+            return {'status': 'success', 'message': f"Abonnements veld verlaagd voor {email} (al eerder verwerkt)"}
+        future = get_coalescer(ac_api_url, ac_api_token).submit(ac_id, deltas={desired_field: -1}, floor=0)
+        _mark_when_written(future, 'ac_abo_field')
+        
+        def on_result(result):
+            return {
+                'status': 'success',
+                'message': f"Abonnements veld verlaagd voor {email}",
+                'new_value': result['fields'][desired_field]
             }
-            update_active_campaign_fields(ac_id, ac_api_url, ac_api_token, new_fields=[new_field])
         
-        return {
-            'status': 'success',
-            'message': f"Abonnements veld verlaagd voor {email}",
-            'new_value': new_abo_value
-        }
+        return _after_write(future, on_result, 'decrease_ac_abo_field')
     except Exception as e:
         logging.error(f"Fout in decrease_ac_abo_field: {str(e)}")
         return {'status': 'error', 'message': str(e)}
@@ -480,27 +421,27 @@ def add_ac_abo_tag(data):
             raise ValueError("Geen email gevonden in data")
 
         # Active Campaign data ophalen
-        ac_data = get_active_campaign_data(email, ac_api_url, ac_api_token)
-        if not ac_data.get('contacts'):
+        ac_id = get_active_campaign_contact_id(email, ac_api_url, ac_api_token)
+        if ac_id is None:
             logging.warning(f"Geen contact gevonden voor email: {email}")
             return {'status': 'error', 'message': 'Geen contact gevonden'}
-            
-        ac_id = ac_data['contacts'][0]['id']
 
         # Abonnements tag toevoegen
-        abo_tag_id = 115
-        tags = [{"contact": ac_id, "tag": abo_tag_id}]
-        try:
-            add_tag_to_contact(tags, ac_api_url, ac_api_token)
+        abo_tag_id = '115'
+        future = get_coalescer(ac_api_url, ac_api_token).submit(ac_id, tags=[abo_tag_id])
+        
+        def on_result(result):
+            if abo_tag_id in result['failed_tags']:
+                logging.error(f"Fout bij toevoegen abonnements tag: {result['failed_tags'][abo_tag_id]}")
+                return {'status': 'error', 'message': result['failed_tags'][abo_tag_id]}
             logging.info(f"Abonnements tag toegevoegd voor {email}")
-        except Exception as e:
-            logging.error(f"Fout bij toevoegen abonnements tag: {str(e)}")
-            return {'status': 'error', 'message': str(e)}
+            
+            return {
+                'status': 'success',
+                'message': f"Abonnements tag toegevoegd voor {email}"
+            }
         
-        return {
-            'status': 'success',
-            'message': f"Abonnements tag toegevoegd voor {email}"
-        }
+        return _after_write(future, on_result, 'add_ac_abo_tag')
     except Exception as e:
         logging.error(f"Fout in add_ac_abo_tag: {str(e)}")
         return {'status': 'error', 'message': str(e)}
@@ -9,13 +9,21 @@ from active_campaign.functions import (
 from woocommerce_.functions import (
     move_next_payment_date
 )
+from active_campaign.client import get_cache_stats as get_ac_cache_stats
+from active_campaign.coalescer import get_coalescer_stats
 from facebook.functions import add_new_customers_to_facebook_audience
+from facebook.uploader import get_uploader_stats
 from scripts.catalog_generator import main as generate_catalog_main 
+from utils.products import reload_catalogue, start_catalogue_watcher
 from apscheduler.schedulers.background import BackgroundScheduler
 from utils.route_initializer import RouteConfig, initialize_route
+from utils.job_worker import get_worker_pool
+from utils.delivery_store import get_delivery_store
 from utils.env_tool import env_check
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+import signal
+import sys
 import os
 
 # Laad environment variabelen uit .env bestand
@@ -118,18 +126,55 @@ def process_move_next_payment_date():
 def process_facebook_audience_update():
     pass
 
+@app.route('/queue/metrics', methods=['GET'])
+def queue_metrics():
+    metrics = get_worker_pool().metrics()
+    metrics["deliveries"] = get_delivery_store().metrics()
+    return jsonify(metrics)
+
+@app.route('/active_campaign/cache_stats', methods=['GET'])
+def active_campaign_cache_stats():
+    # Hits per cache zijn bespaarde Active Campaign requests
+    return jsonify({
+        "clients": get_ac_cache_stats(),
+        "coalescers": get_coalescer_stats()
+    })
+
+@app.route('/facebook/audience_stats', methods=['GET'])
+def facebook_audience_stats():
+    # Aantal klanten per add_users call laat zien hoe goed het batchen werkt
+    return jsonify(get_uploader_stats() or {})
+
 def run_catalog_generation_job():
     try:
         generate_catalog_main()
+        # Nieuwe catalogus direct actief maken, niet pas bij de volgende controle
+        reload_catalogue()
     except Exception as e:
         print(f"APScheduler: Error during product catalog generation job: {e}") 
 
+def handle_sigterm(signum, frame):
+    # systemd stopt met SIGTERM; eerst geen nieuwe jobs meer claimen en wachten tot
+    # lopende jobs (ook die op de coalescer of een Facebook batch wachten) klaar zijn,
+    # zodat ze na de herstart niet opnieuw naar Active Campaign gaan
+    get_worker_pool().stop(timeout=float(os.getenv('WEBHOOK_SHUTDOWN_TIMEOUT', '60')))
+    # Via sys.exit draaien de atexit handlers zodat gebufferde logregels nog worden weggeschreven
+    sys.exit(0)
+
 if __name__ == '__main__':
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    
     scheduler = BackgroundScheduler(daemon=True)
     scheduler.add_job(run_catalog_generation_job, 'interval', minutes=1440, id="catalog_generator_job")
     scheduler.start()
     print("APScheduler started. Catalog generation job scheduled every day at 03:00.")
     
+    # Controleert periodiek of de product catalogus op schijf gewijzigd is
+    start_catalogue_watcher()
+    
+    # Workers die de webhook jobs uit de queue verwerken
+    get_worker_pool().start()
+    
     # Disable reloader voor tests om duplicatie te voorkomen
     use_reloader = False  # app.debug 
     app.run(debug=False, port=8443, use_reloader=use_reloader)
\ No newline at end of file
@@ -0,0 +1,249 @@
+from facebook_business.adobjects.customaudience import CustomAudience
+from facebook_business.api import FacebookAdsApi
+from facebook_business.exceptions import FacebookRequestError
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+import threading
+import hashlib
+import logging
+import atexit
+import random
+import json
+import time
+import os
+
+# Schema voor de gehashte data, in dezelfde volgorde als hash_user
+SCHEMA = ["EMAIL", "PHONE", "FN", "LN", "CT", "ST", "ZIP", "COUNTRY"]
+
+# Maximaal aantal gebruikers per add_users call en hoe lang een batch verzameld wordt
+DEFAULT_BATCH_SIZE = int(os.getenv('FACEBOOK_BATCH_SIZE', '500'))
+DEFAULT_WINDOW = float(os.getenv('FACEBOOK_BATCH_WINDOW', '10'))
+MAX_ATTEMPTS = 4
+
+
+def normalize_and_hash(value):
+    """Normaliseer (trim, lowercase) en hash een waarde met SHA256."""
+    if value:
+        value = value.strip().lower()
+    else:
+        value = ''
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+def hash_user(billing_info) -> Tuple[str, ...]:
+    """Gehashte gebruiker volgens SCHEMA uit de WooCommerce billing gegevens."""
+    return tuple(normalize_and_hash(billing_info.get(key)) for key in (
+        'email', 'phone', 'first_name', 'last_name', 'city', 'state', 'postcode', 'country'
+    ))
+
+
+def describe_error(e: FacebookRequestError):
+    """Leesbare foutmelding; token fouten worden apart benoemd."""
+    try:
+        error_data = e.api_error_message()
+        if isinstance(error_data, dict):
+            error_type = error_data.get('error', {}).get('type', '')
+            error_code = error_data.get('error', {}).get('code', 0)
+            error_subcode = error_data.get('error', {}).get('error_subcode', 0)
+
+            # Check voor token-gerelateerde fouten
+            if error_type == 'OAuthException' and error_code == 190:
+                if error_subcode == 460:
+                    return "Facebook access token is verlopen of ongeldig. Token moet vernieuwd worden."
+                return f"Facebook authenticatie fout (code {error_code}, subcode {error_subcode}): {error_data.get('error', {}).get('message', '')}"
+            return f"Facebook API fout: {error_data.get('error', {}).get('message', str(e))}"
+    except Exception:
+        pass
+    return f"Facebook API fout: {str(e)}"
+
+
+def _is_token_error(e):
+    try:
+        return e.api_error_code() == 190
+    except Exception:
+        return False
+
+
+class TokenFile:
+    """Long term token uit het tokens bestand; wordt alleen opnieuw gelezen als het bestand wijzigt."""
+    def __init__(self, path):
+        self.path = path
+        self._stat = None
+        self._token = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                raise ValueError(f"Tokens bestand niet gevonden op: {self.path}")
+            file_stat = (stat.st_mtime_ns, stat.st_size)
+            if file_stat != self._stat:
+                try:
+                    with open(self.path, 'r') as f:
+                        tokens = json.load(f)
+                except json.JSONDecodeError:
+                    raise ValueError(f"Ongeldig JSON formaat in tokens bestand: {self.path}")
+                token = tokens.get('facebook_long_term_access_token')
+                if not token:
+                    raise ValueError("Geen Facebook token gevonden in tokens.json")
+                self._token = token
+                self._stat = file_stat
+            return self._token
+
+
+class AudienceUploader:
+    """
+    Verzamelt gehashte gebruikers en voegt ze in batches toe aan een Custom Audience.
+
+    Een batch wordt verstuurd zodra hij ``batch_size`` gebruikers bevat of
+    ``window`` seconden na de eerste gebruiker, met één add_users call. Mislukte
+    calls worden met exponentiële backoff opnieuw geprobeerd, behalve bij een
+    ongeldig token. De Facebook API wordt alleen opnieuw geïnitialiseerd als
+    het token in het tokens bestand verandert.
+    """
+    def __init__(self, custom_audience_id, app_id, app_secret, tokens_path,
+                 batch_size=DEFAULT_BATCH_SIZE, window=DEFAULT_WINDOW):
+        self.custom_audience_id = custom_audience_id
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.tokens = TokenFile(tokens_path)
+        self.batch_size = max(1, min(batch_size, 10000))
+        self.window = window
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._batch: List[Tuple[str, ...]] = []
+        self._futures: List[Future] = []
+        self._timer: Optional[threading.Timer] = None
+        self._api = None
+        self._api_token = None
+        self.submitted = 0
+        self.uploaded = 0
+        self.calls = 0
+        self.failed = 0
+        atexit.register(self.flush)
+
+    def submit(self, hashed_user) -> Future:
+        """Zet een gehashte gebruiker in de batch; de Future geeft het resultaat van de upload."""
+        future = Future()
+        full = False
+        with self._lock:
+            self._batch.append(tuple(hashed_user))
+            self._futures.append(future)
+            self.submitted += 1
+            if len(self._batch) >= self.batch_size:
+                full = True
+            elif self._timer is None:
+                self._start_timer()
+        if full:
+            # Niet op de webhook thread versturen
+            threading.Thread(target=self.flush, args=(True,), name="facebook-audience-flush", daemon=True).start()
+        return future
+
+    def _start_timer(self):
+        self._timer = threading.Timer(self.window, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _take_batch(self, full_only):
+        with self._lock:
+            if full_only and len(self._batch) < self.batch_size:
+                return [], []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            users, futures = self._batch[:self.batch_size], self._futures[:self.batch_size]
+            del self._batch[:self.batch_size]
+            del self._futures[:self.batch_size]
+            if self._batch:
+                # De rest wacht op de volgende volle batch of het tijdvenster
+                self._start_timer()
+            return users, futures
+
+    def flush(self, full_only=False):
+        """Verstuur wat klaarstaat in batches van maximaal batch_size; met full_only alleen volle batches."""
+        with self._flush_lock:
+            while True:
+                users, futures = self._take_batch(full_only)
+                if not users:
+                    return
+                try:
+                    result = self._upload(users)
+                except Exception as e:
+                    self.failed += len(users)
+                    logging.error(f"Toevoegen van {len(users)} gebruikers aan Facebook audience mislukt: {e}")
+                    for future in futures:
+                        future.set_exception(e)
+                else:
+                    for future in futures:
+                        future.set_result(result)
+
+    def _get_api(self):
+        token = self.tokens.get()
+        if self._api is None or token != self._api_token:
+            self._api = FacebookAdsApi.init(app_id=self.app_id, app_secret=self.app_secret, access_token=token)
+            self._api_token = token
+            logging.info("Initialisatie Facebook API geslaagd")
+        return self._api
+
+    def _upload(self, users):
+        # Dezelfde klant kan binnen een batch meerdere keren bestellen
+        unique_users = [list(user) for user in dict.fromkeys(users)]
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                custom_audience = CustomAudience(self.custom_audience_id, api=self._get_api())
+                self.calls += 1
+                response = custom_audience.add_users(schema=SCHEMA, users=unique_users, is_raw=True)
+                self.uploaded += len(unique_users)
+                logging.info(f"{len(unique_users)} gebruikers toegevoegd aan Facebook Custom Audience in één call")
+                return {'users': len(unique_users), 'response': getattr(response, '_json', None)}
+            except FacebookRequestError as e:
+                msg = describe_error(e)
+                if _is_token_error(e) or attempt == MAX_ATTEMPTS:
+                    raise Exception(msg)
+                error = msg
+            except ValueError:
+                # Configuratie van het tokens bestand; opnieuw proberen helpt niet
+                raise
+            except Exception as e:
+                if attempt == MAX_ATTEMPTS:
+                    raise
+                error = str(e)
+            delay = min(2 ** attempt + random.uniform(0, 1), 60)
+            logging.warning(f"Poging {attempt}/{MAX_ATTEMPTS} voor Facebook audience batch mislukt, opnieuw over {delay:.1f} seconden: {error}")
+            time.sleep(delay)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'uploaded': self.uploaded,
+                'calls': self.calls,
+                'failed': self.failed,
+                'pending': len(self._batch)
+            }
+
+
+_uploader = None
+_uploader_lock = threading.Lock()
+
+
+def get_uploader() -> AudienceUploader:
+    """Gedeelde uploader op basis van de Facebook environment variabelen."""
+    global _uploader
+    tokens_path = os.getenv('FACEBOOK_TOKENS_PATH')
+    custom_audience_id = os.getenv('FACEBOOK_CUSTOM_AUDIENCE_ID')
+    app_secret = os.getenv('FACEBOOK_APP_SECRET')
+    app_id = os.getenv('FACEBOOK_APP_ID')
+    if not all([tokens_path, custom_audience_id, app_secret, app_id]):
+        raise ValueError("Facebook configuratie is incompleet. Controleer de environment variables.")
+    with _uploader_lock:
+        if _uploader is None:
+            _uploader = AudienceUploader(custom_audience_id, app_id, app_secret, tokens_path)
+        return _uploader
+
+
+def get_uploader_stats():
+    with _uploader_lock:
+        return _uploader.stats() if _uploader is not None else None
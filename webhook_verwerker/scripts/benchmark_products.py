@@ -0,0 +1,134 @@
+"""
+Micro-benchmark van de product lookups per line item.
+
+Vergelijkt de oude aanpak (lineair zoeken in de categorie lijsten en
+any(keyword in sku ...) loops) met de product index en de gecompileerde
+keyword matchers uit utils/products.py, over een synthetische catalogus en
+order stroom. Controleert ook dat beide dezelfde uitkomsten geven.
+
+    python -m scripts.benchmark_products --products 2000 --line-items 200000
+"""
+from utils.products import (
+    BASE_UNIT_VALUES, CATEGORIES, DISCOUNT_KEYWORDS, SKU_CATEGORIES,
+    build_product_index, determine_base_product
+)
+import argparse
+import logging
+import random
+import time
+
+
+# Oude implementaties, alleen ter vergelijking
+
+def legacy_build_dict_from_categories(categories, product_catalogue):
+    result = {category: [] for category in categories}
+    for sku, product_id in product_catalogue.items():
+        for category, keywords in categories.items():
+            if any(keyword in sku for keyword in keywords):
+                result[category].append(product_id)
+                break
+    return result
+
+def legacy_get_key_from_product_id(product_id, category_dict):
+    product_id = int(product_id)
+    for key, product_ids in category_dict.items():
+        if product_id in product_ids:
+            return key
+    return None
+
+def legacy_determine_base_product(sku):
+    sku = sku.upper()
+    for name, key in [('Starter', 'S'), ('Probiotica', 'P28'), ('Waterkefir', 'W4'), ('Kombucha', 'K4'),
+                      ('Mix Originals', 'M4'), ('Gember', 'G12'), ('Citroen', 'C12'), ('Bloem', 'B12'),
+                      ('Frisdrank Mix', 'F12')]:
+        if any(substring in sku for substring in SKU_CATEGORIES[key]):
+            return name
+    return 'unknown'
+
+def legacy_base_value(sku_category):
+    if sku_category:
+        for base_unit, skus in BASE_UNIT_VALUES.items():
+            if sku_category in skus:
+                return float(base_unit)
+    return 0.0
+
+
+def synthetic_catalogue(count, seed):
+    """SKUs opgebouwd uit de echte keywords, plus ruis, met unieke product IDs."""
+    rng = random.Random(seed)
+    keywords = [k for keywords in list(SKU_CATEGORIES.values()) + list(CATEGORIES.values()) for k in keywords]
+    keywords += DISCOUNT_KEYWORDS + ['BUNDEL', 'PROEF', 'GIFT']
+    catalogue = {}
+    product_id = 100000
+    while len(catalogue) < count:
+        sku = f"{rng.choice(['', 'a', 'x'])}{rng.choice(keywords)}{rng.choice(['', '-', '_'])}{rng.choice(['', 'ACTIE', 'X2', 'XL', str(rng.randint(1, 99))])}"
+        if sku not in catalogue:
+            catalogue[sku] = product_id
+            product_id += rng.randint(1, 5)
+    return catalogue
+
+
+def legacy_line_item(product_id, sku, dicts):
+    sku_category = legacy_get_key_from_product_id(product_id, dicts['sku'])
+    return (
+        sku_category,
+        legacy_get_key_from_product_id(product_id, dicts['discount']),
+        legacy_get_key_from_product_id(product_id, dicts['category']),
+        legacy_base_value(sku_category),
+        legacy_determine_base_product(sku)
+    )
+
+
+def indexed_line_item(product_id, sku, index):
+    info = index.get(product_id)
+    return (
+        info.sku_category if info else None,
+        info.discount if info else None,
+        info.category if info else None,
+        info.base_value if info else 0.0,
+        determine_base_product(sku)
+    )
+
+
+def run(products, line_items, seed):
+    catalogue = synthetic_catalogue(products, seed)
+    rng = random.Random(seed + 1)
+    skus = list(catalogue)
+    stream = [(catalogue[sku], sku) for sku in (rng.choice(skus) for _ in range(line_items))]
+
+    start = time.perf_counter()
+    dicts = {
+        'sku': legacy_build_dict_from_categories(SKU_CATEGORIES, catalogue),
+        'category': legacy_build_dict_from_categories(CATEGORIES, catalogue),
+        'discount': {'Discount': [pid for sku, pid in catalogue.items() if any(k in sku for k in DISCOUNT_KEYWORDS)]},
+    }
+    legacy_build = time.perf_counter() - start
+    start = time.perf_counter()
+    legacy = [legacy_line_item(product_id, sku, dicts) for product_id, sku in stream]
+    legacy_lookup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = build_product_index(catalogue)
+    index_build = time.perf_counter() - start
+    determine_base_product.cache_clear()
+    start = time.perf_counter()
+    indexed = [indexed_line_item(product_id, sku, index) for product_id, sku in stream]
+    index_lookup = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(legacy, indexed) if a != b)
+    logging.info(f"Catalogus: {len(catalogue)} SKUs, order stroom: {len(stream)} line items")
+    logging.info(f"Oud:   opbouw {legacy_build * 1000:.1f} ms, lookups {legacy_lookup:.3f} s ({len(stream) / legacy_lookup:,.0f} items/s)")
+    logging.info(f"Index: opbouw {index_build * 1000:.1f} ms, lookups {index_lookup:.3f} s ({len(stream) / index_lookup:,.0f} items/s)")
+    logging.info(f"Versnelling lookups: {legacy_lookup / index_lookup:.1f}x, afwijkende uitkomsten: {mismatches}")
+    return mismatches
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Benchmark van de product lookups per line item")
+    parser.add_argument('--products', type=int, default=2000, help="Aantal SKUs in de synthetische catalogus (standaard: 2000)")
+    parser.add_argument('--line-items', type=int, default=200000, help="Aantal line items in de order stroom (standaard: 200000)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    if run(args.products, args.line_items, args.seed):
+        raise SystemExit(1)
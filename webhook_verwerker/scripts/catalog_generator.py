@@ -1,10 +1,35 @@
 from dotenv import load_dotenv
 from woocommerce import API
+import tempfile
 import logging
 import time
 import json
 import os
 
+def write_catalogue_atomic(product_catalogue, file_path):
+    """
+    Schrijf naar een tijdelijk bestand in dezelfde map en vervang daarna het
+    origineel met os.replace, zodat lezers nooit een half geschreven catalogus zien.
+    """
+    directory = os.path.dirname(file_path)
+    # mkstemp maakt het bestand aan als 0600; de catalogus houdt de rechten van het origineel
+    try:
+        mode = os.stat(file_path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+    fd, tmp_path = tempfile.mkstemp(prefix='.product_catalog.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as json_file:
+            json.dump(product_catalogue, json_file, indent=4)
+            json_file.flush()
+            os.fsync(json_file.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, file_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
 def main():
     # Basis logging configuratie
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -49,7 +74,9 @@ def main():
             # Response controleren
             if response.status_code != 200:
                 logging.error(f"Fout bij het ophalen van producten pagina {page}: {response.status_code} - {response.text}")
-                break
+                # Een onvolledige catalogus niet over de bestaande heen schrijven
+                logging.error("Catalogus niet bijgewerkt, de bestaande versie blijft in gebruik.")
+                return
             else:
                 page_products = response.json()
                 
@@ -80,8 +107,7 @@ def main():
         file_path = os.path.join(current_script_dir, '..', 'data', 'product_catalog.json')
         file_path = os.path.normpath(file_path)
 
-        with open(file_path, 'w') as json_file:
-            json.dump(product_catalogue, json_file, indent=4)
+        write_catalogue_atomic(product_catalogue, file_path)
         logging.info(f"Product catalogus succesvol opgeslagen in: {file_path}")
 
     except Exception as e:
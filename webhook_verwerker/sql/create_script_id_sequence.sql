@@ -0,0 +1,11 @@
+-- Sequence voor [Script_ID] in [dbo].[Logboek], gedeeld door de webhook verwerker
+-- en de batch scripts (invoicing, order_correction, subscription_correction, webhook_monitor).
+-- Vervangt MAX(Script_ID) + 1 met een TABLOCKX, zodat gelijktijdige scripts niet meer op elkaar wachten.
+-- Start boven het huidige hoogste Script_ID zodat bestaande logs niet botsen.
+IF OBJECT_ID(N'[dbo].[Script_ID_Seq]', N'SO') IS NULL
+BEGIN
+    DECLARE @start BIGINT = (SELECT ISNULL(MAX([Script_ID]), 0) + 1 FROM [dbo].[Logboek]);
+    DECLARE @sql NVARCHAR(400) = N'CREATE SEQUENCE [dbo].[Script_ID_Seq] AS INT START WITH '
+        + CAST(@start AS NVARCHAR(20)) + N' INCREMENT BY 1 CACHE 50;';
+    EXEC sp_executesql @sql;
+END;
@@ -8,6 +8,18 @@ from typing import Dict, List, Optional, Any
 import pyodbc
 from dataclasses import dataclass
 
+from utils.log_sink import log_sink, target_name
+
+
+WEBHOOK_LOG_COLUMNS = [
+    "Route", "Source", "ScriptName", "Status", "Message",
+    "ProcessingTimeMs", "RequestID", "RetryCount",
+    "BillingEmail", "BillingFirstName", "BillingLastName",
+    "CustomerID", "OrderID", "SubscriptionID", "ProductIDs", "ProductNames",
+    "OrderTotal", "Currency", "PaymentMethod",
+    "ErrorType", "ErrorDetails", "Environment",
+]
+
 
 @dataclass
 class AzureSQLConfig:
@@ -36,15 +48,18 @@ def get_config_from_env() -> AzureSQLConfig:
         raise ValueError(f"Ontbrekende Azure SQL environment variable: {exc.args[0]}")
 
 
-def connect_azuresql(cfg: AzureSQLConfig) -> pyodbc.Connection:
-    """Maak verbinding met Azure SQL Database."""
-    conn_str = (
+def build_connection_string(cfg: AzureSQLConfig) -> str:
+    return (
         f"DRIVER={{{cfg.driver}}};SERVER={cfg.server};DATABASE={cfg.database};"
         f"UID={cfg.username};PWD={cfg.password};"
         f"Encrypt={cfg.encrypt};TrustServerCertificate={cfg.trust_server_certificate};"
         f"Connection Timeout=30;"
     )
-    return pyodbc.connect(conn_str)
+
+
+def connect_azuresql(cfg: AzureSQLConfig) -> pyodbc.Connection:
+    """Maak verbinding met Azure SQL Database."""
+    return pyodbc.connect(build_connection_string(cfg))
 
 
 def extract_webhook_data(payload: Dict[str, Any]) -> Dict[str, Any]:
@@ -128,6 +143,8 @@ def log_to_azure_sql(
     """
     Log webhook verwerking naar Azure SQL Database.
     
+    De rij wordt via de gebufferde log sink weggeschreven, niet op de request thread.
+    
     Args:
         route: De webhook route (bijv. '/woocommerce/add_ac_product_tag')
         source: De bron van de webhook (bijv. 'WooCommerce', 'Active Campaign')
@@ -166,47 +183,36 @@ def log_to_azure_sql(
         # Environment
         environment = os.getenv('ENVIRONMENT', 'development')
         
-        # Maak verbinding en insert log
-        with connect_azuresql(cfg) as conn:
-            with conn.cursor() as cursor:
-                sql = """
-                INSERT INTO [dbo].[WebhookLogs] (
-                    [Route], [Source], [ScriptName], [Status], [Message],
-                    [ProcessingTimeMs], [RequestID], [RetryCount],
-                    [BillingEmail], [BillingFirstName], [BillingLastName],
-                    [CustomerID], [OrderID], [SubscriptionID], [ProductIDs], [ProductNames],
-                    [OrderTotal], [Currency], [PaymentMethod],
-                    [ErrorType], [ErrorDetails], [Environment]
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """
-                
-                cursor.execute(sql, (
-                    route,
-                    source,
-                    script_name,
-                    status,
-                    message,
-                    processing_time_ms,
-                    request_id,
-                    retry_count,
-                    webhook_data.get('billing_email'),
-                    webhook_data.get('billing_first_name'),
-                    webhook_data.get('billing_last_name'),
-                    webhook_data.get('customer_id'),
-                    webhook_data.get('order_id'),
-                    webhook_data.get('subscription_id'),
-                    webhook_data.get('product_ids'),
-                    webhook_data.get('product_names'),
-                    webhook_data.get('order_total'),
-                    webhook_data.get('currency'),
-                    webhook_data.get('payment_method'),
-                    error_type,
-                    error_details_json,
-                    environment
-                ))
-                conn.commit()
+        # Zet de rij in de log sink; die schrijft in batches over één connectie
+        conn_str = build_connection_string(cfg)
+        target = target_name("webhook_logs", conn_str)
+        log_sink.register(target, conn_str, "[dbo].[WebhookLogs]", WEBHOOK_LOG_COLUMNS)
+        log_sink.write(target, (
+            route,
+            source,
+            script_name,
+            status,
+            message,
+            processing_time_ms,
+            request_id,
+            retry_count,
+            webhook_data.get('billing_email'),
+            webhook_data.get('billing_first_name'),
+            webhook_data.get('billing_last_name'),
+            webhook_data.get('customer_id'),
+            webhook_data.get('order_id'),
+            webhook_data.get('subscription_id'),
+            webhook_data.get('product_ids'),
+            webhook_data.get('product_names'),
+            webhook_data.get('order_total'),
+            webhook_data.get('currency'),
+            webhook_data.get('payment_method'),
+            error_type,
+            error_details_json,
+            environment
+        ))
         
-        logging.debug(f"Webhook log geschreven naar Azure SQL voor route {route}")
+        logging.debug(f"Webhook log in de wachtrij gezet voor route {route}")
         
     except Exception as e:
         logging.error(f"Fout bij loggen naar Azure SQL: {str(e)}")
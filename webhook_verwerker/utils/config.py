@@ -1,10 +1,60 @@
+import threading
 import pyodbc
-import time
 import logging
+import os
+
+# Gedeelde sequence voor Script_ID, zie sql/create_script_id_sequence.sql
+SCRIPT_ID_SEQUENCE = "dbo.Script_ID_Seq"
+
+
+class ScriptIdAllocator:
+    """
+    Deelt script IDs uit uit blokken die in één keer uit de SQL sequence gereserveerd worden.
+    
+    Alleen als een blok op is gaat er een round trip naar de database
+    (sp_sequence_get_range); er is geen table lock meer op [dbo].[Logboek], dus
+    gelijktijdige webhooks wachten niet op elkaar. Niet uitgedeelde IDs van een
+    blok vervallen bij een herstart; IDs zijn uniek, maar niet gegarandeerd aaneengesloten.
+    """
+    def __init__(self, block_size=20):
+        self.block_size = max(1, block_size)
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def next_id(self, connection_string):
+        with self._lock:
+            if self._next >= self._end:
+                self._next = self._reserve(connection_string)
+                self._end = self._next + self.block_size
+            script_id = self._next
+            self._next += 1
+            return script_id
+
+    def _reserve(self, connection_string):
+        with pyodbc.connect(connection_string) as conn:
+            cur = conn.cursor()
+            cur.execute(f"""
+                SET NOCOUNT ON;
+                DECLARE @eerste SQL_VARIANT;
+                EXEC sys.sp_sequence_get_range
+                    @sequence_name = N'{SCRIPT_ID_SEQUENCE}',
+                    @range_size = ?,
+                    @range_first_value = @eerste OUTPUT;
+                SELECT CAST(@eerste AS INT);
+            """, self.block_size)
+            eerste = cur.fetchone()[0]
+            conn.commit()
+        logging.info(f"Script IDs {eerste} t/m {eerste + self.block_size - 1} gereserveerd")
+        return eerste
+
+
+script_id_allocator = ScriptIdAllocator(block_size=int(os.getenv('SCRIPT_ID_BLOCK_SIZE', '20')))
+
 
 def get_and_use_next_script_id(connection_string, bron, script_naam):
     """
-    Claimt een nieuw script_id door direct een log entry te maken.
+    Claimt een nieuw script_id uit de gedeelde sequence en maakt direct een log entry.
     
     Args:
         connection_string: Database connectie string
@@ -14,36 +64,21 @@ def get_and_use_next_script_id(connection_string, bron, script_naam):
     Returns:
         Een nieuw uniek script ID
     """
+    try:
+        volgend_id = script_id_allocator.next_id(connection_string)
+    except Exception as e:
+        logging.error(f"Fout bij genereren script ID: {str(e)}")
+        raise
+
     with pyodbc.connect(connection_string) as conn:
         with conn.cursor() as cur:
-            # Lock nemen
-            cur.execute("SELECT TOP 1 1 FROM [dbo].[Logboek] WITH (TABLOCKX)")
-            
-            try:
-                # Hoogste ID ophalen
-                cur.execute("""
-                    SELECT ISNULL(MAX(Script_ID), 0)
-                    FROM [dbo].[Logboek]
-                    WHERE Script_ID IS NOT NULL
-                """)
-                hoogste_id = cur.fetchone()[0]
-                volgend_id = hoogste_id + 1
-                
-                # Direct gebruiken in nieuwe log entry
-                cur.execute("""
-                    INSERT INTO [dbo].[Logboek] 
-                    (Niveau, Bericht, Datumtijd, Klant, Bron, Script, Script_ID)
-                    VALUES 
-                    ('INFO', 'Script gestart', GETDATE(), 'Aard''g', ?, ?, ?)
-                """, (bron, script_naam, volgend_id))
-                
-                conn.commit()
-                time.sleep(0.1)  # Kleine pauze
-                
-                return volgend_id
-                
-            except Exception as e:
-                logging.error(f"Fout bij genereren script ID: {str(e)}")
-                raise
-            finally:
-                conn.commit()  # Release the lock
\ No newline at end of file
+            # Startregel voor dit script_id; het ID is al uniek, dus geen lock nodig
+            cur.execute("""
+                INSERT INTO [dbo].[Logboek] 
+                (Niveau, Bericht, Datumtijd, Klant, Bron, Script, Script_ID)
+                VALUES 
+                ('INFO', 'Script gestart', GETDATE(), 'Aard''g', ?, ?, ?)
+            """, (bron, script_naam, volgend_id))
+            conn.commit()
+
+    return volgend_id
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "webhook_deliveries.db")
+
+# WooCommerce probeert een mislukte aflevering over een paar uur opnieuw; ruim daarboven
+DEFAULT_TTL = float(os.getenv("WEBHOOK_DEDUP_TTL", str(48 * 3600)))
+
+# Na zoveel nieuwe afleveringen worden verlopen keys opgeruimd
+PURGE_EVERY = 1000
+
+
+def delivery_key(kind: str, headers, body: bytes, data: Any = None) -> str:
+    """
+    Idempotency key voor een webhook aflevering op een route.
+
+    Topic, resource ID en een hash van de payload. De X-WC-Webhook-Delivery-ID
+    is hier niet bruikbaar: WooCommerce maakt voor elke aflevering een nieuwe
+    aan, ook als dezelfde gebeurtenis opnieuw wordt afgeleverd. De route
+    (``kind``) hoort bij de key, zodat dezelfde order op verschillende routes
+    gewoon verwerkt wordt.
+    """
+    topic = headers.get("X-WC-Webhook-Topic", "")
+    resource_id = data.get("id", "") if isinstance(data, dict) else ""
+    if data is not None:
+        body = json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+    return f"{kind}:{topic}:{resource_id}:{hashlib.sha256(body or b'').hexdigest()}"
+
+
+class DeliveryStore:
+    """
+    Lokale SQLite (WAL) opslag van afgeleverde webhooks, met verlooptijd per key.
+
+    ``claim`` markeert een key atomair als ontvangen en geeft False terug als
+    dezelfde aflevering binnen de TTL al eerder binnenkwam. Wordt een webhook
+    uiteindelijk niet aangenomen, dan geeft ``release`` de key weer vrij zodat
+    een nieuwe aflevering verwerkt kan worden.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = DEFAULT_TTL):
+        self.path = path or os.getenv("WEBHOOK_DEDUP_PATH", DEFAULT_STORE_PATH)
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.received = 0
+        self.duplicates: Dict[str, int] = {}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._init_db()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Eén connectie per thread; SQLite connecties zijn niet thread-safe te delen
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS deliveries (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                duplicates INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_deliveries_expires ON deliveries (expires_at)")
+        # Delivery ID van de eerste aflevering, alleen ter informatie
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(deliveries)")}
+        if "delivery_id" not in columns:
+            conn.execute("ALTER TABLE deliveries ADD COLUMN delivery_id TEXT")
+
+    def claim(self, key: str, kind: str, delivery_id: Optional[str] = None) -> bool:
+        """True als dit de eerste aflevering is (binnen de TTL), anders False."""
+        conn = self._connection()
+        now = time.time()
+        # Een verlopen key telt als nieuw en krijgt een verse verlooptijd
+        cursor = conn.execute(
+            """INSERT INTO deliveries (key, kind, first_seen, expires_at, delivery_id) VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(key) DO UPDATE SET first_seen = excluded.first_seen,
+                   expires_at = excluded.expires_at, duplicates = 0, delivery_id = excluded.delivery_id
+               WHERE deliveries.expires_at <= ?""",
+            (key, kind, now, now + self.ttl, delivery_id, now),
+        )
+        is_new = cursor.rowcount == 1
+        with self._lock:
+            self.received += 1
+            if not is_new:
+                self.duplicates[kind] = self.duplicates.get(kind, 0) + 1
+            purge = is_new and self.received % PURGE_EVERY == 0
+        if not is_new:
+            conn.execute("UPDATE deliveries SET duplicates = duplicates + 1 WHERE key = ?", (key,))
+        if purge:
+            self.purge_expired()
+        return is_new
+
+    def release(self, key: str):
+        """Geef een key vrij, bijv. als de webhook niet in de queue gezet kon worden."""
+        self._connection().execute("DELETE FROM deliveries WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        cursor = self._connection().execute("DELETE FROM deliveries WHERE expires_at <= ?", (time.time(),))
+        if cursor.rowcount:
+            logging.info(f"{cursor.rowcount} verlopen webhook afleveringen opgeruimd")
+        return cursor.rowcount
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            received = self.received
+            duplicates = dict(self.duplicates)
+        total_duplicates = sum(duplicates.values())
+        return {
+            "received": received,
+            "duplicates": total_duplicates,
+            "duplicate_rate": round(total_duplicates / received, 4) if received else 0.0,
+            "duplicates_per_route": duplicates,
+        }
+
+
+_delivery_store = None
+_delivery_store_lock = threading.Lock()
+
+
+def get_delivery_store() -> DeliveryStore:
+    global _delivery_store
+    with _delivery_store_lock:
+        if _delivery_store is None:
+            _delivery_store = DeliveryStore()
+        return _delivery_store
@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "webhook_queue.db")
+
+
+@dataclass
+class Job:
+    id: int
+    kind: str
+    route: str
+    payload: Any
+    attempts: int
+    script_id: Optional[int]
+    created_at: float
+
+
+class JobQueue:
+    """
+    Duurzame lokale job queue in SQLite (WAL mode).
+
+    Een webhook wordt als job opgeslagen voordat de route 202 teruggeeft; workers
+    claimen jobs per soort (de route functie). Een job die 'running' stond toen
+    het proces stopte wordt bij de start weer op 'pending' gezet, zodat niets
+    verloren gaat (at-least-once).
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("WEBHOOK_QUEUE_PATH", DEFAULT_QUEUE_PATH)
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._init_db()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Eén connectie per thread; SQLite connecties zijn niet thread-safe te delen
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                route TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                script_id INTEGER,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                available_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_available ON jobs (status, available_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_kind_status ON jobs (kind, status)")
+        # Markeringen voor niet-idempotente stappen die al uitgevoerd zijn (bijv. een teller ophogen)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_markers (
+                job_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (job_id, name)
+            )
+        """)
+
+    def enqueue(self, kind: str, route: str, payload: Any) -> int:
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO jobs (kind, route, payload, created_at, available_at) VALUES (?, ?, ?, ?, ?)",
+            (kind, route, json.dumps(payload), now, now),
+        )
+        return cursor.lastrowid
+
+    def claim(self, kinds: List[str]) -> Optional[Job]:
+        """Claim de oudste beschikbare job van een van de opgegeven soorten."""
+        if not kinds:
+            return None
+        conn = self._connection()
+        now = time.time()
+        placeholders = ",".join("?" for _ in kinds)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                f"""SELECT * FROM jobs
+                    WHERE status = 'pending' AND available_at <= ? AND kind IN ({placeholders})
+                    ORDER BY available_at, id LIMIT 1""",
+                (now, *kinds),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ? WHERE id = ?",
+                (now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return Job(
+            id=row["id"],
+            kind=row["kind"],
+            route=row["route"],
+            payload=json.loads(row["payload"]),
+            attempts=row["attempts"] + 1,
+            script_id=row["script_id"],
+            created_at=row["created_at"],
+        )
+
+    def set_script_id(self, job_id: int, script_id: int):
+        self._connection().execute("UPDATE jobs SET script_id = ? WHERE id = ?", (script_id, job_id))
+
+    def complete(self, job_id: int):
+        self._connection().execute(
+            "UPDATE jobs SET status = 'done', finished_at = ?, last_error = NULL WHERE id = ?",
+            (time.time(), job_id),
+        )
+
+    def retry(self, job_id: int, delay_seconds: float, error: str):
+        self._connection().execute(
+            "UPDATE jobs SET status = 'pending', available_at = ?, last_error = ? WHERE id = ?",
+            (time.time() + delay_seconds, error, job_id),
+        )
+
+    def fail(self, job_id: int, error: str):
+        self._connection().execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, last_error = ? WHERE id = ?",
+            (time.time(), error, job_id),
+        )
+
+    def mark(self, job_id: int, name: str):
+        """Leg vast dat stap ``name`` van deze job uitgevoerd is, zodat een retry hem overslaat."""
+        self._connection().execute(
+            "INSERT OR IGNORE INTO job_markers (job_id, name, created_at) VALUES (?, ?, ?)",
+            (job_id, name, time.time()),
+        )
+
+    def has_marker(self, job_id: int, name: str) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM job_markers WHERE job_id = ? AND name = ?", (job_id, name)
+        ).fetchone()
+        return row is not None
+
+    def recover_running(self) -> int:
+        """Zet jobs die bij een vorige stop nog liepen terug op 'pending'."""
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = 'pending', available_at = ? WHERE status = 'running'",
+            (time.time(),),
+        )
+        if cursor.rowcount:
+            logging.warning(f"{cursor.rowcount} onderbroken webhook jobs opnieuw ingepland")
+        return cursor.rowcount
+
+    def purge_finished(self, older_than_seconds: float) -> int:
+        conn = self._connection()
+        cursor = conn.execute(
+            "DELETE FROM jobs WHERE status = 'done' AND finished_at < ?",
+            (time.time() - older_than_seconds,),
+        )
+        conn.execute("DELETE FROM job_markers WHERE job_id NOT IN (SELECT id FROM jobs)")
+        return cursor.rowcount
+
+    def depth(self) -> Dict[str, Dict[str, int]]:
+        """Aantal jobs per soort en status."""
+        result: Dict[str, Dict[str, int]] = {}
+        for row in self._connection().execute("SELECT kind, status, COUNT(*) AS n FROM jobs GROUP BY kind, status"):
+            result.setdefault(row["kind"], {})[row["status"]] = row["n"]
+        return result
+
+    def oldest_pending_age(self) -> Optional[float]:
+        row = self._connection().execute("SELECT MIN(created_at) AS oldest FROM jobs WHERE status = 'pending'").fetchone()
+        return time.time() - row["oldest"] if row and row["oldest"] else None
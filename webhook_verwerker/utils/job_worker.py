@@ -0,0 +1,332 @@
+from utils.log import start_log, end_log, logging_context
+from utils.config import get_and_use_next_script_id
+from utils.azure_sql_logger import log_to_azure_sql
+from utils.job_queue import Job, JobQueue
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+import threading
+import logging
+import random
+import time
+import os
+
+
+@dataclass
+class JobHandler:
+    """Hoe een job van een bepaalde soort (route) verwerkt wordt"""
+    kind: str
+    bron: str
+    script: str
+    conn_str: str
+    process_func: Callable[[Any], Any]
+    retry_config: Dict[str, float]
+    max_concurrency: int = 2
+
+
+@dataclass
+class Deferred:
+    """
+    Resultaat van een process functie dat pas later klaar is (bijv. een batch).
+
+    De worker wordt direct vrijgegeven; de job wordt afgerond, opnieuw
+    ingepland of op 'failed' gezet zodra ``future`` klaar is. ``then`` zet de
+    afgeronde future om naar het resultaat en mag een exceptie gooien.
+    """
+    future: Future
+    then: Optional[Callable[[Future], Any]] = None
+
+    def resolve(self, timeout: Optional[float] = None):
+        """Wacht op de future en geef het (omgezette) resultaat terug."""
+        self.future.exception(timeout)
+        return self.then(self.future) if self.then else self.future.result()
+
+
+# Geregistreerd door initialize_route, per route functie
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+# De job die de huidige worker thread verwerkt
+_current_job = threading.local()
+
+
+def current_job_id() -> Optional[int]:
+    """ID van de job die deze thread verwerkt, of None buiten een job worker."""
+    return getattr(_current_job, "id", None)
+
+
+def register_job_handler(handler: JobHandler):
+    JOB_HANDLERS[handler.kind] = handler
+
+
+class JobWorkerPool:
+    """
+    Worker threads die webhook jobs uit de JobQueue verwerken.
+
+    Per soort lopen maximaal ``max_concurrency`` jobs tegelijk. Geeft de process
+    functie een ``Deferred`` terug, dan telt de job niet meer mee voor die limiet
+    en wordt hij afgerond als het resultaat klaar is. Een mislukte job
+    wordt met exponentiële backoff en jitter opnieuw ingepland (``retry_config``
+    van de route) in plaats van een worker te laten slapen; na ``max_retries``
+    wordt de job op 'failed' gezet en als fout gelogd.
+    """
+
+    def __init__(self, queue: JobQueue, workers: int = 4, poll_interval: float = 1.0,
+                 metrics_interval: float = 300.0, retention_seconds: float = 7 * 86400):
+        self.queue = queue
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.metrics_interval = metrics_interval
+        self.retention_seconds = retention_seconds
+        self._threads = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, int] = {}
+        # job ID -> soort, voor jobs die op een Deferred resultaat wachten
+        self._deferred: Dict[int, str] = {}
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def start(self):
+        if self._threads:
+            return
+        self.queue.recover_running()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"webhook-worker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        metrics_thread = threading.Thread(target=self._report_metrics, name="webhook-queue-metrics", daemon=True)
+        metrics_thread.start()
+        self._threads.append(metrics_thread)
+        logging.info(f"Webhook worker pool gestart met {self.workers} workers ({self.queue.path})")
+
+    def stop(self, timeout: float = 30.0):
+        """
+        Stop met claimen en wacht tot lopende en Deferred jobs klaar zijn.
+
+        Een job die na ``timeout`` seconden nog loopt blijft 'running' en wordt
+        bij de volgende start opnieuw opgepakt.
+        """
+        deadline = time.monotonic() + timeout
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._deferred and not any(self._in_flight.values()):
+                    return True
+            time.sleep(0.1)
+        with self._lock:
+            remaining = sum(self._in_flight.values()) + len(self._deferred)
+        if remaining:
+            logging.warning(f"Webhook worker pool gestopt met {remaining} onafgeronde jobs; die worden bij de volgende start opnieuw opgepakt")
+        return remaining == 0
+
+    def notify(self):
+        """Maak wachtende workers wakker na een nieuwe job."""
+        self._wakeup.set()
+
+    def _claim(self) -> Optional[Job]:
+        # Claimen gebeurt één worker tegelijk, zodat de concurrency limiet per soort klopt
+        with self._lock:
+            kinds = [kind for kind, handler in JOB_HANDLERS.items()
+                     if self._in_flight.get(kind, 0) < handler.max_concurrency]
+            job = self.queue.claim(kinds)
+            if job is not None:
+                self._in_flight[job.kind] = self._in_flight.get(job.kind, 0) + 1
+            return job
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                logging.error(f"Fout bij claimen van webhook job: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            try:
+                self._process(job)
+            finally:
+                with self._lock:
+                    self._in_flight[job.kind] -= 1
+
+    def _process(self, job: Job):
+        handler = JOB_HANDLERS.get(job.kind)
+        if handler is None:
+            self.queue.fail(job.id, f"Geen handler voor job soort {job.kind}")
+            logging.error(f"Geen handler voor webhook job {job.id} ({job.kind})")
+            return
+
+        # Bron, script en script_id voor de log handlers van deze job
+        with logging_context(bron=handler.bron, script=handler.script,
+                             conn_str=handler.conn_str, script_id=job.script_id) as log_ctx:
+            self._run_job(job, handler, log_ctx)
+
+    def _run_job(self, job: Job, handler: JobHandler, log_ctx):
+        start_time = start_log()
+        deferred = False
+        _current_job.id = job.id
+        try:
+            # Eén script_id per job, ook over retries heen
+            if job.script_id is None:
+                script_id = get_and_use_next_script_id(
+                    connection_string=handler.conn_str,
+                    bron=handler.bron,
+                    script_naam=handler.script
+                )
+                self.queue.set_script_id(job.id, script_id)
+                job.script_id = script_id
+                log_ctx.script_id = script_id
+
+            result = handler.process_func(job.payload)
+            if isinstance(result, Deferred):
+                # Worker direct vrijgeven; de job wordt afgerond als het resultaat klaar is
+                deferred = True
+                self._defer(job, handler, result, start_time)
+            else:
+                self._job_succeeded(job, handler)
+
+        except Exception as e:
+            self._job_failed(job, handler, e)
+        finally:
+            _current_job.id = None
+            if not deferred:
+                end_log(start_time)
+
+    def _defer(self, job: Job, handler: JobHandler, result: Deferred, start_time: float):
+        with self._lock:
+            self._deferred[job.id] = job.kind
+        result.future.add_done_callback(lambda _: self._finish_deferred(job, handler, result, start_time))
+
+    def _finish_deferred(self, job: Job, handler: JobHandler, result: Deferred, start_time: float):
+        # Draait op de thread die de future afrondt (bijv. de flush van een batch)
+        with logging_context(bron=handler.bron, script=handler.script,
+                             conn_str=handler.conn_str, script_id=job.script_id):
+            try:
+                result.resolve()
+                self._job_succeeded(job, handler)
+            except Exception as e:
+                self._job_failed(job, handler, e)
+            finally:
+                with self._lock:
+                    self._deferred.pop(job.id, None)
+                end_log(start_time)
+
+    def _job_succeeded(self, job: Job, handler: JobHandler):
+        retry_count = job.attempts - 1
+        self.queue.complete(job.id)
+        with self._lock:
+            self.processed += 1
+
+        # Log succes naar Azure SQL, inclusief tijd in de queue
+        log_to_azure_sql(
+            route=job.route,
+            source=handler.bron,
+            script_name=handler.script,
+            status="success",
+            message="Webhook succesvol verwerkt",
+            processing_time_ms=int((time.time() - job.created_at) * 1000),
+            request_id=job.script_id,
+            payload=job.payload,
+            error_details=None,
+            retry_count=retry_count
+        )
+
+    def _job_failed(self, job: Job, handler: JobHandler, e: Exception):
+        retry_count = job.attempts - 1
+        error_msg = str(e)
+        max_retries = handler.retry_config['max_retries']
+        if retry_count >= max_retries:
+            self.queue.fail(job.id, error_msg)
+            with self._lock:
+                self.failed += 1
+            logging.error(f"Maximaal aantal pogingen ({max_retries}) bereikt voor job {job.id} op route {job.route}: {error_msg}")
+            log_to_azure_sql(
+                route=job.route,
+                source=handler.bron,
+                script_name=handler.script,
+                status="error",
+                message=f"Maximaal aantal pogingen ({max_retries}) bereikt",
+                processing_time_ms=int((time.time() - job.created_at) * 1000),
+                request_id=job.script_id,
+                payload=job.payload,
+                error_details={"type": type(e).__name__, "message": error_msg},
+                retry_count=retry_count
+            )
+        else:
+            # Bereken wachttijd met exponentiële backoff en jitter; de worker slaapt niet
+            delay = min(
+                handler.retry_config['initial_backoff'] * (2 ** retry_count) + random.uniform(0, 1),
+                handler.retry_config['max_backoff']
+            )
+            self.queue.retry(job.id, delay, error_msg)
+            with self._lock:
+                self.retried += 1
+            logging.warning(f"Poging {retry_count + 1}/{max_retries} mislukt voor job {job.id} op route {job.route}. "
+                            f"Opnieuw over {delay:.2f} seconden. Fout: {error_msg}")
+
+    def metrics(self) -> Dict[str, Any]:
+        depth = self.queue.depth()
+        with self._lock:
+            in_flight = dict(self._in_flight)
+            deferred: Dict[str, int] = {}
+            for kind in self._deferred.values():
+                deferred[kind] = deferred.get(kind, 0) + 1
+        return {
+            "workers": self.workers,
+            "queue": depth,
+            "pending": sum(counts.get("pending", 0) for counts in depth.values()),
+            "failed": sum(counts.get("failed", 0) for counts in depth.values()),
+            "in_flight": in_flight,
+            "deferred": deferred,
+            "oldest_pending_seconds": self.queue.oldest_pending_age(),
+            "processed": self.processed,
+            "retried": self.retried,
+            "failed_since_start": self.failed,
+        }
+
+    def _report_metrics(self):
+        while not self._stop.wait(self.metrics_interval):
+            try:
+                metrics = self.metrics()
+                oldest = metrics["oldest_pending_seconds"]
+                logging.info(
+                    f"Webhook queue: {metrics['pending']} pending, {metrics['failed']} failed, "
+                    f"in behandeling {metrics['in_flight']}, oudste pending {oldest or 0:.0f}s, "
+                    f"verwerkt {metrics['processed']}, retries {metrics['retried']}"
+                )
+                self.queue.purge_finished(self.retention_seconds)
+            except Exception as e:
+                logging.error(f"Fout bij rapporteren van webhook queue metrics: {e}")
+
+
+_job_queue = None
+_worker_pool = None
+_singleton_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    with _singleton_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
+
+
+def get_worker_pool() -> JobWorkerPool:
+    global _worker_pool
+    queue = get_job_queue()
+    with _singleton_lock:
+        if _worker_pool is None:
+            _worker_pool = JobWorkerPool(
+                queue,
+                workers=int(os.getenv('WEBHOOK_WORKERS', '4')),
+                metrics_interval=float(os.getenv('WEBHOOK_QUEUE_METRICS_INTERVAL', '300')),
+            )
+        return _worker_pool
@@ -1,20 +1,65 @@
 from datetime import timedelta, datetime
+from contextvars import ContextVar
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+from utils.log_sink import log_sink, target_name
+import threading
 import logging
-import pyodbc
 import time
-from flask import request
 import sys
 
+
+@dataclass
+class LogContext:
+    """Velden van de lopende webhook (request of job) die de log handlers gebruiken"""
+    bron: str
+    script: str
+    conn_str: Optional[str] = None
+    script_id: Optional[int] = None
+
+
+# Per request/job thread; concurrente webhooks hebben elk hun eigen context
+log_context: ContextVar[Optional[LogContext]] = ContextVar("log_context", default=None)
+
+
+@contextmanager
+def logging_context(bron, script, conn_str=None, script_id=None):
+    """Zet bron, script en script_id voor alle logregels binnen dit blok."""
+    context = LogContext(bron=bron, script=script, conn_str=conn_str, script_id=script_id)
+    token = log_context.set(context)
+    try:
+        yield context
+    finally:
+        log_context.reset(token)
+
+def get_script_id():
+    """Script ID van de request of job die in deze thread draait."""
+    context = log_context.get()
+    return context.script_id if context else None
+
 class DatabaseLogHandler(logging.Handler):
     """
-    Logging handler die direct naar de database schrijft voor start, eind en error logs.
+    Logging handler die start, eind en error logs via de gebufferde log sink naar de database schrijft.
+    
+    Bron, script en script_id komen uit de LogContext van de lopende webhook,
+    zodat één handler voor het hele proces volstaat.
     """
-    def __init__(self, conn_str, customer, source, script):
+    def __init__(self, conn_str, customer):
         super().__init__()
         self.conn_str = conn_str
         self.customer = customer
-        self.source = source
-        self.script = script
+        self._targets = {}
+
+    def _target(self, conn_str):
+        # Registreer elke connection string één keer bij de log sink
+        target = self._targets.get(conn_str)
+        if target is None:
+            target = target_name("logboek", conn_str)
+            log_sink.register(target, conn_str, "Logboek",
+                              ["Niveau", "Bericht", "Datumtijd", "Klant", "Bron", "Script", "Script_ID"])
+            self._targets[conn_str] = target
+        return target
 
     def emit(self, record):
         # Alleen start, eind en error logs verwerken
@@ -24,54 +69,57 @@ class DatabaseLogHandler(logging.Handler):
             return
 
         try:
+            # Haal bron, script en script_id op uit de context van de request of job
+            context = log_context.get()
+            if context is None or context.script_id is None:
+                # Stil falen - script_id wordt later in de request gegenereerd
+                return
+
             log_message = self.format(record)
             log_message = log_message.split('-')[-1].strip()
             created_at = datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S')
             
-            # Haal script_id op uit de request context
-            script_id = getattr(request, 'script_id', None)
-            if script_id is None:
-                # Stil falen - script_id wordt later in de request gegenereerd
-                return
-
-            with pyodbc.connect(self.conn_str) as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        """INSERT INTO Logboek 
-                           (Niveau, Bericht, Datumtijd, Klant, Bron, Script, Script_ID) 
-                           VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                        (record.levelname, log_message, created_at, 
-                         self.customer, self.source, self.script, script_id)
-                    )
-                    conn.commit()
+            # Alleen in de queue zetten; de sink thread schrijft in batches
+            log_sink.write(self._target(context.conn_str or self.conn_str),
+                           (record.levelname, log_message, created_at,
+                            self.customer, context.bron, context.script, context.script_id))
         except Exception as e:
             print(f"Fout bij schrijven naar database: {e}")
 
-def setup_logging(conn_str, klant, bron, script):
+_db_handler = None
+_setup_lock = threading.Lock()
+
+def setup_logging(conn_str, klant="Aardg"):
     """
-    Configureer logging met database logging voor start, eind en errors,
-    en terminal logging voor alle berichten tijdens het testen.
+    Configureer eenmalig logging met database logging voor start, eind en errors,
+    en terminal logging voor alle berichten. Latere aanroepen geven de bestaande handler terug.
     """
-    logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
-
-    # Verwijder alle bestaande handlers om duplicatie te voorkomen
-    for handler in logger.handlers[:]:
-        logger.removeHandler(handler)
-
-    # Maak en configureer de database handler
-    db_handler = DatabaseLogHandler(conn_str, klant, bron, script)
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', 
-                                datefmt='%Y-%m-%d %H:%M:%S')
-    db_handler.setFormatter(formatter)
-    logger.addHandler(db_handler)
-
-    # Voeg terminal logging toe voor testen
-    stream_handler = logging.StreamHandler(sys.stdout)
-    stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
-
-    return db_handler
+    global _db_handler
+    with _setup_lock:
+        if _db_handler is not None:
+            return _db_handler
+
+        logger = logging.getLogger()
+        logger.setLevel(logging.INFO)
+
+        # Verwijder alle bestaande handlers om duplicatie te voorkomen
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+
+        # Maak en configureer de database handler
+        db_handler = DatabaseLogHandler(conn_str, klant)
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', 
+                                    datefmt='%Y-%m-%d %H:%M:%S')
+        db_handler.setFormatter(formatter)
+        logger.addHandler(db_handler)
+
+        # Voeg terminal logging toe voor testen
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(formatter)
+        logger.addHandler(stream_handler)
+
+        _db_handler = db_handler
+        return db_handler
 
 def start_log():
     """Log de start van een script uitvoering"""
@@ -1,6 +1,11 @@
+import hashlib
 import json
 import os
+import re
+import threading
+from dataclasses import dataclass
 from functools import lru_cache
+from typing import Any, Dict, Optional
 import logging
 
 # Constants voor product categorieën
@@ -39,93 +44,296 @@ SKU_CATEGORIES = {
     'G12': ['G12', 'G-', '8719326399379']
 }
 
+class KeywordMatcher:
+    """
+    Gecompileerde versie van de substring regels: per categorie één regex met
+    alle keywords, in plaats van een any(keyword in sku ...) loop per categorie.
+    De volgorde van de categorieën blijft bepalend: de eerste die matcht wint.
+    """
+    def __init__(self, categories):
+        self._patterns = [
+            (category, re.compile('|'.join(re.escape(keyword) for keyword in sorted(set(keywords), key=len, reverse=True))))
+            for category, keywords in categories.items()
+        ]
+
+    def classify(self, sku):
+        """Eerste categorie waarvan een keyword in de SKU voorkomt, anders None."""
+        for category, pattern in self._patterns:
+            if pattern.search(sku):
+                return category
+        return None
+
+    def matches(self, sku):
+        return self.classify(sku) is not None
+
+
+CATEGORY_MATCHER = KeywordMatcher(CATEGORIES)
+DISCOUNT_MATCHER = KeywordMatcher({'Discount': DISCOUNT_KEYWORDS})
+BASE_UNIT_MATCHER = KeywordMatcher(BASE_UNIT_VALUES)
+SKU_MATCHER = KeywordMatcher(SKU_CATEGORIES)
+
+# Volgorde is belangrijk: de eerste match bepaalt het basis product
+BASE_PRODUCT_MATCHER = KeywordMatcher({
+    'Starter': SKU_CATEGORIES['S'],
+    'Probiotica': SKU_CATEGORIES['P28'],
+    'Waterkefir': SKU_CATEGORIES['W4'],
+    'Kombucha': SKU_CATEGORIES['K4'],
+    'Mix Originals': SKU_CATEGORIES['M4'],
+    'Gember': SKU_CATEGORIES['G12'],
+    'Citroen': SKU_CATEGORIES['C12'],
+    'Bloem': SKU_CATEGORIES['B12'],
+    'Frisdrank Mix': SKU_CATEGORIES['F12'],
+})
+
+
+@dataclass(frozen=True)
+class ProductInfo:
+    """Alle afgeleide gegevens van één product ID"""
+    sku_category: Optional[str]
+    discount: Optional[str]
+    base_unit: Optional[str]
+    category: Optional[str]
+    # Basis waarde van de SKU categorie, zoals gebruikt voor de Active Campaign velden
+    base_value: float
+
+
+def _sku_category_base_value(sku_category):
+    # Eerste basis eenheid waarin de SKU categorie voorkomt
+    if sku_category:
+        for base_unit, skus in BASE_UNIT_VALUES.items():
+            if sku_category in skus:
+                return float(base_unit)
+    return 0.0
+
+
 @lru_cache(maxsize=1)
 def get_file_path():
     """Retourneert het pad naar het product catalogus bestand."""
     base_path = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(base_path, '..', 'data', 'product_catalog.json')
 
-@lru_cache(maxsize=1)
-def load_catalogue():
-    """Laadt de product catalogus en cached het resultaat."""
+def _read_catalogue(file_path):
+    """Lees de catalogus; geeft de inhoud en een hash van de ruwe bytes terug."""
     try:
-        with open(get_file_path(), 'r') as json_file:
-            return json.load(json_file)
+        with open(file_path, 'rb') as json_file:
+            raw = json_file.read()
     except FileNotFoundError:
-        raise FileNotFoundError(f"Product catalogus niet gevonden op: {get_file_path()}")
-    except json.JSONDecodeError:
-        raise ValueError(f"Ongeldig JSON formaat in product catalogus: {get_file_path()}")
+        raise FileNotFoundError(f"Product catalogus niet gevonden op: {file_path}")
+    try:
+        return json.loads(raw), hashlib.sha256(raw).hexdigest()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise ValueError(f"Ongeldig JSON formaat in product catalogus: {file_path}")
 
-def _build_dict_from_categories(categories, product_catalogue):
+def _build_dict_from_categories(categories, product_catalogue, matcher=None):
     """Bouwt een dictionary op basis van categorieën en product catalogus."""
+    matcher = matcher or KeywordMatcher(categories)
     result = {category: [] for category in categories}
     
     for sku, product_id in product_catalogue.items():
-        for category, keywords in categories.items():
-            if any(keyword in sku for keyword in keywords):
-                result[category].append(product_id)
-                break
+        category = matcher.classify(sku)
+        if category is not None:
+            result[category].append(product_id)
     
     return result
 
-@lru_cache(maxsize=1)
-def get_category_one_dict():
-    """Retourneert een dictionary met product IDs per categorie."""
-    return _build_dict_from_categories(CATEGORIES, load_catalogue())
-
-@lru_cache(maxsize=1)
-def get_discount_dict():
-    """Retourneert een dictionary met product IDs voor kortingen."""
-    product_catalogue = load_catalogue()
+def _build_discount_dict(product_catalogue):
     return {
         'Discount': [
             product_id for sku, product_id in product_catalogue.items()
-            if any(keyword in sku for keyword in DISCOUNT_KEYWORDS)
+            if DISCOUNT_MATCHER.matches(sku)
         ]
     }
 
-@lru_cache(maxsize=1)
+def _invert(category_dict):
+    """product_id -> eerste key waarin het ID voorkomt (zelfde uitkomst als de lineaire zoektocht)."""
+    inverted = {}
+    for key, product_ids in category_dict.items():
+        for product_id in product_ids:
+            inverted.setdefault(int(product_id), key)
+    return inverted
+
+def build_product_index(product_catalogue) -> Dict[int, ProductInfo]:
+    """Index van product ID naar alle afgeleide gegevens voor een catalogus (sku -> product ID)."""
+    sku_categories = _invert(_build_dict_from_categories(SKU_CATEGORIES, product_catalogue, SKU_MATCHER))
+    discounts = _invert(_build_discount_dict(product_catalogue))
+    base_units = _invert(_build_dict_from_categories(BASE_UNIT_VALUES, product_catalogue, BASE_UNIT_MATCHER))
+    categories = _invert(_build_dict_from_categories(CATEGORIES, product_catalogue, CATEGORY_MATCHER))
+    index = {}
+    for product_id in product_catalogue.values():
+        product_id = int(product_id)
+        sku_category = sku_categories.get(product_id)
+        index[product_id] = ProductInfo(
+            sku_category=sku_category,
+            discount=discounts.get(product_id),
+            base_unit=base_units.get(product_id),
+            category=categories.get(product_id),
+            base_value=_sku_category_base_value(sku_category)
+        )
+    return index
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Eén versie van de catalogus met alle daarvan afgeleide dicts en de product index"""
+    version: str
+    mtime: float
+    catalogue: Dict[str, Any]
+    category_one_dict: Dict[str, list]
+    discount_dict: Dict[str, list]
+    base_unit_values: Dict[str, list]
+    sku_dict: Dict[str, list]
+    product_index: Dict[int, ProductInfo]
+
+
+def build_snapshot(product_catalogue, version='', mtime=0.0) -> CatalogSnapshot:
+    return CatalogSnapshot(
+        version=version,
+        mtime=mtime,
+        catalogue=product_catalogue,
+        category_one_dict=_build_dict_from_categories(CATEGORIES, product_catalogue, CATEGORY_MATCHER),
+        discount_dict=_build_discount_dict(product_catalogue),
+        base_unit_values=_build_dict_from_categories(BASE_UNIT_VALUES, product_catalogue, BASE_UNIT_MATCHER),
+        sku_dict=_build_dict_from_categories(SKU_CATEGORIES, product_catalogue, SKU_MATCHER),
+        product_index=build_product_index(product_catalogue)
+    )
+
+
+class CatalogCache:
+    """
+    Versie-bewuste cache van de product catalogus.
+
+    Een nieuwe versie (andere mtime/grootte en andere inhoud-hash) wordt volledig
+    opgebouwd en daarna in één toewijzing omgewisseld; lopende requests blijven
+    met hun eigen snapshot werken. Het controleren gebeurt door een achtergrond
+    thread of expliciet via reload(), niet op het request pad. Een kapotte of
+    ontbrekende nieuwe catalogus laat de huidige versie staan.
+    """
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._stat = None
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+
+    def snapshot(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Eerste gebruik: synchroon laden, fouten gaan naar de aanroeper
+            with self._reload_lock:
+                if self._snapshot is None:
+                    self._load()
+                snapshot = self._snapshot
+        return snapshot
+
+    def _file_stat(self):
+        stat = os.stat(self.file_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self):
+        file_stat = self._file_stat()
+        product_catalogue, version = _read_catalogue(self.file_path)
+        if self._snapshot is not None and self._snapshot.version == version:
+            # Alleen de mtime is veranderd, de inhoud niet
+            self._stat = file_stat
+            return False
+        snapshot = build_snapshot(product_catalogue, version, file_stat[0] / 1e9)
+        self._snapshot = snapshot
+        self._stat = file_stat
+        return True
+
+    def reload(self, force=False):
+        """Herlaad als het bestand gewijzigd is; True als er een nieuwe versie actief is."""
+        with self._reload_lock:
+            try:
+                if not force and self._snapshot is not None and self._file_stat() == self._stat:
+                    return False
+                changed = self._load()
+            except (FileNotFoundError, ValueError, OSError) as e:
+                logging.error(f"Product catalogus niet herladen, huidige versie blijft actief: {e}")
+                return False
+        if changed:
+            logging.info(f"Product catalogus herladen: versie {self._snapshot.version[:12]}, {len(self._snapshot.catalogue)} SKUs")
+        return changed
+
+    def start_watcher(self, interval=60):
+        """Controleer het bestand elke ``interval`` seconden op wijzigingen."""
+        if self._watcher is not None:
+            return
+        def watch():
+            while not self._stop.wait(interval):
+                self.reload()
+        self._watcher = threading.Thread(target=watch, name="catalog-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+
+catalog_cache = CatalogCache(get_file_path())
+
+
+def load_catalogue():
+    """Retourneert de actuele product catalogus."""
+    return catalog_cache.snapshot().catalogue
+
+def reload_catalogue(force=False):
+    return catalog_cache.reload(force)
+
+def start_catalogue_watcher(interval=None):
+    catalog_cache.start_watcher(interval or int(os.getenv('CATALOG_RELOAD_INTERVAL', '60')))
+
+def get_category_one_dict():
+    """Retourneert een dictionary met product IDs per categorie."""
+    return catalog_cache.snapshot().category_one_dict
+
+def get_discount_dict():
+    """Retourneert een dictionary met product IDs voor kortingen."""
+    return catalog_cache.snapshot().discount_dict
+
 def get_base_unit_values():
     """Retourneert een dictionary met product IDs per basis eenheid."""
-    return _build_dict_from_categories(BASE_UNIT_VALUES, load_catalogue())
+    return catalog_cache.snapshot().base_unit_values
 
-@lru_cache(maxsize=1)
 def get_sku_dict():
     """Retourneert een dictionary met product IDs per SKU categorie."""
-    return _build_dict_from_categories(SKU_CATEGORIES, load_catalogue())
+    return catalog_cache.snapshot().sku_dict
+
+def get_product_index() -> Dict[int, ProductInfo]:
+    """Product index van de actuele catalogus."""
+    return catalog_cache.snapshot().product_index
+
+UNKNOWN_PRODUCT = ProductInfo(sku_category=None, discount=None, base_unit=None, category=None, base_value=0.0)
+
+def get_product_info(product_id) -> ProductInfo:
+    """Afgeleide gegevens voor een product ID in O(1); onbekende IDs geven UNKNOWN_PRODUCT."""
+    try:
+        return get_product_index().get(int(product_id), UNKNOWN_PRODUCT)
+    except (ValueError, TypeError):
+        logging.warning(f"Ongeldig product ID formaat: {product_id}")
+        return UNKNOWN_PRODUCT
+
+# Omgekeerde lookups per category_dict, voor aanroepers die nog een dict meegeven
+_inverted_dicts = {}
 
 def get_key_from_product_id(product_id, category_dict):
     """Vindt de categorie key voor een gegeven product ID."""
     try:
         product_id = int(product_id)
-        for key, product_ids in category_dict.items():
-            if product_id in product_ids:
-                logging.info(f"Product ID {product_id} gevonden in categorie {key}")
-                return key
+        cached = _inverted_dicts.get(id(category_dict))
+        if cached is None or cached[0] is not category_dict:
+            if len(_inverted_dicts) > 32:
+                _inverted_dicts.clear()
+            cached = (category_dict, _invert(category_dict))
+            _inverted_dicts[id(category_dict)] = cached
+        key = cached[1].get(product_id)
+        if key is not None:
+            logging.info(f"Product ID {product_id} gevonden in categorie {key}")
+            return key
     except (ValueError, TypeError):
         logging.warning(f"Ongeldig product ID formaat: {product_id}")
     return None
 
+@lru_cache(maxsize=4096)
 def determine_base_product(sku):
     """Bepaalt het basis product op basis van SKU."""
-    sku = sku.upper()
-    
-    if any(substring in sku for substring in SKU_CATEGORIES['S']):
-        return 'Starter'
-    elif any(substring in sku for substring in SKU_CATEGORIES['P28']):
-        return 'Probiotica'
-    elif any(substring in sku for substring in SKU_CATEGORIES['W4']):
-        return 'Waterkefir'
-    elif any(substring in sku for substring in SKU_CATEGORIES['K4']):
-        return 'Kombucha'
-    elif any(substring in sku for substring in SKU_CATEGORIES['M4']):
-        return 'Mix Originals'
-    elif any(substring in sku for substring in SKU_CATEGORIES['G12']):
-        return 'Gember'
-    elif any(substring in sku for substring in SKU_CATEGORIES['C12']):
-        return 'Citroen'
-    elif any(substring in sku for substring in SKU_CATEGORIES['B12']):
-        return 'Bloem'
-    elif any(substring in sku for substring in SKU_CATEGORIES['F12']):
-        return 'Frisdrank Mix'
-    return 'unknown'
\ No newline at end of file
+    return BASE_PRODUCT_MATCHER.classify(sku.upper()) or 'unknown'
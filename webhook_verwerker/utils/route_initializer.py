@@ -1,7 +1,9 @@
 from utils.request_check import validate_signature, parse_request_data
-from utils.log import start_log, end_log, setup_logging
+from utils.log import start_log, end_log, setup_logging, logging_context
 from utils.config import get_and_use_next_script_id
 from utils.azure_sql_logger import log_to_azure_sql
+from utils.job_worker import Deferred, JobHandler, register_job_handler, get_job_queue, get_worker_pool
+from utils.delivery_store import delivery_key, get_delivery_store
 from flask import request, jsonify
 from functools import wraps
 import logging
@@ -18,7 +20,10 @@ class RouteConfig:
                  verify_signature=False,
                  parse_data=True,
                  secret_key=None,
-                 retry_config=None):
+                 retry_config=None,
+                 async_processing=True,
+                 max_concurrency=2,
+                 deduplicate=True):
         self.verify_signature = verify_signature
         self.parse_data = parse_data
         self.secret_key = secret_key
@@ -27,6 +32,12 @@ class RouteConfig:
             'initial_backoff': 5,
             'max_backoff': 300
         }
+        # Asynchroon: valideren, in de lokale queue zetten en direct 202 teruggeven
+        self.async_processing = async_processing
+        # Maximaal aantal jobs van deze route dat tegelijk verwerkt wordt
+        self.max_concurrency = max_concurrency
+        # Dubbele afleveringen (zelfde topic, resource en payload) niet opnieuw verwerken
+        self.deduplicate = deduplicate
 
 
 
@@ -43,22 +54,27 @@ def initialize_route(config: RouteConfig, bron: str, script: str = 'Webhook Verw
     """
     if process_func is None:
         raise ValueError("Process functie is verplicht")
+
+    # Logging wordt één keer per proces geconfigureerd, niet per request
+    setup_logging(conn_str=conn_str, klant="Aardg")
         
     def decorator(f):
+        if config.async_processing:
+            return _async_route(f, config, bron, script, conn_str, process_func)
+
         @wraps(f)
         def wrapper(*args, **kwargs):
-            # Configureer logging voor deze route
-            setup_logging(
-                conn_str=conn_str,
-                klant="Aardg",
-                bron=bron,
-                script=script
-            )
-            
+            # Bron, script en script_id voor de log handlers van deze request
+            with logging_context(bron=bron, script=script, conn_str=conn_str) as log_ctx:
+                return process_request(log_ctx)
+
+        def process_request(log_ctx):
             # Start logging
             start_time = start_log()
             
             retry_count = 0
+            delivery = None
+            claimed = False
             while True:
                 try:
                     # Genereer script_id
@@ -67,7 +83,7 @@ def initialize_route(config: RouteConfig, bron: str, script: str = 'Webhook Verw
                         bron=bron,
                         script_naam=script
                     )
-                    request.script_id = script_id
+                    log_ctx.script_id = script_id
                     
                     # Signature validatie indien nodig
                     if config.verify_signature:
@@ -87,8 +103,18 @@ def initialize_route(config: RouteConfig, bron: str, script: str = 'Webhook Verw
                     else:
                         data = request.get_json()
                     
+                    # Alleen bij de eerste poging: is deze aflevering al eerder verwerkt?
+                    if config.deduplicate and not claimed:
+                        delivery, is_new = _claim_delivery(f.__name__, data)
+                        claimed = True
+                        if not is_new:
+                            return _duplicate_response()
+                    
                     # Voer de process functie uit met de data
                     resultaat = process_func(data)
+                    if isinstance(resultaat, Deferred):
+                        # Synchrone route: hier wel op het resultaat wachten
+                        resultaat = resultaat.resolve()
                     
                     # Log succes naar Azure SQL
                     processing_time_ms = int((time.time() - start_time) * 1000)
@@ -115,6 +141,7 @@ def initialize_route(config: RouteConfig, bron: str, script: str = 'Webhook Verw
                 except ValueError as e:
                     error_msg = str(e)
                     logging.error(f"Validatie fout: {error_msg}")
+                    _release_delivery(delivery)
                     
                     # Log validatie fout naar Azure SQL
                     processing_time_ms = int((time.time() - start_time) * 1000)
@@ -125,7 +152,7 @@ def initialize_route(config: RouteConfig, bron: str, script: str = 'Webhook Verw
                         status="error",
                         message=error_msg,
                         processing_time_ms=processing_time_ms,
-                        request_id=getattr(request, 'script_id', None),
+                        request_id=log_ctx.script_id,
                         payload=data if 'data' in locals() else None,
                         error_details={"type": "ValueError"},
                         retry_count=retry_count
@@ -133,12 +160,13 @@ def initialize_route(config: RouteConfig, bron: str, script: str = 'Webhook Verw
                     
                     return jsonify({
                         "error": error_msg,
-                        "script_id": getattr(request, 'script_id', None)
+                        "script_id": log_ctx.script_id
                     }), 400
                     
                 except PermissionError as e:
                     error_msg = str(e)
                     logging.error(f"Authenticatie fout: {error_msg}")
+                    _release_delivery(delivery)
                     
                     # Log authenticatie fout naar Azure SQL
                     processing_time_ms = int((time.time() - start_time) * 1000)
@@ -149,7 +177,7 @@ def initialize_route(config: RouteConfig, bron: str, script: str = 'Webhook Verw
                         status="error",
                         message=error_msg,
                         processing_time_ms=processing_time_ms,
-                        request_id=getattr(request, 'script_id', None),
+                        request_id=log_ctx.script_id,
                         payload=data if 'data' in locals() else None,
                         error_details={"type": "PermissionError"},
                         retry_count=retry_count
@@ -157,13 +185,15 @@ def initialize_route(config: RouteConfig, bron: str, script: str = 'Webhook Verw
                     
                     return jsonify({
                         "error": error_msg,
-                        "script_id": getattr(request, 'script_id', None)
+                        "script_id": log_ctx.script_id
                     }), 401
                     
                 except Exception as e:
                     error_msg = str(e)
                     if retry_count == config.retry_config['max_retries']:
                         logging.error(f"Maximaal aantal pogingen ({config.retry_config['max_retries']}) bereikt voor route {request.path}")
+                        # WooCommerce mag opnieuw afleveren
+                        _release_delivery(delivery)
                         
                         # Log max retries fout naar Azure SQL
                         processing_time_ms = int((time.time() - start_time) * 1000)
@@ -174,7 +204,7 @@ def initialize_route(config: RouteConfig, bron: str, script: str = 'Webhook Verw
                             status="error",
                             message=f"Maximaal aantal pogingen ({config.retry_config['max_retries']}) bereikt",
                             processing_time_ms=processing_time_ms,
-                            request_id=getattr(request, 'script_id', None),
+                            request_id=log_ctx.script_id,
                             payload=data if 'data' in locals() else None,
                             error_details={"type": type(e).__name__, "message": error_msg},
                             retry_count=retry_count
@@ -182,7 +212,7 @@ def initialize_route(config: RouteConfig, bron: str, script: str = 'Webhook Verw
                      
                         return jsonify({
                             "error": "Service tijdelijk niet beschikbaar. Probeer het later opnieuw.",
-                            "script_id": getattr(request, 'script_id', None)
+                            "script_id": log_ctx.script_id
                         }), 503
 
                     # Bereken wachttijd met exponentiële backoff en jitter
@@ -201,4 +231,121 @@ def initialize_route(config: RouteConfig, bron: str, script: str = 'Webhook Verw
                     end_log(start_time)
                 
         return wrapper
-    return decorator 
\ No newline at end of file
+    return decorator
+
+
+def _validate_and_parse(config: RouteConfig):
+    """Signature validatie en data parsing; ValueError/PermissionError bij een ongeldige request"""
+    if config.verify_signature:
+        if not config.secret_key:
+            raise ValueError("Signature verificatie gevraagd maar geen secret opgegeven")
+        
+        if not validate_signature(request, config.secret_key):
+            raise PermissionError("Ongeldige signature")
+            
+        logging.info("Signature gevalideerd")
+    
+    if config.parse_data:
+        data = parse_request_data()
+        if not data:
+            raise ValueError("Kon geen geldige data uit de request halen")
+    else:
+        data = request.get_json()
+    return data
+
+
+def _claim_delivery(kind, data):
+    """Markeer deze aflevering als ontvangen; geeft (key, is_nieuw) terug."""
+    try:
+        key = delivery_key(kind, request.headers, request.get_data(), data)
+        delivery_id = request.headers.get("X-WC-Webhook-Delivery-ID")
+        if get_delivery_store().claim(key, kind, delivery_id):
+            return key, True
+        logging.info(f"Dubbele webhook aflevering genegeerd op route {request.path} ({key}, delivery ID {delivery_id or 'onbekend'})")
+        return key, False
+    except Exception as e:
+        # De deduplicatie mag het aannemen van webhooks niet blokkeren
+        logging.warning(f"Deduplicatie niet beschikbaar, webhook wordt verwerkt: {e}")
+        return None, True
+
+
+def _release_delivery(key):
+    if key is None:
+        return
+    try:
+        get_delivery_store().release(key)
+    except Exception as e:
+        logging.warning(f"Kon webhook aflevering {key} niet vrijgeven: {e}")
+
+
+def _duplicate_response():
+    # 200 zodat WooCommerce stopt met opnieuw afleveren
+    return jsonify({
+        "message": "Webhook al ontvangen",
+        "duplicate": True
+    }), 200
+
+
+def _async_route(f, config: RouteConfig, bron: str, script: str, conn_str: str, process_func):
+    """
+    Route die de webhook alleen valideert en in de lokale job queue zet.
+    
+    De verwerking (inclusief retries met backoff) gebeurt door de JobWorkerPool,
+    zodat WooCommerce direct een 202 krijgt en niet op retries hoeft te wachten.
+    """
+    kind = f.__name__
+    register_job_handler(JobHandler(
+        kind=kind,
+        bron=bron,
+        script=script,
+        conn_str=conn_str,
+        process_func=process_func,
+        retry_config=config.retry_config,
+        max_concurrency=config.max_concurrency
+    ))
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        start_time = time.time()
+        data = None
+        delivery = None
+        try:
+            data = _validate_and_parse(config)
+            if config.deduplicate:
+                delivery, is_new = _claim_delivery(kind, data)
+                if not is_new:
+                    return _duplicate_response()
+            job_id = get_job_queue().enqueue(kind, request.path, data)
+            get_worker_pool().notify()
+            return jsonify({
+                "message": "Webhook ontvangen",
+                "job_id": job_id
+            }), 202
+        
+        except (ValueError, PermissionError) as e:
+            error_msg = str(e)
+            is_auth_error = isinstance(e, PermissionError)
+            logging.error(f"{'Authenticatie' if is_auth_error else 'Validatie'} fout: {error_msg}")
+            
+            # Log validatie/authenticatie fout naar Azure SQL
+            log_to_azure_sql(
+                route=request.path,
+                source=bron,
+                script_name=script,
+                status="error",
+                message=error_msg,
+                processing_time_ms=int((time.time() - start_time) * 1000),
+                request_id=None,
+                payload=data,
+                error_details={"type": type(e).__name__},
+                retry_count=0
+            )
+            return jsonify({"error": error_msg}), 401 if is_auth_error else 400
+        
+        except Exception as e:
+            # Queue niet beschikbaar: WooCommerce mag later opnieuw afleveren
+            _release_delivery(delivery)
+            logging.error(f"Kon webhook niet in de queue zetten voor route {request.path}: {e}")
+            return jsonify({"error": "Service tijdelijk niet beschikbaar. Probeer het later opnieuw."}), 503
+    
+    return wrapper